@@ -1,14 +1,11 @@
 from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from django_admin_hstore_widget.forms import HStoreFormField
 
-from .models import CustomUser, Document, Project
+from .models import CustomUser, Document, Project, ProjectPermission
 
 
 class CustomUserAdminForm(forms.ModelForm):
-    project_permissions = HStoreFormField()
-
     class Meta:
         model = CustomUser
         exclude = ()
@@ -26,8 +23,15 @@ class DocumentAdminForm(forms.ModelForm):
         exclude = ()
 
 
+class ProjectPermissionInline(admin.TabularInline):
+    model = ProjectPermission
+    extra = 0
+    autocomplete_fields = ("user", "project")
+
+
 class CustomUserAdmin(UserAdmin):
     form = CustomUserAdminForm
+    inlines = (ProjectPermissionInline,)
     list_display = (
         "username",
         "email",
@@ -35,7 +39,6 @@ class CustomUserAdmin(UserAdmin):
         "last_name",
         "is_staff",
         "create_projects",
-        "project_permissions",
     )
 
     fieldsets = (
@@ -51,7 +54,6 @@ class CustomUserAdmin(UserAdmin):
                     "groups",
                     "user_permissions",
                     "create_projects",
-                    "project_permissions",
                 )
             },
         ),
@@ -71,7 +73,6 @@ class CustomUserAdmin(UserAdmin):
                     "groups",
                     "user_permissions",
                     "create_projects",
-                    "project_permissions",
                 )
             },
         ),
@@ -81,10 +82,11 @@ class CustomUserAdmin(UserAdmin):
 
 class ProjectAdmin(admin.ModelAdmin):
     form = ProjectAdminForm
-    list_display = ("name", "owner", "created_at", "updated_at")
+    inlines = (ProjectPermissionInline,)
+    list_display = ("name", "owner", "default_access", "created_at", "updated_at")
     readonly_fields = ("created_at", "updated_at")
     search_fields = ("name", "owner__username")
-    list_filter = ("owner", "created_at", "updated_at")
+    list_filter = ("owner", "default_access", "created_at", "updated_at")
     ordering = ("-created_at",)
 
 
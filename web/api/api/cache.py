@@ -0,0 +1,232 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from prometheus_client import Counter
+
+cache_hits = Counter(
+    "ner_cache_hits", "Tagging results served from the cache", ["layer"]
+)
+cache_misses = Counter(
+    "ner_cache_misses", "Tagging cache lookups that had to run the NER model"
+)
+cache_evictions = Counter(
+    "ner_cache_evictions", "Tagging results evicted from the in-process LRU cache"
+)
+project_cache_hits = Counter(
+    "project_cache_hits", "Project listing responses served from the cache", ["view"]
+)
+project_cache_misses = Counter(
+    "project_cache_misses",
+    "Project listing responses built from the database",
+    ["view"],
+)
+
+
+class TaggingCache:
+    """
+    Caches the entities found in a text, keyed by a hash of the text and the version of
+    the model that tagged it. A bounded in-process LRU sits in front of Redis, which is
+    shared by the web workers and the Celery workers.
+    """
+
+    def __init__(self, redis_client, max_entries, timeout):
+        self.redis_client = redis_client
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(text, model_version):
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        return f"ner:entities:{model_version}:{digest}"
+
+    def get(self, text, model_version):
+        key = self.key(text, model_version)
+        with self.lock:
+            entities = self.entries.get(key)
+            if entities is not None:
+                self.entries.move_to_end(key)
+                cache_hits.labels("local").inc()
+                return entities
+        try:
+            entities = self.redis_client.get(key)
+        except redis.RedisError:
+            # The cache is an optimisation, so tag the text as normal if Redis is
+            # unavailable
+            entities = None
+        if entities is None:
+            cache_misses.inc()
+            return None
+        cache_hits.labels("redis").inc()
+        entities = json.loads(entities)
+        self.set_local(key, entities)
+        return entities
+
+    def set(self, text, model_version, entities):
+        key = self.key(text, model_version)
+        self.set_local(key, entities)
+        try:
+            self.redis_client.set(key, json.dumps(entities), ex=self.timeout)
+        except redis.RedisError:
+            pass
+
+    def set_local(self, key, entities):
+        with self.lock:
+            self.entries[key] = entities
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                cache_evictions.inc()
+
+
+tagging_cache = TaggingCache(
+    redis.Redis.from_url(settings.REDIS_URL),
+    settings.NER_CACHE_SIZE,
+    settings.NER_CACHE_TIMEOUT,
+)
+
+
+class ProjectCache:
+    """
+    Caches the project listing responses of each user in Redis. Every entry records the
+    versions it was built from: a global version, bumped when a project is created or
+    deleted or its default access changes, the user's permission version, and the
+    version of every project in the response, bumped when the project or its documents
+    change. An entry is only served while none of them has moved on, which takes a GET
+    and an MGET.
+    """
+
+    GLOBAL_VERSION_KEY = "projects:version"
+
+    def __init__(self, redis_client, timeout):
+        self.redis_client = redis_client
+        self.timeout = timeout
+
+    @staticmethod
+    def key(request):
+        # The absolute URI covers the query parameters and the host the pagination links
+        # point to
+        digest = hashlib.sha256(request.build_absolute_uri().encode()).hexdigest()
+        return f"projects:response:{request.user.id}:{digest}"
+
+    @staticmethod
+    def user_version_key(user_id):
+        return f"projects:version:user:{user_id}"
+
+    @staticmethod
+    def project_version_key(project_id):
+        return f"projects:version:project:{project_id}"
+
+    def versions(self, keys):
+        if not keys:
+            return []
+        return [int(version or 0) for version in self.redis_client.mget(keys)]
+
+    def user_versions(self, user_id, project_ids=()):
+        """
+        The versions a user's responses depend on whatever projects they list, and those
+        of project_ids if the response is known to list them, read before building a
+        response
+        """
+        try:
+            return self.versions(
+                [self.GLOBAL_VERSION_KEY, self.user_version_key(user_id)]
+                + [self.project_version_key(project_id) for project_id in project_ids]
+            )
+        except redis.RedisError:
+            return None
+
+    def get(self, view, request):
+        if not self.timeout:
+            return None
+        try:
+            entry = self.redis_client.get(self.key(request))
+            if entry is not None:
+                entry = json.loads(entry)
+                current = self.versions(
+                    [self.GLOBAL_VERSION_KEY, self.user_version_key(request.user.id)]
+                    + [
+                        self.project_version_key(project_id)
+                        for project_id in entry["projects"]
+                    ]
+                )
+        except redis.RedisError:
+            # The cache is an optimisation, so build the response as normal if Redis is
+            # unavailable
+            entry = None
+        if entry is None or entry["versions"] != current:
+            project_cache_misses.labels(view).inc()
+            return None
+        project_cache_hits.labels(view).inc()
+        return entry["data"]
+
+    def set(self, request, user_versions, project_ids, data):
+        """
+        Cache a response built after reading user_versions. project_ids starts with the
+        projects whose versions were read with them, the versions of the rest are only
+        known once the response is built and are read now, so one of those projects
+        changed while the response was built can be served stale until the entry
+        expires.
+        """
+        if not self.timeout or user_versions is None:
+            return
+        project_ids = list(project_ids)
+        try:
+            # The first two versions are the global and user versions
+            project_versions = self.versions(
+                [
+                    self.project_version_key(project_id)
+                    for project_id in project_ids[len(user_versions) - 2 :]
+                ]
+            )
+            entry = {
+                "versions": user_versions + project_versions,
+                "projects": project_ids,
+                "data": data,
+            }
+            self.redis_client.set(self.key(request), json.dumps(entry), ex=self.timeout)
+        except redis.RedisError:
+            pass
+
+    def bump(self, keys):
+        """
+        Bump versions now, and again once the current transaction commits, so that a
+        response rebuilt from the rows as they were before the commit is not served
+        after it
+        """
+
+        def incr():
+            try:
+                with self.redis_client.pipeline() as pipe:
+                    for key in keys:
+                        pipe.incr(key)
+                    pipe.execute()
+            except redis.RedisError:
+                # Entries built before the change are served until they expire
+                pass
+
+        if keys:
+            incr()
+            transaction.on_commit(incr)
+
+    def invalidate_all(self):
+        self.bump([self.GLOBAL_VERSION_KEY])
+
+    def invalidate_user(self, user_id):
+        self.bump([self.user_version_key(user_id)])
+
+    def invalidate_projects(self, project_ids):
+        self.bump(
+            [self.project_version_key(project_id) for project_id in set(project_ids)]
+        )
+
+
+project_cache = ProjectCache(
+    redis.Redis.from_url(settings.REDIS_URL), settings.PROJECT_CACHE_TIMEOUT
+)
@@ -0,0 +1,92 @@
+import spacy
+
+from .ner import get_model
+
+# Rule-based sentence splitting is enough to find window boundaries and is far cheaper
+# than running the model
+sentencizer = spacy.blank(get_model().nlp.lang)
+sentencizer.add_pipe("sentencizer")
+sentencizer.max_length = 10**8
+
+
+def sentence_spans(text, max_length):
+    """
+    Character spans of the sentences in text, with sentences longer than max_length cut
+    into pieces
+    """
+    spans = []
+    for sentence in sentencizer(text).sents:
+        start, end = sentence.start_char, sentence.end_char
+        while end - start > max_length:
+            # Cut at the last space in the piece so a word is not split across windows
+            # if possible
+            cut = text.rfind(" ", start + 1, start + max_length)
+            cut = cut if cut != -1 else start + max_length
+            spans.append((start, cut))
+            start = cut
+        spans.append((start, end))
+    return spans
+
+
+def split_windows(text, size, overlap):
+    """
+    Split text into windows of whole sentences, each at most size characters.
+    Consecutive windows share the sentences in the last overlap characters of the
+    earlier one, so entities near a boundary are tagged with context on both sides.
+    Returns a list of (start, end) character offsets into text.
+    """
+    sentences = sentence_spans(text, size)
+    windows = []
+    i = 0
+    while i < len(sentences):
+        start = sentences[i][0]
+        j = i
+        while j + 1 < len(sentences) and sentences[j + 1][1] - start <= size:
+            j += 1
+        end = sentences[j][1]
+        windows.append((start, end))
+        if j + 1 == len(sentences):
+            break
+        # Start the next window at the earliest sentence within overlap characters of
+        # this window's end, or at least at its last sentence, as long as the next
+        # window still has room for the sentence after this one
+        k = j + 1
+        while (
+            k - 1 > i
+            and sentences[j + 1][1] - sentences[k - 1][0] <= size
+            and (k == j + 1 or end - sentences[k - 1][0] <= overlap)
+        ):
+            k -= 1
+        i = k
+    return windows
+
+
+def merge_window_entities(windows, window_entities):
+    """
+    Merge the entities found in each window, with offsets relative to the window, into
+    entities with document offsets. Where windows overlap, each keeps the entities
+    starting in its half of the overlap, which are the ones tagged with the most context
+    around them.
+    """
+    entities = []
+    for i, ((start, end), found) in enumerate(zip(windows, window_entities)):
+        core_start = (
+            (windows[i - 1][1] + start) // 2
+            if i > 0 and windows[i - 1][1] > start
+            else start
+        )
+        core_end = (
+            (end + windows[i + 1][0]) // 2
+            if i + 1 < len(windows) and windows[i + 1][0] < end
+            else end
+        )
+        for entity_start, entity_end, label in found:
+            if core_start <= start + entity_start < core_end:
+                entities.append([start + entity_start, start + entity_end, label])
+    # Entities running across a boundary can still overlap the neighbouring window's,
+    # keep the first of those
+    merged = []
+    for entity in sorted(entities):
+        if not merged or entity[0] >= merged[-1][1]:
+            merged.append(entity)
+    return merged
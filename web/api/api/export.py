@@ -0,0 +1,101 @@
+import json
+import zipfile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from spacy.tokens import DocBin
+from spacy.util import filter_spans
+
+from .models import Document
+from .ner import get_model
+
+EXPORT_FIELDS = (
+    "id",
+    "name",
+    "text",
+    "entities",
+    "model_version",
+    "created_at",
+    "updated_at",
+)
+
+
+class StreamBuffer:
+    """
+    Write-only file object whose contents are taken with pop(), so a file can be
+    streamed while it is written
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def project_documents(project):
+    """
+    The documents of a project, fetched from a server-side cursor a chunk at a time
+    rather than all at once
+    """
+    return (
+        Document.objects.filter(project=project)
+        .only(*EXPORT_FIELDS)
+        .order_by("id")
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+
+
+def ndjson_export(documents):
+    for document in documents:
+        yield json.dumps(
+            {field: getattr(document, field) for field in EXPORT_FIELDS},
+            cls=DjangoJSONEncoder,
+        ) + "\n"
+
+
+def annotated_doc(document, nlp):
+    """
+    The document tokenised by the model's tokenizer, with its entities set as in
+    notebooks/train.spacy
+    """
+    doc = nlp.make_doc(document.text)
+    spans = [
+        doc.char_span(start, end, label=label, alignment_mode="expand")
+        for start, end, label in document.entities or []
+    ]
+    doc.ents = filter_spans([span for span in spans if span is not None])
+    return doc
+
+
+def docbin_export(documents, name):
+    """
+    A zip of spaCy DocBin files of up to EXPORT_DOCBIN_SHARD_SIZE documents each. A
+    DocBin can only be serialised whole, so sharding keeps memory use bounded, and spaCy
+    reads a directory of .spacy files as one corpus.
+    """
+    nlp = get_model().nlp
+    buffer = StreamBuffer()
+    # DocBin files are already compressed
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        shard = 0
+        doc_bin = DocBin()
+        for document in documents:
+            doc_bin.add(annotated_doc(document, nlp))
+            if len(doc_bin) >= settings.EXPORT_DOCBIN_SHARD_SIZE:
+                archive.writestr(f"{name}/{shard:05}.spacy", doc_bin.to_bytes())
+                yield buffer.pop()
+                shard += 1
+                doc_bin = DocBin()
+        if len(doc_bin) or shard == 0:
+            archive.writestr(f"{name}/{shard:05}.spacy", doc_bin.to_bytes())
+    yield buffer.pop()
@@ -0,0 +1,74 @@
+import difflib
+
+from django.conf import settings
+
+from .chunking import sentence_spans
+
+
+def segments(text):
+    """
+    Character spans of the sentences in text, each running up to the start of the next
+    so that together they cover the whole text, whitespace included
+    """
+    starts = [0] + [
+        start for start, _ in sentence_spans(text, settings.NER_CHUNK_SIZE)[1:]
+    ]
+    return list(zip(starts, starts[1:] + [len(text)]))
+
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def plan_retagging(old_text, old_entities, new_text, context=1):
+    """
+    Compare the sentences of an edited text with those of the old one. Returns the old
+    entities in unchanged sentences, with their offsets moved to where the sentences are
+    in the new text, and the (start, end) spans of new_text that have to be tagged
+    again: the changed sentences and context sentences either side of them, as the model
+    looks at the words around an entity.
+    """
+    old_segments = segments(old_text)
+    new_segments = segments(new_text)
+    matcher = difflib.SequenceMatcher(
+        None,
+        [old_text[start:end] for start, end in old_segments],
+        [new_text[start:end] for start, end in new_segments],
+        autojunk=False,
+    )
+    opcodes = matcher.get_opcodes()
+    # Sentence indices in the new text to tag again, a deletion has its neighbours
+    # tagged again
+    changed = merge_ranges(
+        (max(j1 - context, 0), min(j2 + context, len(new_segments)))
+        for tag, _, _, j1, j2 in opcodes
+        if tag != "equal"
+    )
+    regions = [
+        (new_segments[first][0], new_segments[last - 1][1])
+        for first, last in changed
+        if first < last
+    ]
+
+    kept = []
+    for tag, i1, i2, j1, _ in opcodes:
+        if tag != "equal":
+            continue
+        old_start, old_end = old_segments[i1][0], old_segments[i2 - 1][1]
+        shift = new_segments[j1][0] - old_start
+        for start, end, label in old_entities:
+            if old_start <= start and end <= old_end:
+                start, end = start + shift, end + shift
+                # Entities in the context sentences are found again when they are tagged
+                if not any(
+                    region_start < end and start < region_end
+                    for region_start, region_end in regions
+                ):
+                    kept.append([start, end, label])
+    return sorted(kept), regions
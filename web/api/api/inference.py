@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+
+from .ner import extract_entities, get_model
+
+
+class InferenceServiceError(Exception):
+    pass
+
+
+class MicroBatchingServer:
+    """
+    Serves tagging requests from the web workers over a local socket. Requests that
+    arrive close together are merged into a single nlp.pipe call of up to batch_size
+    texts, waiting at most max_wait seconds for a batch to fill up.
+    """
+
+    def __init__(self, address, authkey, batch_size, max_wait):
+        self.address = address
+        self.authkey = authkey
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.stopped = threading.Event()
+
+    def serve_forever(self):
+        threading.Thread(target=self.run_batches, daemon=True).start()
+        # Remove the socket left behind by a previous run that did not shut down cleanly
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        with Listener(self.address, authkey=self.authkey) as listener:
+            while not self.stopped.is_set():
+                try:
+                    connection = listener.accept()
+                except (AuthenticationError, OSError):
+                    # A client that fails the handshake must not bring the service down
+                    continue
+                if self.stopped.is_set():
+                    connection.close()
+                    break
+                threading.Thread(
+                    target=self.handle_connection, args=(connection,), daemon=True
+                ).start()
+
+    def handle_connection(self, connection):
+        with connection:
+            try:
+                text = connection.recv()
+            except EOFError:
+                return
+            future = Future()
+            self.requests.put((text, future))
+            try:
+                model_version, entities = future.result()
+                connection.send({"model_version": model_version, "entities": entities})
+            except Exception as error:  # pylint: disable=broad-except
+                connection.send({"error": str(error)})
+
+    def shutdown(self):
+        """Stop serve_forever, which removes the socket, and the batching thread"""
+        self.stopped.set()
+        self.requests.put(None)
+        # Wake up the accept() serve_forever is blocked in
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except OSError:
+            pass
+
+    def next_batch(self):
+        # Block until the first request arrives, then collect more until the batch is
+        # full or max_wait has passed. Collecting stops at the None queued by
+        # shutdown(), returning the requests that arrived before it and whether it was
+        # reached.
+        first = self.requests.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    def run_batches(self):
+        stopped = False
+        while not stopped:
+            batch, stopped = self.next_batch()
+            if not batch:
+                continue
+            try:
+                model = get_model()
+                docs = model.nlp.pipe(
+                    [text for text, _ in batch], batch_size=len(batch)
+                )
+                for (_, future), doc in zip(batch, docs):
+                    future.set_result((model.version, extract_entities(doc)))
+            except Exception as error:  # pylint: disable=broad-except
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+
+def tag_text_remote(text):
+    """
+    Tag text with the inference service, returning the version of the model it used and
+    the entity spans. Waits at most NER_SERVICE_TIMEOUT seconds for the response.
+    """
+    try:
+        with Client(
+            settings.NER_SERVICE_SOCKET, authkey=settings.NER_SERVICE_AUTHKEY
+        ) as connection:
+            connection.send(text)
+            if not connection.poll(settings.NER_SERVICE_TIMEOUT):
+                raise InferenceServiceError(
+                    "The inference service did not respond within "
+                    f"{settings.NER_SERVICE_TIMEOUT} seconds"
+                )
+            response = connection.recv()
+    except (OSError, EOFError) as error:
+        raise InferenceServiceError(
+            f"Could not reach the inference service: {error}"
+        ) from error
+    if "error" in response:
+        raise InferenceServiceError(response["error"])
+    return response["model_version"], response["entities"]
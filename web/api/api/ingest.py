@@ -0,0 +1,161 @@
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import project_cache
+from .models import CREATED, Document, Event, Project
+from .permissions import WRITE_PERMISSIONS
+from .tasks import queue_tagging_batch
+
+# Uploads are spooled to disk past this many bytes, zip files need to be seekable to
+# read their members
+SPOOL_MAX_SIZE = 10 * 1024 * 1024
+# Maximum number of errors reported back for a single upload
+MAX_ERRORS = 100
+
+
+class IngestError(Exception):
+    pass
+
+
+def iter_ndjson(stream):
+    """
+    Yield (line number, document, error) for each non-empty line of an NDJSON stream,
+    reading one line at a time. Either document or error is None.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            document = json.loads(line)
+        except ValueError:
+            yield line_number, None, "Line is not valid JSON"
+            continue
+        if not isinstance(document, dict):
+            yield line_number, None, "Line must be a JSON object"
+            continue
+        yield line_number, document, None
+
+
+def iter_zip(stream):
+    """
+    Yield (file name, text, error) for each file in a zip archive read from stream,
+    reading one file at a time. Either text or error is None.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as upload:
+        shutil.copyfileobj(stream, upload)
+        upload.seek(0)
+        try:
+            archive = zipfile.ZipFile(upload)
+        except zipfile.BadZipFile:
+            raise IngestError("Upload is not a valid zip file")
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                try:
+                    yield info.filename, archive.read(info).decode("utf-8"), None
+                except UnicodeDecodeError:
+                    yield info.filename, None, "File is not valid UTF-8 text"
+
+
+class DocumentIngester:
+    """
+    Adds documents to projects in chunks of bulk_create, checking the user's access to
+    each project once and queueing the documents of each chunk for tagging in batches
+    once the chunk is committed
+    """
+
+    def __init__(self, user, chunk_size=None):
+        self.user = user
+        self.chunk_size = chunk_size or settings.BULK_INGEST_CHUNK_SIZE
+        self.project_errors = {}
+        self.pending = []
+        self.projects = set()
+        self.created = 0
+        self.errors = []
+
+    def project_error(self, project_id):
+        """
+        Error message if the user may not add documents to the project, checked once per
+        project
+        """
+        if project_id not in self.project_errors:
+            project = (
+                Project.objects.with_access(self.user).filter(id=project_id).first()
+            )
+            if project is None:
+                self.project_errors[project_id] = "Project does not exist"
+            elif project.access != WRITE_PERMISSIONS:
+                self.project_errors[project_id] = (
+                    "You do not have permission to add documents to this project"
+                )
+            else:
+                self.project_errors[project_id] = None
+        return self.project_errors[project_id]
+
+    def error(self, source, message):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"source": source, "error": message})
+
+    def add(self, source, project_id, name, text):
+        """
+        Add a document to the current chunk, or record an error for source if it is not
+        valid
+        """
+        if isinstance(project_id, str) and project_id.isdigit():
+            project_id = int(project_id)
+        if not isinstance(project_id, int) or isinstance(project_id, bool):
+            return self.error(source, "Project is required")
+        if (
+            not isinstance(name, str)
+            or not name
+            or len(name) > Document._meta.get_field("name").max_length
+        ):
+            return self.error(source, "Name must be between 1 and 255 characters")
+        if not isinstance(text, str) or not text:
+            return self.error(source, "Text is required")
+        message = self.project_error(project_id)
+        if message:
+            return self.error(source, message)
+        self.pending.append(
+            Document(name=name, owner=self.user, project_id=project_id, text=text)
+        )
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with transaction.atomic():
+            documents = Document.objects.bulk_create(self.pending)
+            Event.objects.bulk_create(
+                [Event.for_document(document, CREATED) for document in documents]
+            )
+            document_ids = [document.id for document in documents]
+            transaction.on_commit(
+                lambda: queue_tagging_batch(document_ids, self.user.id)
+            )
+        self.projects.update(document.project_id for document in documents)
+        self.created += len(documents)
+        self.pending = []
+
+    def finish(self):
+        self.flush()
+        # Update the projects' updated_at fields once rather than for every document
+        Project.objects.filter(id__in=self.projects).update(updated_at=timezone.now())
+        project_cache.invalidate_projects(self.projects)
+
+
+def document_name(file_name):
+    """
+    Name of the document for a file in a zip archive, its file name without the
+    directory or extension
+    """
+    return os.path.splitext(os.path.basename(file_name))[0][:255]
@@ -0,0 +1,34 @@
+import csv
+import statistics
+
+SAMPLE_TEXTS = [
+    "The United Nations Security Council met in New York on Tuesday to discuss sanctions against North Korea.",
+    "Angela Merkel and Emmanuel Macron signed the Treaty of Aachen, renewing the Franco-German friendship.",
+    "NATO foreign ministers gathered in Brussels as Russia moved troops towards the Ukrainian border.",
+    "The European Union and Japan concluded a free trade agreement after four years of negotiations.",
+]
+
+
+def load_samples(source):
+    """
+    The 'text' column of a CSV file such as notebooks/dataset.csv, or SAMPLE_TEXTS
+    without one
+    """
+    if not source:
+        return SAMPLE_TEXTS
+    with open(source, newline="", encoding="utf-8") as file:
+        return [row["text"] for row in csv.DictReader(file) if row["text"]]
+
+
+def load_texts(source, count):
+    """count texts, cycling through the samples from load_samples"""
+    samples = load_samples(source)
+    return [samples[i % len(samples)] for i in range(count)]
+
+
+def percentile(values, percent):
+    return (
+        statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+        if len(values) > 1
+        else values[0]
+    )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ner import registry
+
+
+class Command(BaseCommand):
+    help = "Switch the model used for tagging to a registered version, or list the versions without one"
+
+    def add_arguments(self, parser):
+        parser.add_argument("version", nargs="?", help="Registered version to tag with")
+
+    def handle(self, *args, **options):
+        if options["version"] is None:
+            active = registry.active_version()
+            for version in registry.versions():
+                self.stdout.write(f"{'*' if version == active else ' '} {version}")
+            return
+        try:
+            registry.activate(options["version"])
+        except ValueError as error:
+            raise CommandError(str(error)) from error
+        self.stdout.write(
+            f"Activated model version {options['version']}, running processes will switch to it within "
+            f"{registry.check_interval:g} seconds"
+        )
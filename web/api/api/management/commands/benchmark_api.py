@@ -0,0 +1,231 @@
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.models import CustomUser, Document, Project
+
+from ._benchmark import SAMPLE_TEXTS, percentile
+
+ENDPOINTS = ["projects", "project", "document", "events", "tag"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the latency, throughput and database queries of the API endpoints at several concurrency levels, "
+        "against the data from generate_data. Requests go through the full Django stack in this process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requests sent at each concurrency level",
+        )
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+        parser.add_argument(
+            "--prefix",
+            default="loadtest_",
+            help="Prefix of the generated users to send requests as",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Write the results to this JSON file")
+        parser.add_argument(
+            "--label",
+            help="Label stored with the results, e.g. the commit they were measured at",
+        )
+        parser.add_argument(
+            "--compare",
+            help="JSON results of an earlier run to show the change against",
+        )
+
+    def handle(self, *args, **options):
+        users = list(
+            CustomUser.objects.filter(username__startswith=options["prefix"]).order_by(
+                "id"
+            )
+        )
+        if not users:
+            raise CommandError(
+                f"There are no users starting with {options['prefix']}, run generate_data first"
+            )
+        rng = random.Random(options["seed"])
+        tokens = {
+            user.id: str(RefreshToken.for_user(user).access_token) for user in users
+        }
+        previous = self.load_results(options["compare"]) if options["compare"] else {}
+
+        self.stdout.write(
+            f"{'endpoint':<9} {'concurrency':>11} {'req/sec':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+            f"{'queries':>8} {'errors':>7}"
+        )
+        results = []
+        for endpoint in options["endpoints"]:
+            requests = self.build_requests(
+                endpoint, users, tokens, rng, options["requests"]
+            )
+            if not requests:
+                self.stdout.write(
+                    f"{endpoint:<9} skipped, the generated users cannot access any"
+                )
+                continue
+            for concurrency in options["concurrency"]:
+                result = {
+                    "endpoint": endpoint,
+                    "concurrency": concurrency,
+                    **self.run(requests, concurrency),
+                }
+                results.append(result)
+                line = (
+                    f"{endpoint:<9} {concurrency:>11} {result['requests_per_second']:>9.2f} {result['p50_ms']:>9.1f} "
+                    f"{result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['queries_per_request']:>8.1f} "
+                    f"{result['errors']:>7}"
+                )
+                before = previous.get((endpoint, concurrency))
+                if before:
+                    line += (
+                        f"  p95 {self.change(before['p95_ms'], result['p95_ms'])}, "
+                        f"req/sec {self.change(before['requests_per_second'], result['requests_per_second'])}"
+                    )
+                self.stdout.write(line)
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(
+                    {
+                        "label": options["label"],
+                        "timestamp": timezone.now().isoformat(),
+                        "results": results,
+                    },
+                    file,
+                    indent=2,
+                )
+            self.stdout.write(f"Results written to {options['output']}")
+
+    @staticmethod
+    def build_requests(endpoint, users, tokens, rng, count):
+        """
+        count (token, method, path, data) requests to the endpoint, for projects and
+        documents the user can see
+        """
+        requests = []
+        for i in range(count):
+            user = rng.choice(users)
+            if endpoint == "projects":
+                requests.append((tokens[user.id], "get", reverse("projects"), None))
+            elif endpoint == "events":
+                requests.append((tokens[user.id], "get", reverse("events"), None))
+            elif endpoint == "tag":
+                # Number every text so that none of them is served from the tagging
+                # cache
+                text = f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} ({time.time_ns()} {i})"
+                requests.append(
+                    (tokens[user.id], "post", reverse("tag"), {"text": text})
+                )
+            elif endpoint == "project":
+                project = (
+                    Project.objects.accessible_to(user)
+                    .order_by("?")
+                    .values("id")
+                    .first()
+                )
+                if project:
+                    path = reverse("project", kwargs={"project_id": project["id"]})
+                    requests.append((tokens[user.id], "get", path, None))
+            else:
+                document = (
+                    Document.objects.filter(
+                        project__in=Project.objects.accessible_to(user).values("id")
+                    )
+                    .order_by("?")
+                    .values("id", "project_id")
+                    .first()
+                )
+                if document:
+                    path = reverse(
+                        "document",
+                        kwargs={
+                            "project_id": document["project_id"],
+                            "document_id": document["id"],
+                        },
+                    )
+                    requests.append(
+                        (tokens[user.id], "get", f"{path}?render=html", None)
+                    )
+        return requests
+
+    @staticmethod
+    def run(requests, concurrency):
+        clients = threading.local()
+
+        def timed(request):
+            token, method, path, data = request
+            if not hasattr(clients, "client"):
+                # Count server errors rather than stopping at the first one
+                clients.client = Client(raise_request_exception=False)
+            queries = 0
+
+            def count_query(execute, sql, params, many, context):
+                nonlocal queries
+                queries += 1
+                return execute(sql, params, many, context)
+
+            # Each thread has its own database connection, so this only counts the
+            # queries of its own request
+            with connection.execute_wrapper(count_query):
+                start = time.perf_counter()
+                if method == "post":
+                    response = clients.client.post(
+                        path,
+                        data,
+                        content_type="application/json",
+                        HTTP_AUTHORIZATION=f"Bearer {token}",
+                    )
+                else:
+                    response = clients.client.get(
+                        path, HTTP_AUTHORIZATION=f"Bearer {token}"
+                    )
+                elapsed = (time.perf_counter() - start) * 1000
+            return elapsed, queries, response.status_code >= 400
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            measurements = list(executor.map(timed, requests))
+        elapsed = time.perf_counter() - start
+        latencies = [latency for latency, _, _ in measurements]
+        return {
+            "requests": len(measurements),
+            "errors": sum(error for _, _, error in measurements),
+            "requests_per_second": len(measurements) / elapsed,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "queries_per_request": statistics.mean(
+                queries for _, queries, _ in measurements
+            ),
+        }
+
+    @staticmethod
+    def load_results(path):
+        with open(path, encoding="utf-8") as file:
+            results = json.load(file)["results"]
+        return {
+            (result["endpoint"], result["concurrency"]): result for result in results
+        }
+
+    @staticmethod
+    def change(before, after):
+        return f"{(after - before) / before:+.0%}" if before else "n/a"
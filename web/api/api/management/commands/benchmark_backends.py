@@ -0,0 +1,64 @@
+import time
+
+import spacy
+from django.core.management.base import BaseCommand
+from spacy.scorer import get_ner_prf
+from spacy.tokens import DocBin
+from spacy.training import Example
+
+from api.ner import extract_entities, quantise, registry
+
+
+class Command(BaseCommand):
+    help = "Compare the accuracy and throughput of the inference backends on a labelled corpus"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "data", help="Labelled corpus in DocBin format, e.g. notebooks/test.spacy"
+        )
+        parser.add_argument(
+            "--limit", type=int, help="Only use the first documents of the corpus"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=8,
+            help="Texts passed through the transformer at once",
+        )
+
+    def handle(self, *args, **options):
+        # Compare the backends on the active model
+        path = registry.path(registry.active_version())
+        backends = {"torch": spacy.load(path), "int8": spacy.load(path)}
+        quantise(backends["int8"])
+        references = list(
+            DocBin().from_disk(options["data"]).get_docs(backends["torch"].vocab)
+        )
+        references = references[: options["limit"]]
+        texts = [reference.text for reference in references]
+
+        self.stdout.write(
+            f"{'backend':<8} {'docs/sec':>9} {'precision':>10} {'recall':>7} {'f1':>7}"
+        )
+        entities = {}
+        for name, pipeline in backends.items():
+            # Warm up so that the first batch's allocations are not timed
+            list(pipeline.pipe(texts[: options["batch_size"]]))
+            start = time.perf_counter()
+            docs = list(pipeline.pipe(texts, batch_size=options["batch_size"]))
+            elapsed = time.perf_counter() - start
+            scores = get_ner_prf(
+                [Example(doc, reference) for doc, reference in zip(docs, references)]
+            )
+            entities[name] = [extract_entities(doc) for doc in docs]
+            self.stdout.write(
+                f"{name:<8} {len(docs) / elapsed:>9.2f} {scores['ents_p']:>10.3f} {scores['ents_r']:>7.3f} "
+                f"{scores['ents_f']:>7.3f}"
+            )
+        # Documents for which both backends found exactly the same spans
+        agreement = sum(
+            a == b for a, b in zip(entities["torch"], entities["int8"])
+        ) / len(texts)
+        self.stdout.write(
+            f"Identical spans on {agreement:.1%} of {len(texts)} documents"
+        )
@@ -0,0 +1,73 @@
+import time
+
+from celery import group
+from django.core.management.base import BaseCommand
+
+from api.chunking import merge_window_entities, split_windows
+from api.ner import extract_entities, get_model
+from api.tasks import tag_window
+
+from ._benchmark import load_texts
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the wall-clock time to tag documents of increasing length in a single call against tagging their "
+        "windows in parallel on the Celery workers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lengths",
+            type=int,
+            nargs="+",
+            default=[5000, 20000, 50000, 100000, 200000],
+            help="Document lengths to time, in characters",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=10000, help="Window size in characters"
+        )
+        parser.add_argument(
+            "--overlap",
+            type=int,
+            default=500,
+            help="Characters shared by consecutive windows",
+        )
+        parser.add_argument(
+            "--source", help="CSV file with a 'text' column, e.g. notebooks/dataset.csv"
+        )
+        parser.add_argument(
+            "--timeout", type=int, default=600, help="Seconds to wait for the workers"
+        )
+
+    def handle(self, *args, **options):
+        nlp = get_model().nlp
+        corpus = " ".join(load_texts(options["source"], 1000))
+        self.stdout.write(
+            f"{'length':>8} {'windows':>8} {'single s':>9} {'chunked s':>10} {'speedup':>8} {'entities':>9}"
+        )
+        for length in options["lengths"]:
+            # Repeat the corpus to make up the length, cut at a space so the last word
+            # is whole
+            text = (corpus + " ") * (length // len(corpus) + 1)
+            text = text[: text.rfind(" ", 0, length + 1)]
+
+            start = time.perf_counter()
+            single_entities = extract_entities(nlp(text))
+            single_elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            windows = split_windows(text, options["chunk_size"], options["overlap"])
+            result = group(
+                tag_window.s(text[window_start:window_end])
+                for window_start, window_end in windows
+            )()
+            chunked_entities = merge_window_entities(
+                windows, result.get(timeout=options["timeout"])
+            )
+            chunked_elapsed = time.perf_counter() - start
+
+            self.stdout.write(
+                f"{len(text):>8} {len(windows):>8} {single_elapsed:>9.2f} {chunked_elapsed:>10.2f} "
+                f"{single_elapsed / chunked_elapsed:>7.2f}x {len(chunked_entities):>4}/{len(single_entities):<4}"
+            )
@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from api.inference import tag_text_remote
+from api.ner import extract_entities, get_model
+
+from ._benchmark import SAMPLE_TEXTS, percentile
+
+
+class Command(BaseCommand):
+    help = "Measure /api/tag/ latency and throughput at several concurrency levels, in-process and with the service"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requests sent at each concurrency level",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16]
+        )
+        parser.add_argument(
+            "--skip-in-process",
+            action="store_true",
+            help="Only benchmark the inference service",
+        )
+
+    def handle(self, *args, **options):
+        modes = [("service", tag_text_remote)]
+        if not options["skip_in_process"]:
+            nlp = get_model().nlp
+            modes.insert(0, ("in-process", lambda text: extract_entities(nlp(text))))
+        texts = [
+            SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] for i in range(options["requests"])
+        ]
+
+        self.stdout.write(
+            f"{'mode':<11} {'concurrency':>11} {'req/sec':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        )
+        for name, tag in modes:
+            for concurrency in options["concurrency"]:
+                latencies, elapsed = self.run(tag, texts, concurrency)
+                self.stdout.write(
+                    f"{name:<11} {concurrency:>11} {len(texts) / elapsed:>9.2f} "
+                    f"{percentile(latencies, 50):>9.1f} {percentile(latencies, 95):>9.1f} "
+                    f"{percentile(latencies, 99):>9.1f}"
+                )
+
+    @staticmethod
+    def run(tag, texts, concurrency):
+        def timed(text):
+            start = time.perf_counter()
+            tag(text)
+            return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed, texts))
+        return latencies, time.perf_counter() - start
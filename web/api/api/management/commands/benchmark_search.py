@@ -0,0 +1,102 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import CustomUser, Document, Project
+from api.search import full_text_search
+
+from ._benchmark import load_texts, percentile
+
+
+class Command(BaseCommand):
+    help = "Measure full-text search latency over a synthetic corpus of documents"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--documents",
+            type=int,
+            default=1_000_000,
+            help="Size of the synthetic corpus",
+        )
+        parser.add_argument(
+            "--words", type=int, default=300, help="Words per synthetic document"
+        )
+        parser.add_argument(
+            "--queries", type=int, default=200, help="Number of search queries to time"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Documents inserted per bulk_create",
+        )
+        parser.add_argument(
+            "--source", help="CSV file with a 'text' column to draw words from"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the synthetic corpus after the benchmark",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        vocabulary = sorted(
+            {
+                word.strip(".,()")
+                for text in load_texts(options["source"], 1000)
+                for word in text.split()
+            }
+        )
+
+        owner, _ = CustomUser.objects.get_or_create(username="benchmark_search")
+        project = Project.objects.create(name="Search benchmark", owner=owner)
+        try:
+            start = time.perf_counter()
+            for offset in range(0, options["documents"], options["batch_size"]):
+                count = min(options["batch_size"], options["documents"] - offset)
+                Document.objects.bulk_create(
+                    [
+                        Document(
+                            name=" ".join(rng.choices(vocabulary, k=4)),
+                            owner=owner,
+                            project=project,
+                            text=" ".join(rng.choices(vocabulary, k=options["words"])),
+                        )
+                        for _ in range(count)
+                    ]
+                )
+            self.stdout.write(
+                f"Inserted {options['documents']} documents in {time.perf_counter() - start:.1f}s"
+            )
+
+            # Single words, pairs of words and quoted phrases, as a user would type them
+            queries = [
+                rng.choice(
+                    [
+                        rng.choice(vocabulary),
+                        " ".join(rng.choices(vocabulary, k=2)),
+                        '"' + " ".join(rng.choices(vocabulary, k=2)) + '"',
+                    ]
+                )
+                for _ in range(options["queries"])
+            ]
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                # The first page and the total count, as returned by
+                # /api/documents/search/
+                documents = full_text_search(query, [project.id])
+                list(documents[:20])
+                documents.count()
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write(
+                f"{len(queries)} queries: p50 {percentile(latencies, 50):.1f} ms, "
+                f"p95 {percentile(latencies, 95):.1f} ms, p99 {percentile(latencies, 99):.1f} ms"
+            )
+        finally:
+            if not options["keep"]:
+                project.delete()
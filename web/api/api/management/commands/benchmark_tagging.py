@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import CustomUser, Document, Project
+from api.tasks import perform_tagging, perform_tagging_batch
+
+from ._benchmark import load_texts
+
+
+class Command(BaseCommand):
+    help = "Compare tagging throughput of the one-task-per-document path against batched tagging"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--documents", type=int, default=200, help="Number of documents to tag"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=32, help="Documents per batch task"
+        )
+        parser.add_argument(
+            "--source", help="CSV file with a 'text' column, e.g. notebooks/dataset.csv"
+        )
+
+    def handle(self, *args, **options):
+        texts = load_texts(options["source"], options["documents"])
+        # Run inside a transaction that is rolled back so the benchmark leaves no rows
+        # behind
+        with transaction.atomic():
+            owner = CustomUser.objects.create_user(username="benchmark_tagging")
+            project = Project.objects.create(name="Benchmark", owner=owner)
+
+            document_ids = self.create_documents(owner, project, texts, "single")
+            start = time.perf_counter()
+            for document_id in document_ids:
+                perform_tagging(document_id, project.id)
+            single_elapsed = time.perf_counter() - start
+
+            document_ids = self.create_documents(owner, project, texts, "batched")
+            start = time.perf_counter()
+            for i in range(0, len(document_ids), options["batch_size"]):
+                perform_tagging_batch(document_ids[i : i + options["batch_size"]])
+            batch_elapsed = time.perf_counter() - start
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Documents tagged: {len(texts)}")
+        self.stdout.write(
+            f"One task per document: {len(texts) / single_elapsed:.2f} docs/sec ({single_elapsed:.2f}s)"
+        )
+        self.stdout.write(
+            f"Batched ({options['batch_size']} per task): {len(texts) / batch_elapsed:.2f} docs/sec ({batch_elapsed:.2f}s)"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Speedup: {single_elapsed / batch_elapsed:.2f}x")
+        )
+
+    @staticmethod
+    def create_documents(owner, project, texts, run):
+        # Number every text so that neither run is served from the tagging cache
+        documents = Document.objects.bulk_create(
+            [
+                Document(
+                    name=f"Benchmark {i}",
+                    owner=owner,
+                    project=project,
+                    text=f"{text} ({run} {i})",
+                )
+                for i, text in enumerate(texts)
+            ]
+        )
+        return [document.id for document in documents]
@@ -0,0 +1,192 @@
+import itertools
+import json
+import multiprocessing
+import os
+import resource
+import time
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+from spacy.tokens import DocBin
+
+from api.ner import get_model
+
+from ._benchmark import load_samples, percentile
+
+
+def tag_share(nlp, texts, threads, batch_size, barrier, results):
+    """
+    Tag texts in a forked process and put (docs, tokens, batch latencies, start, end,
+    peak RSS) on results
+    """
+    torch.set_num_threads(threads)
+    # Warm up so that the first batch's allocations and the thread pool start are not
+    # timed
+    list(nlp.pipe(texts[:batch_size], batch_size=batch_size))
+    # Start timing together with the other processes
+    barrier.wait()
+    latencies = []
+    tokens = 0
+    start = time.monotonic()
+    for i in range(0, len(texts), batch_size):
+        batch_start = time.monotonic()
+        docs = list(nlp.pipe(texts[i : i + batch_size], batch_size=batch_size))
+        latencies.append((time.monotonic() - batch_start) * 1000)
+        tokens += sum(len(doc) for doc in docs)
+    end = time.monotonic()
+    # ru_maxrss is in kB on Linux
+    results.put(
+        (
+            len(texts),
+            tokens,
+            latencies,
+            start,
+            end,
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        )
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Sweep the batch size, torch threads per process and number of processes for tagging with the active model, "
+        "and recommend the fastest configuration for this host"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--data", help="Corpus in DocBin format, e.g. notebooks/test.spacy"
+        )
+        parser.add_argument(
+            "--source", help="CSV file with a 'text' column, e.g. notebooks/dataset.csv"
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=512,
+            help="Number of texts tagged for each configuration",
+        )
+        parser.add_argument(
+            "--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32]
+        )
+        parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+        parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+        parser.add_argument(
+            "--oversubscribe",
+            action="store_true",
+            help="Also run configurations with more threads in total than this host has CPUs",
+        )
+        parser.add_argument("--output", help="Write the results to this JSON file")
+
+    def handle(self, *args, **options):
+        nlp = get_model().nlp
+        texts = self.load_corpus(nlp, options)
+        cpus = os.cpu_count()
+        self.stdout.write(
+            f"Tagging {len(texts)} texts with each configuration on {cpus} CPUs"
+        )
+        self.stdout.write(
+            f"{'processes':>9} {'threads':>7} {'batch':>5} {'docs/sec':>9} {'tokens/sec':>10} "
+            f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak RSS MB':>11}"
+        )
+        results = []
+        for processes, threads, batch_size in itertools.product(
+            options["processes"], options["threads"], options["batch_sizes"]
+        ):
+            if processes * threads > cpus and not options["oversubscribe"]:
+                continue
+            result = {
+                "processes": processes,
+                "threads": threads,
+                "batch_size": batch_size,
+            }
+            result.update(self.run(nlp, texts, processes, threads, batch_size))
+            results.append(result)
+            self.stdout.write(
+                f"{processes:>9} {threads:>7} {batch_size:>5} {result['docs_per_second']:>9.2f} "
+                f"{result['tokens_per_second']:>10.0f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+                f"{result['p99_ms']:>9.1f} {result['peak_rss_mb']:>11.0f}"
+            )
+        if not results:
+            raise CommandError(
+                "Every configuration has more threads than this host has CPUs, pass --oversubscribe"
+            )
+
+        fastest = max(results, key=lambda result: result["docs_per_second"])
+        # Quick Tag waits for a single batch, so it is better served by the
+        # configuration with the lowest latency that still has most of the best
+        # throughput
+        responsive = min(
+            (
+                result
+                for result in results
+                if result["docs_per_second"] >= 0.8 * fastest["docs_per_second"]
+            ),
+            key=lambda result: result["p95_ms"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Highest throughput: {fastest['processes']} Celery worker processes (celery worker --concurrency), "
+                f"NER_TORCH_THREADS={fastest['threads']}, NER_PIPE_BATCH_SIZE={fastest['batch_size']}, "
+                f"{fastest['docs_per_second']:.2f} docs/sec"
+            )
+        )
+        self.stdout.write(
+            f"Lowest p95 latency within 80% of it: {responsive['processes']} processes, "
+            f"NER_TORCH_THREADS={responsive['threads']}, NER_SERVICE_BATCH_SIZE={responsive['batch_size']}, "
+            f"p95 {responsive['p95_ms']:.1f} ms"
+        )
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(
+                    {"cpus": cpus, "texts": len(texts), "results": results},
+                    file,
+                    indent=2,
+                )
+            self.stdout.write(f"Results written to {options['output']}")
+
+    @staticmethod
+    def load_corpus(nlp, options):
+        texts = []
+        if options["data"]:
+            texts += [
+                doc.text
+                for doc in DocBin().from_disk(options["data"]).get_docs(nlp.vocab)
+            ]
+        if options["source"] or not texts:
+            texts += load_samples(options["source"])
+        # Repeat the corpus if it is smaller than the limit so that every configuration
+        # tags the same texts
+        return [texts[i % len(texts)] for i in range(options["limit"])]
+
+    @staticmethod
+    def run(nlp, texts, processes, threads, batch_size):
+        # Fork like gunicorn and Celery do, so each process shares the loaded model's
+        # weights copy-on-write
+        context = multiprocessing.get_context("fork")
+        barrier = context.Barrier(processes)
+        results = context.Queue()
+        workers = [
+            context.Process(
+                target=tag_share,
+                args=(nlp, texts[i::processes], threads, batch_size, barrier, results),
+            )
+            for i in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        shares = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        docs = sum(share[0] for share in shares)
+        tokens = sum(share[1] for share in shares)
+        latencies = [latency for share in shares for latency in share[2]]
+        elapsed = max(share[4] for share in shares) - min(share[3] for share in shares)
+        return {
+            "docs_per_second": docs / elapsed,
+            "tokens_per_second": tokens / elapsed,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "peak_rss_mb": max(share[5] for share in shares) / 1024,
+        }
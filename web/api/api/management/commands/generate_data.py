@@ -0,0 +1,204 @@
+import math
+import random
+import re
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import project_cache
+from api.models import (
+    CREATED,
+    TAGGING_DONE,
+    UPDATED,
+    CustomUser,
+    Document,
+    Event,
+    Project,
+    ProjectPermission,
+)
+from api.permissions import NONE_PERMISSIONS, READ_PERMISSIONS, WRITE_PERMISSIONS
+from api.tasks import index_entities
+
+from ._benchmark import load_samples
+
+# Password of every generated user
+PASSWORD = "loadtest"
+# Placeholder labels for the generated entities, lowercase like the model's labels
+LABELS = ["person", "location", "organisation", "politicalparty", "event"]
+# Runs of capitalised words are marked as entities, so that documents render and can be
+# searched like tagged ones
+ENTITY_PATTERN = re.compile(r"[A-Z][\w-]+(?: [A-Z][\w-]+)*")
+# Recorded as the documents' model version, so that retag treats the placeholder
+# entities as stale
+MODEL_VERSION = "generated"
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with generated users, projects and documents for load testing. Document texts are made "
+        "of sentences from a CSV file, with lengths drawn from a log-normal distribution."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--projects", type=int, default=200)
+        parser.add_argument("--documents", type=int, default=10000)
+        parser.add_argument(
+            "--source", help="CSV file with a 'text' column, e.g. notebooks/dataset.csv"
+        )
+        parser.add_argument(
+            "--median-length",
+            type=int,
+            default=3000,
+            help="Median document length in characters",
+        )
+        parser.add_argument(
+            "--prefix",
+            default="loadtest_",
+            help="Prefix of the generated users' usernames",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed of the random generator, for repeatable data",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete the users with the prefix and everything they own, and stop",
+        )
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.filter(username__startswith=options["prefix"])
+        if options["clear"]:
+            # Projects, documents, permissions and events cascade from their owners
+            deleted, _ = users.delete()
+            self.stdout.write(f"Deleted {deleted} rows")
+            return
+        if users.exists():
+            raise CommandError(
+                f"Users starting with {options['prefix']} already exist, run with --clear first"
+            )
+
+        rng = random.Random(options["seed"])
+        sentences = load_samples(options["source"])
+        with transaction.atomic():
+            users = self.create_users(options)
+            projects = self.create_projects(rng, users, options["projects"])
+            self.create_documents(rng, users, projects, sentences, options)
+            # Bulk inserts send no signals
+            project_cache.invalidate_all()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(users)} users, {len(projects)} projects and {options['documents']} documents. "
+                f"Log in as {options['prefix']}0 with the password {PASSWORD}"
+            )
+        )
+
+    @staticmethod
+    def create_users(options):
+        # Hashing is slow on purpose, so hash the shared password once
+        password = make_password(PASSWORD)
+        return CustomUser.objects.bulk_create(
+            [
+                CustomUser(
+                    username=f"{options['prefix']}{i}",
+                    password=password,
+                    create_projects=True,
+                )
+                for i in range(options["users"])
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+    @staticmethod
+    def create_projects(rng, users, count):
+        projects = Project.objects.bulk_create(
+            [
+                Project(
+                    name=f"Project {i}",
+                    owner=rng.choice(users),
+                    default_access=rng.choices(
+                        [NONE_PERMISSIONS, READ_PERMISSIONS, WRITE_PERMISSIONS],
+                        weights=[5, 3, 2],
+                    )[0],
+                )
+                for i in range(count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        # The owner can write to their project, and a few other users have their own
+        # access
+        permissions = []
+        for project in projects:
+            permissions.append(
+                ProjectPermission(
+                    user=project.owner, project=project, access=WRITE_PERMISSIONS
+                )
+            )
+            others = [
+                user
+                for user in rng.sample(users, min(len(users), 4))
+                if user != project.owner
+            ][:3]
+            for user in others:
+                access = rng.choice(
+                    [NONE_PERMISSIONS, READ_PERMISSIONS, WRITE_PERMISSIONS]
+                )
+                permissions.append(
+                    ProjectPermission(user=user, project=project, access=access)
+                )
+        ProjectPermission.objects.bulk_create(permissions, batch_size=BATCH_SIZE)
+        Event.objects.bulk_create(
+            [Event.for_project(project, CREATED) for project in projects],
+            batch_size=BATCH_SIZE,
+        )
+        return projects
+
+    def create_documents(self, rng, users, projects, sentences, options):
+        # A few projects hold most of the documents, as in real use
+        weights = [rng.paretovariate(1.2) for _ in projects]
+        for batch_start in range(0, options["documents"], BATCH_SIZE):
+            documents = []
+            for i in range(
+                batch_start, min(batch_start + BATCH_SIZE, options["documents"])
+            ):
+                text = self.document_text(rng, sentences, options["median_length"])
+                documents.append(
+                    Document(
+                        name=f"Document {i}",
+                        owner=rng.choice(users),
+                        project=rng.choices(projects, weights=weights)[0],
+                        text=text,
+                        entities=[
+                            [match.start(), match.end(), rng.choice(LABELS)]
+                            for match in ENTITY_PATTERN.finditer(text)
+                        ],
+                        model_version=MODEL_VERSION,
+                        tagging_status=TAGGING_DONE,
+                    )
+                )
+            documents = Document.objects.bulk_create(documents)
+            index_entities(documents)
+            events = [Event.for_document(document, CREATED) for document in documents]
+            events += [Event.for_document(document, UPDATED) for document in documents]
+            Event.objects.bulk_create(events)
+            self.stdout.write(
+                f"Created {batch_start + len(documents)}/{options['documents']} documents"
+            )
+
+    @staticmethod
+    def document_text(rng, sentences, median_length):
+        length = min(
+            max(int(rng.lognormvariate(math.log(median_length), 0.8)), 100),
+            100 * median_length,
+        )
+        parts = []
+        size = 0
+        while size < length:
+            parts.append(rng.choice(sentences))
+            size += len(parts[-1]) + 1
+        return " ".join(parts)
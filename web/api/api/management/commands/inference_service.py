@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.inference import MicroBatchingServer
+
+
+class Command(BaseCommand):
+    help = "Run the micro-batching NER inference service used by /api/tag/"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.NER_SERVICE_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--max-wait",
+            type=float,
+            default=settings.NER_SERVICE_MAX_WAIT,
+            help="Maximum number of seconds to wait for a batch to fill up",
+        )
+
+    def handle(self, *args, **options):
+        server = MicroBatchingServer(
+            settings.NER_SERVICE_SOCKET,
+            settings.NER_SERVICE_AUTHKEY,
+            options["batch_size"],
+            options["max_wait"],
+        )
+        self.stdout.write(
+            f"Inference service listening on {settings.NER_SERVICE_SOCKET}"
+        )
+        server.serve_forever()
@@ -0,0 +1,82 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Fields of /proc/<pid>/smaps_rollup included in the report, all in kB
+MEMORY_FIELDS = (
+    "Rss",
+    "Pss",
+    "Shared_Clean",
+    "Shared_Dirty",
+    "Private_Clean",
+    "Private_Dirty",
+)
+
+
+class Command(BaseCommand):
+    help = "Report the memory used by the gunicorn master and each of its workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pidfile",
+            default=os.environ.get("GUNICORN_PIDFILE", "/tmp/gunicorn.pid"),
+            help="Pidfile written by the gunicorn master",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["pidfile"], encoding="utf-8") as file:
+                master_pid = int(file.read().strip())
+        except (OSError, ValueError) as error:
+            raise CommandError(
+                f"Could not read the gunicorn master pid: {error}"
+            ) from error
+
+        processes = [("master", master_pid)] + [
+            (f"worker {i}", pid)
+            for i, pid in enumerate(self.child_pids(master_pid), start=1)
+        ]
+        self.stdout.write(
+            f"{'process':<10} {'pid':>7} "
+            + " ".join(f"{field + ' MB':>16}" for field in MEMORY_FIELDS)
+        )
+        totals = dict.fromkeys(MEMORY_FIELDS, 0)
+        for name, pid in processes:
+            try:
+                memory = self.read_memory(pid)
+            except FileNotFoundError:
+                # The worker exited, e.g. it was restarted by gunicorn, after the pids
+                # were listed
+                continue
+            for field in MEMORY_FIELDS:
+                totals[field] += memory[field]
+            self.stdout.write(
+                f"{name:<10} {pid:>7} "
+                + " ".join(f"{memory[field] / 1024:>16.1f}" for field in MEMORY_FIELDS)
+            )
+        self.stdout.write(
+            f"{'total':<10} {'':>7} "
+            + " ".join(f"{totals[field] / 1024:>16.1f}" for field in MEMORY_FIELDS)
+        )
+        # Pss splits shared pages between the processes using them, so its total is the
+        # real memory footprint
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Actual footprint (total Pss): {totals['Pss'] / 1024:.1f} MB"
+            )
+        )
+
+    @staticmethod
+    def child_pids(pid):
+        with open(f"/proc/{pid}/task/{pid}/children", encoding="utf-8") as file:
+            return [int(child) for child in file.read().split()]
+
+    @staticmethod
+    def read_memory(pid):
+        memory = dict.fromkeys(MEMORY_FIELDS, 0)
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as file:
+            for line in file:
+                field, _, value = line.partition(":")
+                if field in memory:
+                    memory[field] = int(value.split()[0])
+        return memory
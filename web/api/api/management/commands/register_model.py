@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ner import registry
+
+
+class Command(BaseCommand):
+    help = "Copy a trained spaCy pipeline into the model registry as a new version"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help="Directory of the pipeline, e.g. the model-best directory from spacy train",
+        )
+        parser.add_argument(
+            "version", help="Name of the new version, e.g. en_pipeline-0.0.2"
+        )
+        parser.add_argument(
+            "--activate",
+            action="store_true",
+            help="Tag with the new version once it is copied",
+        )
+
+    def handle(self, *args, **options):
+        version = options["version"]
+        if not os.path.isfile(os.path.join(options["path"], "meta.json")):
+            raise CommandError(f"{options['path']} is not a spaCy pipeline directory")
+        if version == "active" or version.startswith(".") or os.sep in version:
+            raise CommandError(f"{version} is not a valid version name")
+        if version in registry.versions():
+            raise CommandError(f"Model version {version} is already registered")
+        os.makedirs(registry.root, exist_ok=True)
+        # Copy into a hidden directory and rename it into place, so a half-copied
+        # version is never visible
+        staging = tempfile.mkdtemp(prefix=".", dir=registry.root)
+        try:
+            shutil.copytree(options["path"], os.path.join(staging, "model"))
+            os.rename(
+                os.path.join(staging, "model"), os.path.join(registry.root, version)
+            )
+        finally:
+            shutil.rmtree(staging)
+        self.stdout.write(f"Registered model version {version}")
+        if options["activate"]:
+            registry.activate(version)
+            self.stdout.write(f"Activated model version {version}")
@@ -0,0 +1,230 @@
+import json
+import multiprocessing
+import time
+from collections import deque
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.models import Document
+from api.ner import get_model
+from api.tasks import (
+    BULK_QUEUE,
+    LOWEST_PRIORITY,
+    perform_tagging_batch,
+    queue_length,
+    redis_client,
+)
+
+# Progress of the last run, kept in Redis so that a run can be resumed from any
+# container
+CHECKPOINT_KEY = "ner:retag:checkpoint"
+# Seconds between checks on the batches in flight
+POLL_INTERVAL = 0.5
+
+
+def tag_batch(document_ids, force):
+    perform_tagging_batch(document_ids, force=force)
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-tag existing documents with the active model, in id order and in batches on the bulk Celery workers or a "
+        "local process pool. Progress is checkpointed after every batch so an interrupted run can be resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-tag every document, not only those tagged by another model version",
+        )
+        parser.add_argument(
+            "--project", type=int, help="Only re-tag the documents of this project"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=32, help="Documents per batch"
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=0,
+            help="Tag in a local pool of this many processes instead of on the Celery workers",
+        )
+        parser.add_argument(
+            "--max-in-flight",
+            type=int,
+            default=4,
+            help="Batches queued or being tagged at once",
+        )
+        parser.add_argument(
+            "--max-queue",
+            type=int,
+            default=10,
+            help="Wait while the bulk Celery queue holds more than this many tasks",
+        )
+        parser.add_argument(
+            "--rate", type=float, help="Maximum number of documents per second"
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue from the checkpoint of the last run",
+        )
+        parser.add_argument(
+            "--report-interval",
+            type=float,
+            default=10,
+            help="Seconds between progress reports",
+        )
+
+    def handle(self, *args, **options):
+        model_version = get_model().version
+        documents = Document.objects.order_by("id")
+        if not options["all"]:
+            # exclude() keeps the documents that have never been tagged, whose
+            # model_version is null
+            documents = documents.exclude(model_version=model_version)
+        if options["project"]:
+            documents = documents.filter(project_id=options["project"])
+        self.run_options = {
+            "model_version": model_version,
+            "all": options["all"],
+            "project": options["project"],
+        }
+        self.last_id = self.load_checkpoint() if options["resume"] else 0
+        self.total = documents.filter(id__gt=self.last_id).count()
+        self.tagged = 0
+        self.stdout.write(
+            f"Re-tagging {self.total} documents with model {model_version}"
+        )
+
+        if options["processes"]:
+            # Close the connections before forking, each process opens its own
+            connections.close_all()
+            pool = multiprocessing.get_context("fork").Pool(options["processes"])
+
+            def submit(document_ids):
+                return pool.apply_async(tag_batch, (document_ids, options["all"]))
+
+        else:
+            pool = None
+
+            def submit(document_ids):
+                # Below the priority of any upload
+                return perform_tagging_batch.apply_async(
+                    (document_ids,),
+                    {"force": options["all"]},
+                    queue=BULK_QUEUE,
+                    priority=LOWEST_PRIORITY,
+                )
+
+        # Batches in the order they were queued, as (last document id, number of
+        # documents, result)
+        in_flight = deque()
+        queued = 0
+        queued_up_to = self.last_id
+        self.start = self.reported_at = time.monotonic()
+        try:
+            while True:
+                # Keyset pagination, each page starts after the last id of the previous
+                # one
+                document_ids = list(
+                    documents.filter(id__gt=queued_up_to).values_list("id", flat=True)[
+                        : options["batch_size"]
+                    ]
+                )
+                if not document_ids:
+                    break
+                while len(in_flight) >= options["max_in_flight"] or (
+                    pool is None and self.queue_busy(options)
+                ):
+                    time.sleep(POLL_INTERVAL)
+                    self.collect(in_flight, options)
+                if options["rate"]:
+                    time.sleep(
+                        max(
+                            0,
+                            queued / options["rate"] - (time.monotonic() - self.start),
+                        )
+                    )
+                in_flight.append(
+                    (document_ids[-1], len(document_ids), submit(document_ids))
+                )
+                queued += len(document_ids)
+                queued_up_to = document_ids[-1]
+                self.collect(in_flight, options)
+            while in_flight:
+                time.sleep(POLL_INTERVAL)
+                self.collect(in_flight, options)
+        except KeyboardInterrupt:
+            raise CommandError(
+                f"Interrupted after document {self.last_id}, run again with --resume to continue"
+            )
+        finally:
+            if pool is not None:
+                pool.terminate()
+        redis_client.delete(CHECKPOINT_KEY)
+        self.report()
+        self.stdout.write(self.style.SUCCESS(f"Re-tagged {self.tagged} documents"))
+
+    def load_checkpoint(self):
+        checkpoint = redis_client.get(CHECKPOINT_KEY)
+        if checkpoint is None:
+            raise CommandError("There is no checkpoint to resume from")
+        checkpoint = json.loads(checkpoint)
+        if checkpoint["options"] != self.run_options:
+            raise CommandError(
+                f"The checkpoint is from a run with other options: {checkpoint['options']}"
+            )
+        self.stdout.write(f"Resuming after document {checkpoint['last_id']}")
+        return checkpoint["last_id"]
+
+    def save_checkpoint(self):
+        redis_client.set(
+            CHECKPOINT_KEY,
+            json.dumps({"last_id": self.last_id, "options": self.run_options}),
+        )
+
+    @staticmethod
+    def queue_busy(options):
+        """
+        Whether the bulk Celery queue, which uploads share, is longer than --max-queue
+        """
+        return queue_length(BULK_QUEUE) > options["max_queue"]
+
+    def collect(self, in_flight, options):
+        """
+        Checkpoint the batches finished so far, in order, so the checkpoint never skips
+        an unfinished batch
+        """
+        finished = False
+        while in_flight and in_flight[0][2].ready():
+            last_id, count, result = in_flight.popleft()
+            try:
+                result.get()
+            except Exception as error:
+                raise CommandError(
+                    f"Tagging the batch ending at document {last_id} failed: {error!r}, run again with --resume to "
+                    "retry it"
+                ) from error
+            self.last_id = last_id
+            self.tagged += count
+            finished = True
+        if finished:
+            self.save_checkpoint()
+        if time.monotonic() - self.reported_at >= options["report_interval"]:
+            self.report()
+
+    def report(self):
+        self.reported_at = time.monotonic()
+        rate = self.tagged / max(self.reported_at - self.start, 1e-9)
+        eta = (
+            timedelta(seconds=round(max(self.total - self.tagged, 0) / rate))
+            if rate
+            else "unknown"
+        )
+        self.stdout.write(
+            f"{self.tagged}/{self.total} documents, {rate:.2f} docs/sec, ETA {eta}"
+        )
@@ -0,0 +1,116 @@
+"""
+Prometheus metrics for the tagging pipeline, recorded in the web workers for Quick Tag
+and in the Celery workers for documents. With PROMETHEUS_MULTIPROC_DIR set, every
+process writes its samples to that directory and /metrics adds them up, see
+core/__init__.py.
+"""
+
+import time
+from contextlib import contextmanager
+
+from celery.signals import before_task_publish, task_prerun
+from prometheus_client import Counter, Histogram
+
+# Inference on long documents can take minutes
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+QUEUE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+# Upper bounds of the document size labels, in characters
+SIZES = ((1000, "1k"), (5000, "5k"), (20000, "20k"), (100000, "100k"))
+
+queue_seconds = Histogram(
+    "ner_tagging_queue_seconds",
+    "Time from queueing a tagging task to a worker starting it",
+    ["task"],
+    buckets=QUEUE_BUCKETS,
+)
+phase_seconds = Histogram(
+    "ner_tagging_phase_seconds",
+    "Time spent in each phase of tagging",
+    ["path", "phase"],
+    buckets=LATENCY_BUCKETS,
+)
+inference_seconds = Histogram(
+    "ner_tagging_inference_seconds",
+    "Time spent running the model over a text, by the text's size",
+    ["path", "size"],
+    buckets=LATENCY_BUCKETS,
+)
+tokens_processed = Counter(
+    "ner_tagging_tokens", "Tokens run through the model", ["path"]
+)
+documents_tagged = Counter(
+    "ner_tagging_documents",
+    "Texts tagged, including those served from the cache",
+    ["path"],
+)
+entities_found = Counter(
+    "ner_tagging_entities", "Entities found in tagged texts", ["path", "label"]
+)
+failures = Counter(
+    "ner_tagging_failures", "Tagging attempts that raised an error", ["path"]
+)
+
+
+def size_label(length):
+    for limit, label in SIZES:
+        if length <= limit:
+            return f"<={label}"
+    return f">{SIZES[-1][1]}"
+
+
+def phase(path, name):
+    """Context manager timing a phase of tagging"""
+    return phase_seconds.labels(path, name).time()
+
+
+@contextmanager
+def count_failures(path):
+    """
+    Count the errors raised in the block, or by the decorated function, as failures of
+    the tagging path
+    """
+    try:
+        yield
+    except Exception:
+        failures.labels(path).inc()
+        raise
+
+
+def run_model(pipeline, text, path):
+    """
+    Run the pipeline over text, recording the inference time against the text's size and
+    the tokens processed
+    """
+    start = time.perf_counter()
+    doc = pipeline(text)
+    elapsed = time.perf_counter() - start
+    phase_seconds.labels(path, "inference").observe(elapsed)
+    inference_seconds.labels(path, size_label(len(text))).observe(elapsed)
+    tokens_processed.labels(path).inc(len(doc))
+    return doc
+
+
+def record_tagged(path, entities):
+    documents_tagged.labels(path).inc()
+    for _, _, label in entities:
+        entities_found.labels(path, label).inc()
+
+
+@before_task_publish.connect
+def stamp_enqueued_at(headers=None, **kwargs):
+    if headers is not None:
+        headers["enqueued_at"] = time.time()
+
+
+@task_prerun.connect
+def observe_queue_time(task=None, **kwargs):
+    # Custom headers are on the request itself with Celery's message protocol 2, and in
+    # request.headers with 1
+    enqueued_at = getattr(task.request, "enqueued_at", None) or (
+        task.request.headers or {}
+    ).get("enqueued_at")
+    # Tasks called directly rather than through a worker were never queued
+    if enqueued_at and not task.request.called_directly:
+        queue_seconds.labels(task.name.rsplit(".", 1)[-1]).observe(
+            max(time.time() - enqueued_at, 0)
+        )
@@ -0,0 +1,124 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from prometheus_client import Histogram
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+request_queries = Histogram(
+    "django_request_queries",
+    "SQL queries run by a request",
+    ["view"],
+    buckets=QUERY_BUCKETS,
+)
+request_db_seconds = Histogram(
+    "django_request_db_seconds",
+    "Time a request spent waiting for SQL queries",
+    ["view"],
+    buckets=TIME_BUCKETS,
+)
+request_python_seconds = Histogram(
+    "django_request_python_seconds",
+    "Time a request spent outside SQL queries",
+    ["view"],
+    buckets=TIME_BUCKETS,
+)
+
+# Only one profiler can be active in a process at a time, other sampled requests go
+# unprofiled meanwhile
+profiler_lock = threading.Lock()
+
+
+def view_name(request):
+    return (request.resolver_match and request.resolver_match.url_name) or "unnamed"
+
+
+class QueryStats:
+    """
+    Execute wrapper counting the queries run on a connection and the time spent in them
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class RequestProfilingMiddleware:
+    """
+    Records the number of SQL queries, the time spent in them and the rest of the time
+    each request takes, as X-Query-Count and Server-Timing response headers and as
+    Prometheus histograms by URL name. A sample of requests is run under cProfile, and
+    the profiles of those slower than REQUEST_PROFILING_SLOW seconds are written to
+    REQUEST_PROFILING_DIR. Enabled with REQUEST_PROFILING.
+
+    Streamed responses are only measured up to the start of the stream.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if settings.REQUEST_PROFILING_SAMPLE_RATE:
+            os.makedirs(settings.REQUEST_PROFILING_DIR, exist_ok=True)
+
+    def __call__(self, request):
+        queries = QueryStats()
+        profiler = None
+        if (
+            random.random() < settings.REQUEST_PROFILING_SAMPLE_RATE
+            and profiler_lock.acquire(blocking=False)
+        ):
+            profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                # Connections are per thread, so this only sees the queries of this
+                # request
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(queries))
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler:
+                        profiler.disable()
+            elapsed = time.perf_counter() - start
+            if profiler and elapsed >= settings.REQUEST_PROFILING_SLOW:
+                self.dump_profile(profiler, request, elapsed)
+        finally:
+            if profiler:
+                profiler_lock.release()
+
+        view = view_name(request)
+        python_seconds = max(elapsed - queries.seconds, 0)
+        request_queries.labels(view).observe(queries.count)
+        request_db_seconds.labels(view).observe(queries.seconds)
+        request_python_seconds.labels(view).observe(python_seconds)
+        response["X-Query-Count"] = str(queries.count)
+        response["Server-Timing"] = (
+            f'db;dur={queries.seconds * 1000:.1f};desc="{queries.count} queries", '
+            f"python;dur={python_seconds * 1000:.1f}"
+        )
+        return response
+
+    @staticmethod
+    def dump_profile(profiler, request, elapsed):
+        file_name = f"{view_name(request)}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{int(elapsed * 1000)}ms.pstats"
+        profiler.dump_stats(os.path.join(settings.REQUEST_PROFILING_DIR, file_name))
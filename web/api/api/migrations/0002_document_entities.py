@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="entities",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
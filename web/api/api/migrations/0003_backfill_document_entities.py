@@ -0,0 +1,91 @@
+from html.parser import HTMLParser
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+# Copied from api.utils as it was when this migration was written, so that later changes
+# to it do not change what the migration does
+class DisplacyEntityParser(HTMLParser):
+    """
+    Collects the (text, label) pairs of the <mark> elements in displacy "ent" HTML, in
+    document order
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.entities = []
+        self.in_mark = False
+        self.in_label = False
+        self.text = ""
+        self.label = ""
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "mark":
+            self.in_mark = True
+            self.text = ""
+            self.label = ""
+        elif tag == "span" and self.in_mark:
+            self.in_label = True
+
+    def handle_endtag(self, tag):
+        if tag == "span" and self.in_label:
+            self.in_label = False
+        elif tag == "mark" and self.in_mark:
+            self.in_mark = False
+            self.entities.append((self.text, self.label))
+
+    def handle_data(self, data):
+        if self.in_label:
+            self.label += data
+        elif self.in_mark:
+            self.text += data
+
+
+def entities_from_html(text, tagged_html):
+    """
+    Recover [start, end, label] entity spans over text from the displacy HTML it was
+    rendered to. The rendered HTML has lost newlines and runs of whitespace, so each
+    entity is located in text after the end of the previous one rather than trusting
+    offsets in the HTML. Entities that cannot be found are skipped.
+    """
+    parser = DisplacyEntityParser()
+    parser.feed(tagged_html)
+    parser.close()
+    entities = []
+    offset = 0
+    for entity_text, label in parser.entities:
+        entity_text = entity_text.strip()
+        start = text.find(entity_text, offset)
+        if start == -1 or not entity_text:
+            continue
+        offset = start + len(entity_text)
+        entities.append([start, offset, label.strip()])
+    return entities
+
+
+def backfill_entities(apps, schema_editor):
+    Document = apps.get_model("api", "Document")
+    documents = Document.objects.filter(
+        tagged_text__isnull=False, entities__isnull=True
+    ).only("id", "text", "tagged_text")
+    batch = []
+    for document in documents.iterator(chunk_size=BATCH_SIZE):
+        document.entities = entities_from_html(document.text, document.tagged_text)
+        batch.append(document)
+        if len(batch) == BATCH_SIZE:
+            Document.objects.bulk_update(batch, ["entities"])
+            batch = []
+    Document.objects.bulk_update(batch, ["entities"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_document_entities"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_entities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_backfill_document_entities"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="document",
+            name="tagged_text",
+        ),
+    ]
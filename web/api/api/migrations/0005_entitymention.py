@@ -0,0 +1,63 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:03
+
+import django.db.models.deletion
+import django_prometheus.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_remove_document_tagged_text"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EntityMention",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("text", models.CharField(max_length=255)),
+                ("label", models.CharField(max_length=64)),
+                ("start", models.PositiveIntegerField()),
+                ("end", models.PositiveIntegerField()),
+                (
+                    "document",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="entity_mentions",
+                        to="api.document",
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="api.project"
+                    ),
+                ),
+            ],
+            bases=(
+                django_prometheus.models.ExportModelOperationsMixin("entity_mention"),
+                models.Model,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="entitymention",
+            index=models.Index(
+                fields=["text", "label", "document"], name="api_entitym_text_2c81b7_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="entitymention",
+            index=models.Index(
+                fields=["label", "document"], name="api_entitym_label_9f9e78_idx"
+            ),
+        ),
+    ]
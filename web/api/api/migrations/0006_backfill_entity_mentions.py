@@ -0,0 +1,45 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+# Copied from api.utils as it was when this migration was written, so that later changes
+# to it do not change what the migration does
+def normalise_entity_text(text):
+    return " ".join(text.casefold().split())[:255]
+
+
+def backfill_entity_mentions(apps, schema_editor):
+    Document = apps.get_model("api", "Document")
+    EntityMention = apps.get_model("api", "EntityMention")
+    documents = Document.objects.filter(entities__isnull=False).only(
+        "id", "project_id", "text", "entities"
+    )
+    mentions = []
+    for document in documents.iterator(chunk_size=BATCH_SIZE):
+        for start, end, label in document.entities:
+            mentions.append(
+                EntityMention(
+                    document_id=document.id,
+                    project_id=document.project_id,
+                    text=normalise_entity_text(document.text[start:end]),
+                    label=label,
+                    start=start,
+                    end=end,
+                )
+            )
+        if len(mentions) >= BATCH_SIZE:
+            EntityMention.objects.bulk_create(mentions)
+            mentions = []
+    EntityMention.objects.bulk_create(mentions)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_entitymention"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_entity_mentions, migrations.RunPython.noop),
+    ]
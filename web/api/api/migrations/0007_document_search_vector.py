@@ -0,0 +1,63 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:04
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Keeps search_vector up to date on every insert and update, including bulk_create and
+# queryset.update(). The name is weighted above the text so that documents whose name
+# matches rank first. The vector is only recomputed when the name or text changes, so
+# saving the entities of a document does not pay for it again.
+CREATE_TRIGGER = """
+CREATE FUNCTION api_document_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.name IS NOT DISTINCT FROM OLD.name AND NEW.text IS NOT DISTINCT FROM OLD.text THEN
+        NEW.search_vector := OLD.search_vector;
+    ELSE
+        NEW.search_vector :=
+            setweight(to_tsvector('pg_catalog.english', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('pg_catalog.english', coalesce(NEW.text, '')), 'B');
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_document_search_vector_update BEFORE INSERT OR UPDATE ON api_document
+FOR EACH ROW EXECUTE FUNCTION api_document_search_vector_update();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER api_document_search_vector_update ON api_document;
+DROP FUNCTION api_document_search_vector_update();
+"""
+
+BACKFILL = """
+UPDATE api_document SET search_vector =
+    setweight(to_tsvector('pg_catalog.english', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('pg_catalog.english', coalesce(text, '')), 'B');
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_backfill_entity_mentions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name="document",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="api_documen_search__895728_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:07
+
+import django.db.models.deletion
+import django_prometheus.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_document_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="default_access",
+            field=models.CharField(
+                choices=[("none", "None"), ("read", "Read"), ("write", "Write")],
+                default="none",
+                max_length=5,
+            ),
+        ),
+        migrations.CreateModel(
+            name="ProjectPermission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "access",
+                    models.CharField(
+                        choices=[
+                            ("none", "None"),
+                            ("read", "Read"),
+                            ("write", "Write"),
+                        ],
+                        max_length=5,
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="permissions",
+                        to="api.project",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            bases=(
+                django_prometheus.models.ExportModelOperationsMixin(
+                    "project_permission"
+                ),
+                models.Model,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="projectpermission",
+            constraint=models.UniqueConstraint(
+                fields=("user", "project"), name="unique_project_permission"
+            ),
+        ),
+    ]
@@ -0,0 +1,85 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+ACCESS_LEVELS = ("read", "write")
+
+
+def copy_project_permissions(apps, schema_editor):
+    CustomUser = apps.get_model("api", "CustomUser")
+    Project = apps.get_model("api", "Project")
+    ProjectPermission = apps.get_model("api", "ProjectPermission")
+    project_owners = dict(Project.objects.values_list("id", "owner_id"))
+    user_count = CustomUser.objects.count()
+    # Collect every user's access to each project from their HStore of project id to
+    # access level
+    project_access = defaultdict(dict)
+    users = CustomUser.objects.exclude(project_permissions=None).only(
+        "id", "project_permissions"
+    )
+    for user in users.iterator(chunk_size=BATCH_SIZE):
+        for project_id, access in user.project_permissions.items():
+            if (
+                project_id.isdigit()
+                and int(project_id) in project_owners
+                and access in ACCESS_LEVELS
+            ):
+                project_access[int(project_id)][user.id] = access
+    permissions = []
+    for project_id, accesses in project_access.items():
+        # Projects created with "read" or "write" permissions gave every user the same
+        # access, then gave the creator "write", so when one access level covers every
+        # user but the owner it becomes the project's default and only the exceptions
+        # need rows
+        owner_id = project_owners[project_id]
+        others = {access for user_id, access in accesses.items() if user_id != owner_id}
+        if len(accesses) == user_count and len(others) == 1:
+            default_access = others.pop()
+            Project.objects.filter(id=project_id).update(default_access=default_access)
+            accesses = {
+                user_id: access
+                for user_id, access in accesses.items()
+                if access != default_access
+            }
+        permissions.extend(
+            ProjectPermission(user_id=user_id, project_id=project_id, access=access)
+            for user_id, access in accesses.items()
+        )
+    ProjectPermission.objects.bulk_create(
+        permissions, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def copy_project_permissions_back(apps, schema_editor):
+    CustomUser = apps.get_model("api", "CustomUser")
+    Project = apps.get_model("api", "Project")
+    ProjectPermission = apps.get_model("api", "ProjectPermission")
+    defaults = {
+        str(project_id): access
+        for project_id, access in Project.objects.filter(
+            default_access__in=ACCESS_LEVELS
+        ).values_list("id", "default_access")
+    }
+    user_permissions = defaultdict(lambda: dict(defaults))
+    for user_id, project_id, access in ProjectPermission.objects.values_list(
+        "user_id", "project_id", "access"
+    ):
+        if access in ACCESS_LEVELS:
+            user_permissions[user_id][str(project_id)] = access
+        else:
+            user_permissions[user_id].pop(str(project_id), None)
+    for user in CustomUser.objects.only("id", "project_permissions"):
+        user.project_permissions = user_permissions[user.id]
+        user.save(update_fields=["project_permissions"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_project_permissions"),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_project_permissions, copy_project_permissions_back),
+    ]
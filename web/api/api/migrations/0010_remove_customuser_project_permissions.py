@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_copy_project_permissions"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="customuser",
+            name="project_permissions",
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_event"),
+    ]
+
+    operations = [
+        # Record a created event for every existing project and document, and an updated
+        # event for those saved again after they were created. Events are inserted in
+        # timestamp order so that ids follow the order they happened.
+        migrations.RunSQL(
+            """
+            INSERT INTO api_event (project_id, document_id, name, action, "timestamp")
+            SELECT project_id, document_id, name, action, "timestamp" FROM (
+                SELECT id AS project_id, NULL::bigint AS document_id, name, 'created' AS action,
+                       created_at AS "timestamp"
+                FROM api_project
+                UNION ALL
+                SELECT project_id, id, name, 'created', created_at FROM api_document
+                UNION ALL
+                SELECT id, NULL, name, 'updated', updated_at FROM api_project
+                WHERE updated_at > created_at + interval '1 second'
+                UNION ALL
+                SELECT project_id, id, name, 'updated', updated_at FROM api_document
+                WHERE updated_at > created_at + interval '1 second'
+            ) events
+            ORDER BY "timestamp";
+            """,
+            "DELETE FROM api_event;",
+        ),
+    ]
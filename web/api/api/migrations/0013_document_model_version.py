@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_backfill_events"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="model_version",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_document_model_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="tagging_status",
+            field=models.CharField(
+                choices=[
+                    ("queued", "Queued"),
+                    ("running", "Running"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                ],
+                default="queued",
+                max_length=7,
+            ),
+        ),
+        # Documents that already have entities have been tagged
+        migrations.RunSQL(
+            "UPDATE api_document SET tagging_status = 'done' WHERE entities IS NOT NULL;",
+            migrations.RunSQL.noop,
+        ),
+    ]
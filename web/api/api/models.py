@@ -1,26 +1,181 @@
 from django.contrib.auth.models import AbstractUser
-from django.contrib.postgres.fields import HStoreField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django_prometheus.models import ExportModelOperationsMixin
 
+from .permissions import NONE_PERMISSIONS, READ_PERMISSIONS, WRITE_PERMISSIONS
 
-class CustomUser(ExportModelOperationsMixin('user'), AbstractUser):
+ACCESS_CHOICES = [
+    (NONE_PERMISSIONS, "None"),
+    (READ_PERMISSIONS, "Read"),
+    (WRITE_PERMISSIONS, "Write"),
+]
+
+CREATED = "created"
+UPDATED = "updated"
+EVENT_ACTIONS = [
+    (CREATED, "Created"),
+    (UPDATED, "Updated"),
+]
+
+TAGGING_QUEUED = "queued"
+TAGGING_RUNNING = "running"
+TAGGING_DONE = "done"
+TAGGING_FAILED = "failed"
+TAGGING_STATUSES = [
+    (TAGGING_QUEUED, "Queued"),
+    (TAGGING_RUNNING, "Running"),
+    (TAGGING_DONE, "Done"),
+    (TAGGING_FAILED, "Failed"),
+]
+
+
+class CustomUser(ExportModelOperationsMixin("user"), AbstractUser):
     create_projects = models.BooleanField(default=False)
-    project_permissions = HStoreField(blank=True, null=True)
 
 
-class Project(ExportModelOperationsMixin('project'), models.Model):
+class ProjectQuerySet(models.QuerySet):
+    def with_access(self, user):
+        # The user's own permission for the project if they have one, otherwise the
+        # project's default access
+        permission = ProjectPermission.objects.filter(
+            project=OuterRef("pk"), user=user
+        ).values("access")[:1]
+        return self.annotate(access=Coalesce(Subquery(permission), F("default_access")))
+
+    def accessible_to(self, user):
+        return self.with_access(user).exclude(access=NONE_PERMISSIONS)
+
+
+class DocumentQuerySet(models.QuerySet):
+    def with_access(self, user):
+        # The user's access to the document's project, as in ProjectQuerySet.with_access
+        permission = ProjectPermission.objects.filter(
+            project=OuterRef("project"), user=user
+        ).values("access")[:1]
+        return self.annotate(
+            access=Coalesce(Subquery(permission), F("project__default_access"))
+        )
+
+
+class Project(ExportModelOperationsMixin("project"), models.Model):
     name = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    # Access every user has to the project unless they have their own ProjectPermission
+    default_access = models.CharField(
+        max_length=5, choices=ACCESS_CHOICES, default=NONE_PERMISSIONS
+    )
+
+    objects = ProjectQuerySet.as_manager()
+
+
+class ProjectPermission(ExportModelOperationsMixin("project_permission"), models.Model):
+    """A user's access to a project, overriding the project's default_access"""
 
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="permissions"
+    )
+    access = models.CharField(max_length=5, choices=ACCESS_CHOICES)
 
-class Document(ExportModelOperationsMixin('document'), models.Model):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "project"], name="unique_project_permission"
+            ),
+        ]
+
+
+class Document(ExportModelOperationsMixin("document"), models.Model):
     name = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     text = models.TextField()
-    tagged_text = models.TextField(blank=True, null=True)
+    # Entity spans as [start, end, label] lists, with character offsets into text
+    entities = models.JSONField(blank=True, null=True)
+    # Version of the model that found the entities, see api/ner.py
+    model_version = models.CharField(max_length=255, blank=True, null=True)
+    # Whether the entities are up to date with text, tagging tasks skip documents
+    # already done with the active model
+    tagging_status = models.CharField(
+        max_length=7, choices=TAGGING_STATUSES, default=TAGGING_QUEUED
+    )
+    # Kept up to date from name and text by a database trigger, see migration 0007
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
+
+    objects = DocumentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"]),
+        ]
+
+
+class EntityMention(ExportModelOperationsMixin("entity_mention"), models.Model):
+    """
+    An entity found in a document, indexed by its normalised text and label for
+    searching
+    """
+
+    document = models.ForeignKey(
+        Document, on_delete=models.CASCADE, related_name="entity_mentions"
+    )
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    text = models.CharField(max_length=255)
+    label = models.CharField(max_length=64)
+    start = models.PositiveIntegerField()
+    end = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["text", "label", "document"]),
+            models.Index(fields=["label", "document"]),
+        ]
+
+
+class Event(ExportModelOperationsMixin("event"), models.Model):
+    """
+    An entry in the append-only activity feed, recorded when a project or document is
+    created or updated
+    """
+
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="events"
+    )
+    # Null for events about the project itself
+    document = models.ForeignKey(
+        Document, on_delete=models.CASCADE, blank=True, null=True
+    )
+    name = models.CharField(max_length=255)
+    action = models.CharField(max_length=7, choices=EVENT_ACTIONS)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["project", "-id"]),
+        ]
+
+    @property
+    def type(self):
+        return "project" if self.document_id is None else "document"
+
+    @classmethod
+    def for_project(cls, project, action):
+        return cls(project_id=project.id, name=project.name, action=action)
+
+    @classmethod
+    def for_document(cls, document, action):
+        return cls(
+            project_id=document.project_id,
+            document_id=document.id,
+            name=document.name,
+            action=action,
+        )
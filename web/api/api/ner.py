@@ -0,0 +1,195 @@
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import spacy
+import torch
+from celery.signals import worker_process_init
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from spacy import displacy
+
+logger = logging.getLogger(__name__)
+
+# Inference backends that can be selected with NER_BACKEND
+BACKENDS = ("torch", "int8")
+
+# Defaults to 1 as a workaround for a bug in spacy, see benchmark_throughput for
+# measuring other values
+torch.set_num_threads(settings.NER_TORCH_THREADS)
+
+
+@worker_process_init.connect
+def set_worker_threads(**kwargs):
+    # Thread settings are per process, so the Celery prefork pool's children set them
+    # again, as gunicorn's workers do in post_fork
+    torch.set_num_threads(settings.NER_TORCH_THREADS)
+
+
+if settings.NER_BACKEND not in BACKENDS:
+    raise ImproperlyConfigured(f"NER_BACKEND must be one of {', '.join(BACKENDS)}")
+
+# A loaded pipeline and the version that identifies the results it produces, e.g.
+# "en_pipeline-0.0.0", or "en_pipeline-0.0.0-int8" when it is quantised, as the
+# quantised model's results can differ slightly
+NERModel = namedtuple("NERModel", ["version", "nlp"])
+
+
+def quantise(pipeline):
+    """
+    Replace the linear layers of the pipeline's transformer with int8 ones that quantise
+    their activations on the fly. Most of roberta's CPU time is spent in these layers,
+    and the rest of the pipeline is unchanged, so it still produces the same kind of
+    entity spans.
+    """
+    shim = pipeline.get_pipe("transformer").model.layers[0].shims[0]
+    shim._model = torch.quantization.quantize_dynamic(
+        shim._model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+class ModelRegistry:
+    """
+    Versioned model directories under root, with the "active" symlink pointing at the
+    one to tag with. Processes check the pointer at most every check_interval seconds
+    and load the new model when it changes, carrying on with the old one until it has
+    loaded. Without an active model, the model at default_path is used.
+    """
+
+    def __init__(self, root, default_path, check_interval):
+        self.root = root
+        self.default_path = default_path
+        self.check_interval = check_interval
+        self.model = None
+        # What the active pointer referred to when the current model was loaded
+        self.pointer_version = None
+        self.checked_at = 0
+        self.lock = threading.Lock()
+
+    @property
+    def pointer(self):
+        return os.path.join(self.root, "active")
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name
+            for name in os.listdir(self.root)
+            if name != "active"
+            and not name.startswith(".")
+            and os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def active_version(self):
+        """
+        The version the active pointer refers to, or None if there is no active model
+        """
+        try:
+            return os.path.basename(os.readlink(self.pointer))
+        except OSError:
+            return None
+
+    def activate(self, version):
+        """
+        Point the active pointer at version, replacing the old pointer in one atomic
+        rename
+        """
+        if version not in self.versions():
+            raise ValueError(f"Model version {version} is not in the registry")
+        temporary = f"{self.pointer}.{os.getpid()}"
+        os.symlink(version, temporary)
+        os.replace(temporary, self.pointer)
+
+    def path(self, version):
+        return os.path.join(self.root, version) if version else self.default_path
+
+    def load(self, version):
+        nlp = spacy.load(self.path(version))
+        if settings.NER_BACKEND == "int8":
+            quantise(nlp)
+        name = version or f"{nlp.meta['lang']}_{nlp.meta['name']}-{nlp.meta['version']}"
+        return NERModel(
+            (
+                name
+                if settings.NER_BACKEND == "torch"
+                else f"{name}-{settings.NER_BACKEND}"
+            ),
+            nlp,
+        )
+
+    def get(self):
+        """
+        The active model, loading it if the active pointer has changed since it was last
+        checked
+        """
+        if (
+            self.model is not None
+            and time.monotonic() - self.checked_at < self.check_interval
+        ):
+            return self.model
+        # Only one thread checks and loads, the others keep using the current model in
+        # the meantime
+        if not self.lock.acquire(blocking=self.model is None):
+            return self.model
+        try:
+            if (
+                self.model is None
+                or time.monotonic() - self.checked_at >= self.check_interval
+            ):
+                version = self.active_version()
+                if self.model is None:
+                    self.model = self.load(version)
+                elif version != self.pointer_version:
+                    self.model = self.reload(version)
+                self.pointer_version = version
+                self.checked_at = time.monotonic()
+            return self.model
+        finally:
+            self.lock.release()
+
+    def reload(self, version):
+        try:
+            model = self.load(version)
+        except Exception:
+            # A broken model directory must not stop tagging, keep the current model
+            # until the pointer changes again
+            logger.exception("Could not load model version %s", version)
+            return self.model
+        logger.info("Switched from model %s to %s", self.model.version, model.version)
+        return model
+
+
+registry = ModelRegistry(
+    settings.NER_MODEL_REGISTRY,
+    settings.NER_MODEL_PATH,
+    settings.NER_MODEL_CHECK_INTERVAL,
+)
+
+
+def get_model():
+    return registry.get()
+
+
+# Loaded once per process. When gunicorn preloads the app this happens in the master
+# before forking, so the weights are shared copy-on-write between workers. No inference
+# may run here, as that would start torch's thread pool in the master and leave the
+# forked workers with a pool whose threads no longer exist.
+get_model()
+
+
+def extract_entities(doc):
+    return [[ent.start_char, ent.end_char, ent.label_] for ent in doc.ents]
+
+
+def render_entities(text, entities):
+    # displacy escapes the text as it renders it, so the HTML is safe to display even if
+    # text contains markup
+    spans = [
+        {"start": start, "end": end, "label": label} for start, end, label in entities
+    ]
+    return displacy.render(
+        {"text": text, "ents": spans}, style="ent", manual=True, minify=True
+    )
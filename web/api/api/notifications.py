@@ -0,0 +1,99 @@
+import json
+import time
+
+import redis
+from django.conf import settings
+from django.db import connection
+
+from .models import UPDATED, Event, Project
+
+redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+# Redis pub/sub channel the Celery workers publish tagged documents to
+TAGGED_CHANNEL = "ner:documents_tagged"
+# Maximum number of missed events sent to a reconnecting client
+REPLAY_LIMIT = 100
+
+
+def tagged_notification(event):
+    return {
+        "id": event.id,
+        "project_id": event.project_id,
+        "document_id": event.document_id,
+        "name": event.name,
+    }
+
+
+def publish_tagged(events):
+    """
+    Notify the open notification streams that the documents of events have been tagged
+    """
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for event in events:
+                pipe.publish(TAGGED_CHANNEL, json.dumps(tagged_notification(event)))
+            pipe.execute()
+    except redis.RedisError:
+        # Clients still see the new entities the next time they fetch the document
+        pass
+
+
+def release_connection():
+    # Streams stay open for minutes, so don't hold on to a database connection between
+    # messages. Django opens a new one if another query is needed, and a connection in
+    # the middle of a transaction is left alone.
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def server_sent_event(notification):
+    return (
+        f"id: {notification['id']}\nevent: tagged\ndata: {json.dumps(notification)}\n\n"
+    )
+
+
+def notification_stream(user, last_event_id=None):
+    """
+    Server-sent events for the documents tagged in the projects the user can access. A
+    client reconnecting with the id of the last event it received is first sent the
+    documents tagged since then, from the activity feed.
+    """
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(TAGGED_CHANNEL)
+    try:
+        # Tell the client how long to wait before reconnecting once the stream ends
+        yield f"retry: {settings.NOTIFICATIONS_RETRY * 1000}\n\n"
+        project_access = dict.fromkeys(
+            Project.objects.accessible_to(user).values_list("id", flat=True), True
+        )
+        if last_event_id is not None:
+            missed = Event.objects.filter(
+                id__gt=last_event_id,
+                project__in=list(project_access),
+                document__isnull=False,
+                action=UPDATED,
+            ).order_by("id")[:REPLAY_LIMIT]
+            for event in missed:
+                yield server_sent_event(tagged_notification(event))
+        release_connection()
+
+        deadline = time.monotonic() + settings.NOTIFICATIONS_MAX_DURATION
+        while time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=settings.NOTIFICATIONS_HEARTBEAT)
+            if message is None:
+                # Comments keep proxies from timing out the connection and let the
+                # server notice closed clients
+                yield ": heartbeat\n\n"
+                continue
+            notification = json.loads(message["data"])
+            project_id = notification["project_id"]
+            # Projects created after the stream opened are looked up once and remembered
+            if project_id not in project_access:
+                project_access[project_id] = (
+                    Project.objects.accessible_to(user).filter(id=project_id).exists()
+                )
+                release_connection()
+            if project_access[project_id]:
+                yield server_sent_event(notification)
+    finally:
+        pubsub.close()
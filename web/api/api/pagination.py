@@ -0,0 +1,56 @@
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProjectCursorPagination(CursorPagination):
+    ordering = "id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class DocumentCursorPagination(CursorPagination):
+    ordering = "id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class EventCursorPagination(CursorPagination):
+    # Newest first, and events are only ever appended so the id gives the order they
+    # happened in
+    ordering = "-id"
+    page_size = 10
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+
+class SearchPagination(PageNumberPagination):
+    # Search results are ordered by rank rather than a unique column, so they are
+    # paginated by page number
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+def wants_pagination(request, page_size_query_param="page_size"):
+    # Listings are only paginated when the client asks for a page, so existing clients
+    # still receive every row
+    return (
+        "cursor" in request.query_params
+        or page_size_query_param in request.query_params
+    )
+
+
+def document_cursor_link(base_url, last_document_id, page_size):
+    """
+    Link to the page of documents after last_document_id, as returned in "next" by
+    DocumentCursorPagination
+    """
+    paginator = DocumentCursorPagination()
+    paginator.base_url = replace_query_param(
+        base_url, paginator.page_size_query_param, page_size
+    )
+    return paginator.encode_cursor(
+        Cursor(offset=0, reverse=False, position=str(last_document_id))
+    )
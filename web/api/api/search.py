@@ -0,0 +1,22 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+
+from .models import Document
+from .serializers import DocumentMetadataSerializer
+
+# Must match the configuration used by the trigger that fills Document.search_vector
+SEARCH_CONFIG = "english"
+
+
+def full_text_search(text, project_ids):
+    """
+    Documents in project_ids matching a web-style search query, best match first, with
+    only metadata loaded
+    """
+    query = SearchQuery(text, search_type="websearch", config=SEARCH_CONFIG)
+    return (
+        Document.objects.filter(project__id__in=project_ids, search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "id")
+        .only(*DocumentMetadataSerializer.Meta.fields)
+    )
@@ -1,14 +1,25 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
-from .models import Document, Project
+from .models import Document, Event, Project
 
 
 class UserSerializer(serializers.ModelSerializer):
+    # Mapping of project id to the user's access, for every project the user can access
+    project_permissions = serializers.SerializerMethodField()
+
     class Meta:
         model = get_user_model()
         fields = ("id", "username", "create_projects", "project_permissions")
 
+    def get_project_permissions(self, user):
+        return {
+            str(project_id): access
+            for project_id, access in Project.objects.accessible_to(user).values_list(
+                "id", "access"
+            )
+        }
+
 
 class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,7 +27,57 @@ class ProjectSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "owner", "created_at", "updated_at")
 
 
+class ProjectListSerializer(ProjectSerializer):
+    document_count = serializers.IntegerField(read_only=True)
+
+    class Meta(ProjectSerializer.Meta):
+        fields = ProjectSerializer.Meta.fields + ("document_count",)
+
+
+class DocumentMetadataSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Document
+        fields = (
+            "id",
+            "name",
+            "owner",
+            "project",
+            "model_version",
+            "tagging_status",
+            "created_at",
+            "updated_at",
+        )
+
+
+class DocumentSearchResultSerializer(DocumentMetadataSerializer):
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(DocumentMetadataSerializer.Meta):
+        fields = DocumentMetadataSerializer.Meta.fields + ("rank",)
+
+
 class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
-        fields = ("id", "name", "owner", "project", "created_at", "updated_at", "text", "tagged_text")
+        fields = (
+            "id",
+            "name",
+            "owner",
+            "project",
+            "created_at",
+            "updated_at",
+            "text",
+            "entities",
+            "model_version",
+            "tagging_status",
+        )
+        # Only set by tagging
+        read_only_fields = ("entities", "model_version", "tagging_status")
+
+
+class EventSerializer(serializers.ModelSerializer):
+    type = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Event
+        fields = ("type", "project_id", "document_id", "name", "timestamp", "action")
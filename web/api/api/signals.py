@@ -0,0 +1,46 @@
+"""
+Invalidates the cached project listings of api/cache.py when projects, documents and
+permissions are saved or deleted. Bulk operations and queryset updates send no signals,
+so the code using them invalidates the cache itself. Documents deleted one at a time do
+too: a post_delete receiver for Document would make every project deletion load each of
+its documents in full.
+"""
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .cache import project_cache
+from .models import Document, Project, ProjectPermission
+
+
+@receiver(post_init, sender=Project)
+def remember_default_access(sender, instance, **kwargs):
+    # Read from __dict__ so that a deferred field is not loaded
+    instance.loaded_default_access = instance.__dict__.get("default_access")
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, **kwargs):
+    # The projects every user can see change with a new project or a new default access
+    if created or instance.default_access != instance.loaded_default_access:
+        project_cache.invalidate_all()
+    instance.loaded_default_access = instance.default_access
+    project_cache.invalidate_projects([instance.id])
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    project_cache.invalidate_all()
+
+
+@receiver(post_save, sender=Document)
+def document_saved(sender, instance, **kwargs):
+    project_cache.invalidate_projects([instance.project_id])
+
+
+@receiver(post_save, sender=ProjectPermission)
+@receiver(post_delete, sender=ProjectPermission)
+def permission_changed(sender, instance, origin=None, **kwargs):
+    # Permissions deleted along with their project are covered by project_deleted
+    if not isinstance(origin, Project):
+        project_cache.invalidate_user(instance.user_id)
@@ -1,22 +1,536 @@
-import spacy
-import torch
-from celery import shared_task
-from spacy import displacy
+import hashlib
+import time
+from contextlib import contextmanager
 
-from .models import Document
-from .utils import sanitise_input_text, unescape_text
+import redis
+from celery import chord, shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import MD5
+from django.utils import timezone
 
-# This is a workaround for a bug in spacy
-torch.set_num_threads(1)
+from .cache import project_cache, tagging_cache
+from .chunking import merge_window_entities, split_windows
+from .incremental import plan_retagging
+from .metrics import (
+    count_failures,
+    phase,
+    phase_seconds,
+    record_tagged,
+    run_model,
+    tokens_processed,
+)
+from .models import (
+    TAGGING_DONE,
+    TAGGING_FAILED,
+    TAGGING_RUNNING,
+    UPDATED,
+    Document,
+    EntityMention,
+    Event,
+)
+from .ner import extract_entities, get_model
+from .notifications import publish_tagged
+from .utils import normalise_entity_text
 
-nlp = spacy.load("/home/api/ner-model")
+redis_client = redis.Redis.from_url(settings.REDIS_URL)
+
+# Redis list holding the ids of documents waiting to be tagged in a batch
+PENDING_DOCUMENTS_KEY = "ner:pending_documents"
+# Redis keys of the number of documents each user has waiting on the bulk queue
+BULK_BACKLOG_KEY = "ner:bulk_backlog:{}"
+# Redis keys marking the documents that have a tagging task queued which has not started
+# yet
+QUEUED_KEY = "ner:queued:{}"
+# Redis keys of the number of times each tagging task has been delivered to a worker
+DELIVERIES_KEY = "ner:deliveries:{}"
+
+# Fields tagging tasks read from each document
+TAGGING_FIELDS = ("id", "name", "project_id", "text", "model_version", "tagging_status")
+
+# Celery queues, each served by its own workers
+INTERACTIVE_QUEUE = "interactive"
+BULK_QUEUE = "bulk"
+# Priorities on the bulk queue, 0 is served first. Uploads start at BULK_PRIORITY and
+# drop a step for every NER_FAIR_SHARE_DOCUMENTS documents their user already has
+# waiting, re-tagging runs at LOWEST_PRIORITY
+BULK_PRIORITY = 1
+LOWEST_PRIORITY = 9
+
+
+class RedeliveredError(Exception):
+    pass
+
+
+def index_entities(documents):
+    """Replace the entity mentions indexed for documents with their current entities"""
+    EntityMention.objects.filter(document__in=documents).delete()
+    EntityMention.objects.bulk_create(
+        [
+            EntityMention(
+                document_id=document.id,
+                project_id=document.project_id,
+                text=normalise_entity_text(document.text[start:end]),
+                label=label,
+                start=start,
+                end=end,
+            )
+            for document in documents
+            for start, end, label in document.entities
+        ],
+        batch_size=1000,
+    )
+
+
+def current_documents(documents):
+    """
+    Lock the rows of the documents whose text has not changed since they were read, and
+    return those documents. Only the hashes of the texts are read back.
+    """
+    hashes = dict(
+        Document.objects.select_for_update()
+        .filter(id__in=[document.id for document in documents])
+        .annotate(text_md5=MD5("text"))
+        .values_list("id", "text_md5")
+    )
+    return [
+        document
+        for document in documents
+        if hashes.get(document.id) == hashlib.md5(document.text.encode()).hexdigest()
+    ]
+
+
+def save_tagged(documents):
+    """
+    Save the new entities of documents, index them and notify clients that the documents
+    have been tagged. Documents deleted or edited while they were tagged are left alone,
+    an edit queues its document to be tagged again. Returns the documents saved.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        documents = current_documents(documents)
+        if not documents:
+            return documents
+        for document in documents:
+            document.tagging_status = TAGGING_DONE
+            # bulk_update bypasses auto_now, so set updated_at as save() would
+            document.updated_at = now
+        Document.objects.bulk_update(
+            documents, ["entities", "model_version", "tagging_status", "updated_at"]
+        )
+        index_entities(documents)
+        events = Event.objects.bulk_create(
+            [Event.for_document(document, UPDATED) for document in documents]
+        )
+        transaction.on_commit(lambda: publish_tagged(events))
+        project_cache.invalidate_projects(document.project_id for document in documents)
+    return documents
+
+
+def start_tagging(documents, model_version, force=False):
+    """
+    Mark documents as running and return them, leaving out those already tagged by
+    model_version unless force is set
+    """
+    if not force:
+        documents = [
+            document
+            for document in documents
+            if document.tagging_status != TAGGING_DONE
+            or document.model_version != model_version
+        ]
+    if documents:
+        Document.objects.filter(id__in=[document.id for document in documents]).update(
+            tagging_status=TAGGING_RUNNING
+        )
+        project_cache.invalidate_projects(document.project_id for document in documents)
+    return documents
+
+
+@contextmanager
+def mark_failed(document_ids):
+    """Mark the documents as failed if tagging them raises an error"""
+    try:
+        yield
+    except Exception:
+        failed = Document.objects.filter(id__in=document_ids)
+        project_ids = set(failed.values_list("project_id", flat=True))
+        failed.update(tagging_status=TAGGING_FAILED)
+        project_cache.invalidate_projects(project_ids)
+        raise
+
+
+def count_delivery(task):
+    """
+    Count a delivery of the running task, and raise RedeliveredError once it has been
+    delivered more than NER_MAX_DELIVERIES times. Tasks are delivered again when their
+    worker dies, so a document that kills every worker tagging it, by running it out of
+    memory, would otherwise be tagged forever.
+    """
+    # Tasks called directly rather than delivered by the broker have no id
+    if task.request.id is None:
+        return
+    key = DELIVERIES_KEY.format(task.request.id)
+    with redis_client.pipeline() as pipe:
+        pipe.incr(key)
+        # Deliveries can be up to a visibility timeout apart
+        pipe.expire(
+            key,
+            settings.CELERY_BROKER_TRANSPORT_OPTIONS["visibility_timeout"]
+            * (settings.NER_MAX_DELIVERIES + 1),
+        )
+        deliveries, _ = pipe.execute()
+    if deliveries > settings.NER_MAX_DELIVERIES:
+        raise RedeliveredError(
+            f"Task {task.request.id} was delivered {deliveries} times"
+        )
+
+
+def mark_queued(document_ids):
+    """
+    Mark documents as queued for tagging, and return those that were not already. The
+    others are left to the task already queued for them, which reads their text when it
+    starts.
+    """
+    with redis_client.pipeline() as pipe:
+        for document_id in document_ids:
+            pipe.set(
+                QUEUED_KEY.format(document_id),
+                1,
+                nx=True,
+                ex=settings.NER_QUEUED_TIMEOUT,
+            )
+        return [
+            document_id
+            for document_id, marked in zip(document_ids, pipe.execute())
+            if marked
+        ]
+
+
+def unmark_queued(document_ids):
+    # Tasks queued by mark_queued call this before reading their documents, so that a
+    # document edited from then on is queued again. Tasks run directly, by retag or in
+    # place of another task, leave the markers to the tasks still queued.
+    if document_ids:
+        redis_client.delete(
+            *[QUEUED_KEY.format(document_id) for document_id in document_ids]
+        )
+
+
+def needs_chunking(text):
+    return settings.NER_CHUNKING and len(text) > settings.NER_CHUNK_SIZE
+
+
+def tag_chunked(document, model_version, queue):
+    """
+    Tag the windows of a long document in parallel across the workers of queue, then
+    merge and save their entities
+    """
+    windows = split_windows(
+        document.text, settings.NER_CHUNK_SIZE, settings.NER_CHUNK_OVERLAP
+    )
+    chord(
+        tag_window.s(document.text[start:end], document.id).set(queue=queue)
+        for start, end in windows
+    )(
+        save_chunked_entities.s(
+            document.id,
+            windows,
+            model_version,
+            tagging_cache.key(document.text, model_version),
+        ).set(queue=queue)
+    )
+
+
+@shared_task(bind=True)
+@count_failures("window")
+def tag_window(self, text, document_id=None):
+    with mark_failed([document_id]):
+        count_delivery(self)
+        return extract_entities(run_model(get_model().nlp, text, "window"))
 
 
 @shared_task
-def perform_tagging(document_id, project_id):
-    document = Document.objects.get(id=document_id, project_id=project_id)
-    if not document:
+def save_chunked_entities(
+    window_entities, document_id, windows, model_version, text_key
+):
+    document = Document.objects.filter(id=document_id).only(*TAGGING_FIELDS).first()
+    # Skip documents deleted while they were tagged, or whose text has changed since and
+    # is being tagged again
+    if document is None or tagging_cache.key(document.text, model_version) != text_key:
+        return
+    # The windows are labelled with the version that was active when the document was
+    # split, a worker may have switched to a newer model part way through
+    with mark_failed([document.id]):
+        document.entities = merge_window_entities(windows, window_entities)
+        document.model_version = model_version
+        tagging_cache.set(document.text, model_version, document.entities)
+        with phase("chunked", "save"):
+            save_tagged([document])
+    record_tagged("chunked", document.entities)
+
+
+@shared_task(bind=True)
+@count_failures("document")
+def perform_tagging(self, document_id, project_id, queued=False):
+    if queued:
+        unmark_queued([document_id])
+    model = get_model()
+    with phase("document", "load"):
+        document = (
+            Document.objects.filter(id=document_id, project_id=project_id)
+            .only(*TAGGING_FIELDS)
+            .first()
+        )
+    # Skip documents deleted while their task was queued
+    if document is None or not start_tagging([document], model.version):
+        return
+    with mark_failed([document.id]):
+        count_delivery(self)
+        document.model_version = model.version
+        document.entities = tagging_cache.get(document.text, model.version)
+        if document.entities is None:
+            if needs_chunking(document.text):
+                tag_chunked(document, model.version, INTERACTIVE_QUEUE)
+                return
+            document.entities = extract_entities(
+                run_model(model.nlp, document.text, "document")
+            )
+            tagging_cache.set(document.text, model.version, document.entities)
+        with phase("document", "save"):
+            save_tagged([document])
+    record_tagged("document", document.entities)
+
+
+@shared_task(bind=True)
+@count_failures("batch")
+def perform_tagging_batch(
+    self, document_ids, user_id=None, queue=BULK_QUEUE, force=False, queued=False
+):
+    """
+    Tag documents together, skipping those already tagged by the active model unless
+    force is set. queued is set when the documents were marked by mark_queued.
+    """
+    if user_id is not None:
+        release_backlog(user_id, len(document_ids))
+    if queued:
+        unmark_queued(document_ids)
+    # The whole batch is tagged by the same model, even if the active model changes part
+    # way through
+    model = get_model()
+    with phase("batch", "load"):
+        documents = list(
+            Document.objects.filter(id__in=document_ids).only(*TAGGING_FIELDS)
+        )
+    documents = start_tagging(documents, model.version, force)
+    if not documents:
+        return
+    with mark_failed([document.id for document in documents]):
+        count_delivery(self)
+        # Only run the model over the texts that are not already cached
+        untagged = []
+        for document in documents:
+            document.model_version = model.version
+            document.entities = tagging_cache.get(document.text, model.version)
+            if document.entities is None:
+                untagged.append(document)
+        # Long documents are split into windows and tagged by other workers rather than
+        # holding up the batch
+        chunked = {
+            document.id for document in untagged if needs_chunking(document.text)
+        }
+        for document in untagged:
+            if document.id in chunked:
+                tag_chunked(document, model.version, queue)
+        untagged = [document for document in untagged if document.id not in chunked]
+        documents = [document for document in documents if document.id not in chunked]
+        # nlp.pipe yields the docs in the same order as the texts it is given
+        start = time.perf_counter()
+        docs = model.nlp.pipe(
+            (document.text for document in untagged),
+            batch_size=settings.NER_PIPE_BATCH_SIZE,
+        )
+        for document, doc in zip(untagged, docs):
+            document.entities = extract_entities(doc)
+            tokens_processed.labels("batch").inc(len(doc))
+            tagging_cache.set(document.text, model.version, document.entities)
+        if untagged:
+            phase_seconds.labels("batch", "inference").observe(
+                time.perf_counter() - start
+            )
+        if not documents:
+            return
+        with phase("batch", "save"):
+            save_tagged(documents)
+    for document in documents:
+        record_tagged("batch", document.entities)
+
+
+@shared_task(bind=True)
+@count_failures("incremental")
+def perform_incremental_tagging(
+    self, document_id, model_version, text_key, kept_entities, regions
+):
+    """
+    Tag the changed regions of an edited document and merge their entities with those
+    kept from before the edit
+    """
+    document = Document.objects.filter(id=document_id).only(*TAGGING_FIELDS).first()
+    # Skip documents deleted since they were edited, or edited again and queued for
+    # tagging again
+    if document is None or tagging_cache.key(document.text, model_version) != text_key:
+        return
+    model = get_model()
+    if model.version != model_version:
+        # The kept entities were found by a model that is no longer active, so they have
+        # to be found again
+        perform_tagging(document.id, document.project_id)
+        return
+    start_tagging([document], model_version, force=True)
+    with mark_failed([document.id]):
+        count_delivery(self)
+        entities = list(kept_entities)
+        for region_start, region_end in regions:
+            doc = run_model(
+                model.nlp, document.text[region_start:region_end], "incremental"
+            )
+            entities.extend(
+                [region_start + start, region_start + end, label]
+                for start, end, label in extract_entities(doc)
+            )
+        document.entities = sorted(entities)
+        document.model_version = model_version
+        with phase("incremental", "save"):
+            save_tagged([document])
+    record_tagged("incremental", document.entities)
+
+
+@shared_task
+def tag_pending_documents():
+    # Take up to NER_BATCH_MAX_DOCUMENTS ids off the pending list atomically
+    with redis_client.pipeline() as pipe:
+        pipe.lrange(PENDING_DOCUMENTS_KEY, 0, settings.NER_BATCH_MAX_DOCUMENTS - 1)
+        pipe.ltrim(PENDING_DOCUMENTS_KEY, settings.NER_BATCH_MAX_DOCUMENTS, -1)
+        document_ids, _ = pipe.execute()
+    # Documents left over after a full batch would otherwise wait for the next enqueue
+    if redis_client.llen(PENDING_DOCUMENTS_KEY):
+        tag_pending_documents.delay()
+    if document_ids:
+        perform_tagging_batch(
+            [int(document_id) for document_id in document_ids],
+            queue=INTERACTIVE_QUEUE,
+            queued=True,
+        )
+
+
+def queue_tagging(document_id, project_id):
+    """
+    Queue a document for tagging, batching it with other pending documents if
+    NER_BATCHING is enabled. Nothing is queued if the document is already waiting for a
+    task.
+    """
+    if not mark_queued([document_id]):
+        return
+    if not settings.NER_BATCHING:
+        perform_tagging.delay(document_id, project_id, queued=True)
+        return
+    pending = redis_client.rpush(PENDING_DOCUMENTS_KEY, document_id)
+    # Tag straight away once a batch is full, otherwise start the window when the first
+    # document arrives
+    if pending >= settings.NER_BATCH_MAX_DOCUMENTS:
+        tag_pending_documents.delay()
+    elif pending == 1:
+        tag_pending_documents.apply_async(countdown=settings.NER_BATCH_WINDOW)
+
+
+def bulk_priority(user_id, documents):
+    """
+    Add documents to the user's backlog on the bulk queue, and return the priority to
+    queue them at, which is lower the more documents the user already has waiting
+    """
+    # Tasks lost with their worker are never taken off the backlog, and redelivered ones
+    # are taken off twice, so the backlog expires NER_QUEUED_TIMEOUT seconds after the
+    # user's documents stop being queued or tagged rather than drifting for good
+    key = BULK_BACKLOG_KEY.format(user_id)
+    with redis_client.pipeline() as pipe:
+        pipe.incrby(key, documents)
+        pipe.expire(key, settings.NER_QUEUED_TIMEOUT)
+        backlog, _ = pipe.execute()
+    waiting = max(backlog - documents, 0)
+    return min(
+        BULK_PRIORITY + waiting // settings.NER_FAIR_SHARE_DOCUMENTS,
+        LOWEST_PRIORITY - 1,
+    )
+
+
+def release_backlog(user_id, documents):
+    """Take documents that are no longer waiting off the user's backlog"""
+    key = BULK_BACKLOG_KEY.format(user_id)
+    with redis_client.pipeline() as pipe:
+        pipe.decrby(key, documents)
+        pipe.expire(key, settings.NER_QUEUED_TIMEOUT)
+        backlog, _ = pipe.execute()
+    # A backlog that drifted below zero would let the user's next upload jump ahead
+    if backlog <= 0:
+        redis_client.delete(key)
+
+
+def queue_length(queue):
+    """
+    Number of tasks waiting on a Celery queue, which the Redis transport keeps in one
+    list per priority
+    """
+    with redis_client.pipeline() as pipe:
+        for priority in range(LOWEST_PRIORITY + 1):
+            # Named as in CELERY_BROKER_TRANSPORT_OPTIONS, the list of priority 0 has
+            # the queue's own name
+            pipe.llen(f"{queue}:{priority}" if priority else queue)
+        return sum(pipe.execute())
+
+
+def queue_tagging_batch(document_ids, user_id):
+    """
+    Queue a user's documents for tagging on the bulk queue, in tasks of up to
+    NER_BATCH_MAX_DOCUMENTS documents
+    """
+    document_ids = mark_queued(document_ids)
+    for i in range(0, len(document_ids), settings.NER_BATCH_MAX_DOCUMENTS):
+        batch = document_ids[i : i + settings.NER_BATCH_MAX_DOCUMENTS]
+        perform_tagging_batch.apply_async(
+            (batch, user_id),
+            {"queued": True},
+            queue=BULK_QUEUE,
+            priority=bulk_priority(user_id, len(batch)),
+        )
+
+
+def queue_retagging(document, old_text, old_entities, old_model_version):
+    """
+    Queue an edited document for tagging. Only the sentences that changed are tagged
+    again if the entities found before the edit are from the active model, and little
+    enough of the text changed to make it worthwhile.
+    """
+    model_version = get_model().version
+    # Texts that are already cached, or were not fully tagged by the active model, are
+    # tagged as a new document would be
+    if (
+        old_entities is None
+        or old_model_version != model_version
+        or tagging_cache.get(document.text, model_version) is not None
+    ):
+        queue_tagging(document.id, document.project_id)
+        return
+    kept_entities, regions = plan_retagging(old_text, old_entities, document.text)
+    changed = sum(end - start for start, end in regions)
+    if changed > len(document.text) * settings.NER_INCREMENTAL_MAX_CHANGE or any(
+        needs_chunking(document.text[start:end]) for start, end in regions
+    ):
+        queue_tagging(document.id, document.project_id)
         return
-    html = displacy.render(nlp(sanitise_input_text(document.text)), style="ent", minify=True)
-    document.tagged_text = unescape_text(html)
-    document.save()
+    perform_incremental_tagging.delay(
+        document.id,
+        model_version,
+        tagging_cache.key(document.text, model_version),
+        kept_entities,
+        regions,
+    )
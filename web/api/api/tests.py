@@ -1,40 +1,112 @@
-from datetime import timedelta
-
+import importlib
+import io
+import json
+import os
+import pstats
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from multiprocessing.connection import Listener
+from unittest import mock
+
+import redis
+import spacy
+import torch
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from prometheus_client import REGISTRY
 from rest_framework import status
-from rest_framework.test import APITestCase
-
-from .models import CustomUser, Document, Project
-from .permissions import WRITE_PERMISSIONS
+from rest_framework.test import APIRequestFactory, APITestCase
+from spacy.tokens import DocBin
+
+from .cache import TaggingCache, project_cache
+from .chunking import merge_window_entities, split_windows
+from .incremental import plan_retagging
+from .inference import MicroBatchingServer
+from .management.commands.retag import CHECKPOINT_KEY
+from .metrics import size_label
+from .models import (
+    CustomUser,
+    Document,
+    EntityMention,
+    Event,
+    Project,
+    ProjectPermission,
+)
+from .ner import ModelRegistry, extract_entities, get_model, quantise
+from .notifications import notification_stream, publish_tagged
+from .permissions import NONE_PERMISSIONS, READ_PERMISSIONS, WRITE_PERMISSIONS
+from .search import full_text_search
+from .serializers import DocumentSearchResultSerializer
+from .tasks import (
+    BULK_BACKLOG_KEY,
+    BULK_PRIORITY,
+    DELIVERIES_KEY,
+    bulk_priority,
+    index_entities,
+    mark_queued,
+    perform_incremental_tagging,
+    perform_tagging,
+    perform_tagging_batch,
+    redis_client,
+    save_tagged,
+    unmark_queued,
+)
+
+# The backfill migration keeps its own copy of the helper it runs
+backfill_migration = importlib.import_module(
+    "api.migrations.0003_backfill_document_entities"
+)
 
 
 class UserAPIViewTest(APITestCase):
     def setUp(self):
         self.user = get_user_model().objects.create_user(
-            username='testuser',
-            password='testpassword',
+            username="testuser",
+            password="testpassword",
             create_projects=True,
-            project_permissions={'1': 'read', '2': 'write'}
+        )
+        self.project1 = Project.objects.create(name="Project 1", owner=self.user)
+        self.project2 = Project.objects.create(
+            name="Project 2", owner=self.user, default_access=WRITE_PERMISSIONS
+        )
+        self.project3 = Project.objects.create(name="Project 3", owner=self.user)
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project1, access=READ_PERMISSIONS
         )
 
     def test_get_user(self):
         # Given
-        url = reverse('user')
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("user")
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.get(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['username'], self.user.username)
-        self.assertEqual(response.data['create_projects'], self.user.create_projects)
-        self.assertEqual(response.data['project_permissions'], self.user.project_permissions)
+        self.assertEqual(response.data["username"], self.user.username)
+        self.assertEqual(response.data["create_projects"], self.user.create_projects)
+        self.assertEqual(
+            response.data["project_permissions"],
+            {
+                str(self.project1.id): READ_PERMISSIONS,
+                str(self.project2.id): WRITE_PERMISSIONS,
+            },
+        )
 
     def test_get_user_unauthenticated(self):
         # Given
-        url = reverse('user')
+        url = reverse("user")
 
         # When
         response = self.client.get(url)
@@ -49,29 +121,34 @@ class UserAPIViewTest(APITestCase):
 class ProjectsAPIViewTest(APITestCase):
     def setUp(self):
         self.user = get_user_model().objects.create_user(
-            username='testuser',
-            password='testpassword',
-            project_permissions={'1': 'read', '2': 'write'}
+            username="testuser",
+            password="testpassword",
         )
         self.project1 = Project.objects.create(
-            name='Project 1',
+            name="Project 1",
             owner=self.user,
         )
         self.project2 = Project.objects.create(
-            name='Project 2',
+            name="Project 2",
             owner=self.user,
         )
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project1, access=READ_PERMISSIONS
+        )
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project2, access=WRITE_PERMISSIONS
+        )
         self.document1 = Document.objects.create(
-            name='Document 1',
+            name="Document 1",
             project=self.project1,
-            text='Sample text',
-            tagged_text='Sample tagged text'
+            text="Sample text",
+            entities=[[0, 6, "ORG"]],
         )
 
     def test_get_projects(self):
         # Given
-        url = reverse('projects')
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("projects")
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.get(url)
@@ -79,14 +156,98 @@ class ProjectsAPIViewTest(APITestCase):
         # Then
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
-        self.assertEqual(response.data[0]['id'], self.project1.id)
-        self.assertEqual(response.data[0]['documents'][0]['id'], self.document1.id)
-        self.assertNotIn('text', response.data[0]['documents'][0])
-        self.assertNotIn('tagged_text', response.data[0]['documents'][0])
+        self.assertEqual(response.data[0]["id"], self.project1.id)
+        self.assertEqual(response.data[0]["documents"][0]["id"], self.document1.id)
+        self.assertNotIn("text", response.data[0]["documents"][0])
+        self.assertNotIn("entities", response.data[0]["documents"][0])
+        self.assertEqual(response.data[0]["document_count"], 1)
+        self.assertEqual(response.data[1]["document_count"], 0)
+
+    def test_get_projects_constant_queries(self):
+        # Given
+        url = reverse("projects")
+        self.client.login(username="testuser", password="testpassword")
+        self.client.get(url)
+        # Measure the queries of building the response rather than serving it from the
+        # cache
+        project_cache.invalidate_user(self.user.id)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        for i in range(5):
+            project = Project.objects.create(name=f"Extra Project {i}", owner=self.user)
+            Document.objects.create(
+                name="Extra Document",
+                project=project,
+                owner=self.user,
+                text="Sample text",
+            )
+            ProjectPermission.objects.create(
+                user=self.user, project=project, access=WRITE_PERMISSIONS
+            )
+
+        # When
+        with CaptureQueriesContext(connection) as more_queries:
+            response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 7)
+        self.assertEqual(len(more_queries), len(queries))
+
+    def test_get_projects_paginated(self):
+        # Given
+        url = reverse("projects")
+        self.client.login(username="testuser", password="testpassword")
+        Document.objects.create(
+            name="Document 2", project=self.project1, text="Sample text"
+        )
+
+        # When
+        first_page = self.client.get(url, {"page_size": 1, "documents_page_size": 1})
+        second_page = self.client.get(first_page.data["next"])
+        documents_page = self.client.get(
+            first_page.data["results"][0]["documents_next"]
+        )
+
+        # Then
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(first_page.data["results"][0]["id"], self.project1.id)
+        self.assertEqual(first_page.data["results"][0]["document_count"], 2)
+        self.assertEqual(len(first_page.data["results"][0]["documents"]), 1)
+        self.assertEqual(second_page.data["results"][0]["id"], self.project2.id)
+        self.assertNotIn("documents_next", second_page.data["results"][0])
+        self.assertEqual(len(documents_page.data["documents"]), 1)
+        self.assertEqual(documents_page.data["documents"][0]["name"], "Document 2")
+        self.assertIsNone(documents_page.data["documents_next"])
+
+    def test_get_projects_documents_page_size_zero(self):
+        # Given
+        url = reverse("projects")
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url, {"documents_page_size": 0})
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["error"], "documents_page_size must be at least 1"
+        )
+
+    def test_get_projects_documents_page_size_negative(self):
+        # Given
+        url = reverse("projects")
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url, {"page_size": 1, "documents_page_size": -1})
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_get_projects_unauthenticated(self):
         # Given
-        url = reverse('projects')
+        url = reverse("projects")
 
         # When
         response = self.client.get(url)
@@ -101,42 +262,201 @@ class ProjectsAPIViewTest(APITestCase):
         self.document1.delete()
 
 
+class ProjectCacheTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.project = Project.objects.create(name="Test Project", owner=self.user)
+        self.permission = ProjectPermission.objects.create(
+            user=self.user, project=self.project, access=READ_PERMISSIONS
+        )
+        self.client.login(username="testuser", password="testpassword")
+
+    def sample(self, name, view):
+        return REGISTRY.get_sample_value(name, {"view": view}) or 0
+
+    def test_cached_projects(self):
+        # Given
+        url = reverse("projects")
+        self.client.get(url)
+        hits = self.sample("project_cache_hits_total", "projects")
+
+        # When
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(self.sample("project_cache_hits_total", "projects"), hits + 1)
+        self.assertFalse([query for query in queries if "api_project" in query["sql"]])
+
+    def test_document_created(self):
+        # Given
+        url = reverse("projects")
+        self.client.get(url)
+
+        # When
+        Document.objects.create(
+            name="Document", owner=self.user, project=self.project, text="Sample text"
+        )
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.data[0]["document_count"], 1)
+        self.assertEqual(response.data[0]["documents"][0]["name"], "Document")
+
+    def test_document_deleted(self):
+        # Given
+        document = Document.objects.create(
+            name="Document", owner=self.user, project=self.project, text="Sample text"
+        )
+        ProjectPermission.objects.filter(id=self.permission.id).update(
+            access=WRITE_PERMISSIONS
+        )
+        url = reverse("projects")
+        self.client.get(url)
+
+        # When
+        self.client.delete(
+            reverse(
+                "document",
+                kwargs={"project_id": self.project.id, "document_id": document.id},
+            )
+        )
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.data[0]["document_count"], 0)
+
+    def test_permission_deleted(self):
+        # Given
+        url = reverse("projects")
+        self.client.get(url)
+
+        # When
+        self.permission.delete()
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.data, [])
+
+    def test_project_created_with_permissions(self):
+        # Given
+        other_user = CustomUser.objects.create_user(
+            username="otheruser", password="testpassword"
+        )
+        CustomUser.objects.filter(id=self.user.id).update(create_projects=True)
+        versions = project_cache.user_versions(other_user.id)
+        data = {
+            "name": "New Project",
+            "permissions": "custom",
+            "custom_permissions": {"otheruser": "read"},
+        }
+
+        # When
+        self.client.post(reverse("create_project"), data, format="json")
+
+        # Then
+        self.assertNotEqual(project_cache.user_versions(other_user.id), versions)
+        other_user.delete()
+
+    def test_default_access_changed(self):
+        # Given
+        other_user = CustomUser.objects.create_user(
+            username="otheruser", password="testpassword"
+        )
+        url = reverse("projects")
+        self.client.login(username="otheruser", password="testpassword")
+        self.client.get(url)
+
+        # When
+        self.project.default_access = READ_PERMISSIONS
+        self.project.save()
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(
+            [project["id"] for project in response.data], [self.project.id]
+        )
+        other_user.delete()
+
+    def test_project_renamed(self):
+        # Given
+        url = reverse("project", kwargs={"project_id": self.project.id})
+        self.client.get(url)
+        misses = self.sample("project_cache_misses_total", "project")
+
+        # When
+        self.project.name = "Renamed Project"
+        self.project.save()
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.data["name"], "Renamed Project")
+        self.assertEqual(
+            self.sample("project_cache_misses_total", "project"), misses + 1
+        )
+
+    def test_project_changed_while_building(self):
+        # Given
+        request = APIRequestFactory().get(
+            reverse("project", kwargs={"project_id": self.project.id})
+        )
+        request.user = self.user
+        versions = project_cache.user_versions(self.user.id, [self.project.id])
+
+        # When
+        project_cache.invalidate_projects([self.project.id])
+        project_cache.set(request, versions, [self.project.id], {"name": "Stale"})
+
+        # Then
+        self.assertIsNone(project_cache.get("project", request))
+
+    def tearDown(self):
+        self.user.delete()
+
+
 class ProjectAPIViewTest(APITestCase):
     def setUp(self):
         self.user = get_user_model().objects.create_user(
-            username='testuser',
-            password='testpassword',
-            project_permissions={'1': 'read', '2': 'write'}
+            username="testuser",
+            password="testpassword",
+            create_projects=True,
         )
         self.project1 = Project.objects.create(
-            name='Project 1',
+            name="Project 1",
             owner=self.user,
         )
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project1, access=WRITE_PERMISSIONS
+        )
         self.document1 = Document.objects.create(
-            name='Document 1',
+            name="Document 1",
             project=self.project1,
-            text='Sample text',
-            tagged_text='Sample tagged text'
+            text="Sample text",
+            entities=[[0, 6, "ORG"]],
         )
 
     def test_get_project(self):
         # Given
-        url = reverse('project', kwargs={'project_id': self.project1.id})
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("project", kwargs={"project_id": self.project1.id})
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.get(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['id'], self.project1.id)
-        self.assertEqual(response.data['documents'][0]['id'], self.document1.id)
-        self.assertNotIn('text', response.data['documents'][0])
-        self.assertNotIn('tagged_text', response.data['documents'][0])
+        self.assertEqual(response.data["id"], self.project1.id)
+        self.assertEqual(response.data["documents"][0]["id"], self.document1.id)
+        self.assertNotIn("text", response.data["documents"][0])
+        self.assertNotIn("entities", response.data["documents"][0])
 
     def test_get_project_unauthenticated(self):
         # Given
-        url = reverse('project', kwargs={'project_id': self.project1.id})
+        url = reverse("project", kwargs={"project_id": self.project1.id})
 
         # When
         response = self.client.get(url)
@@ -146,53 +466,54 @@ class ProjectAPIViewTest(APITestCase):
 
     def test_get_project_nonexistent(self):
         # Given
-        url = reverse('project', kwargs={'project_id': 999})
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("project", kwargs={"project_id": 999})
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.get(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(response.data['error'], 'Project does not exist')
+        self.assertEqual(response.data["error"], "Project does not exist")
 
     def test_get_project_no_permission(self):
         # Given
         another_user = get_user_model().objects.create_user(
-            username='anotheruser',
-            password='anotherpassword',
-            project_permissions={}
+            username="anotheruser",
+            password="anotherpassword",
         )
-        url = reverse('project', kwargs={'project_id': self.project1.id})
-        self.client.login(username='anotheruser', password='anotherpassword')
+        url = reverse("project", kwargs={"project_id": self.project1.id})
+        self.client.login(username="anotheruser", password="anotherpassword")
 
         # When
         response = self.client.get(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-        self.assertEqual(response.data['error'], 'You do not have permission to access this project')
+        self.assertEqual(
+            response.data["error"], "You do not have permission to access this project"
+        )
         another_user.delete()
 
     def test_post_project(self):
         # Given
-        url = reverse('create_project')
-        self.client.login(username='testuser', password='testpassword')
-        data = {'name': 'New Project', 'permissions': 'read'}
+        url = reverse("create_project")
+        self.client.login(username="testuser", password="testpassword")
+        data = {"name": "New Project", "permissions": "read"}
 
         # When
         response = self.client.post(url, data)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertIn('id', response.data)
-        self.assertEqual(response.data['name'], 'New Project')
-        self.assertIn('timestamp', response.data)
+        self.assertIn("id", response.data)
+        self.assertEqual(response.data["name"], "New Project")
+        self.assertIn("timestamp", response.data)
 
     def test_post_project_unauthenticated(self):
         # Given
-        url = reverse('create_project')
-        data = {'name': 'New Project', 'permissions': 'read'}
+        url = reverse("create_project")
+        data = {"name": "New Project", "permissions": "read"}
 
         # When
         response = self.client.post(url, data)
@@ -203,27 +524,27 @@ class ProjectAPIViewTest(APITestCase):
     def test_post_project_no_permission(self):
         # Given
         no_create_user = get_user_model().objects.create_user(
-            username='noprojectcreate',
-            password='testpassword',
-            create_projects=False
+            username="noprojectcreate", password="testpassword", create_projects=False
         )
-        url = reverse('create_project')
-        self.client.login(username='noprojectcreate', password='testpassword')
-        data = {'name': 'New Project', 'permissions': 'read'}
+        url = reverse("create_project")
+        self.client.login(username="noprojectcreate", password="testpassword")
+        data = {"name": "New Project", "permissions": "read"}
 
         # When
         response = self.client.post(url, data)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-        self.assertEqual(response.data['error'], 'You do not have permission to create projects')
+        self.assertEqual(
+            response.data["error"], "You do not have permission to create projects"
+        )
         no_create_user.delete()
 
     def test_post_project_bad_request(self):
         # Given
-        url = reverse('create_project')
-        self.client.login(username='testuser', password='testpassword')
-        data = {'permissions': 'invalid'}
+        url = reverse("create_project")
+        self.client.login(username="testuser", password="testpassword")
+        data = {"permissions": "invalid"}
 
         # When
         response = self.client.post(url, data)
@@ -233,19 +554,19 @@ class ProjectAPIViewTest(APITestCase):
 
     def test_delete_project(self):
         # Given
-        url = reverse('project', kwargs={'project_id': self.project1.id})
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("project", kwargs={"project_id": self.project1.id})
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.delete(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['message'], 'Project deleted successfully')
+        self.assertEqual(response.data["message"], "Project deleted successfully")
 
     def test_delete_project_unauthenticated(self):
         # Given
-        url = reverse('project', kwargs={'project_id': self.project1.id})
+        url = reverse("project", kwargs={"project_id": self.project1.id})
 
         # When
         response = self.client.delete(url)
@@ -255,34 +576,150 @@ class ProjectAPIViewTest(APITestCase):
 
     def test_delete_project_nonexistent(self):
         # Given
-        url = reverse('project', kwargs={'project_id': 999})
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("project", kwargs={"project_id": 999})
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.delete(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(response.data['error'], 'Project does not exist')
+        self.assertEqual(response.data["error"], "Project does not exist")
 
     def test_delete_project_no_permission(self):
         # Given
         another_user = get_user_model().objects.create_user(
-            username='anotheruser',
-            password='anotherpassword',
-            project_permissions={}
+            username="anotheruser",
+            password="anotherpassword",
         )
-        url = reverse('project', kwargs={'project_id': self.project1.id})
-        self.client.login(username='anotheruser', password='anotherpassword')
+        url = reverse("project", kwargs={"project_id": self.project1.id})
+        self.client.login(username="anotheruser", password="anotherpassword")
 
         # When
         response = self.client.delete(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-        self.assertEqual(response.data['error'], 'You do not have permission to access this project')
+        self.assertEqual(
+            response.data["error"], "You do not have permission to access this project"
+        )
+        another_user.delete()
+
+    def test_get_project_default_access(self):
+        # Given
+        self.project1.default_access = READ_PERMISSIONS
+        self.project1.save()
+        another_user = get_user_model().objects.create_user(
+            username="anotheruser",
+            password="anotherpassword",
+        )
+        url = reverse("project", kwargs={"project_id": self.project1.id})
+        self.client.login(username="anotheruser", password="anotherpassword")
+
+        # When
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], self.project1.id)
+        another_user.delete()
+
+    def test_get_project_permission_overrides_default_access(self):
+        # Given
+        self.project1.default_access = READ_PERMISSIONS
+        self.project1.save()
+        another_user = get_user_model().objects.create_user(
+            username="anotheruser",
+            password="anotherpassword",
+        )
+        ProjectPermission.objects.create(
+            user=another_user, project=self.project1, access=NONE_PERMISSIONS
+        )
+        url = reverse("project", kwargs={"project_id": self.project1.id})
+        self.client.login(username="anotheruser", password="anotherpassword")
+
+        # When
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        another_user.delete()
+
+    def test_post_project_default_access(self):
+        # Given
+        url = reverse("create_project")
+        self.client.login(username="testuser", password="testpassword")
+        data = {"name": "New Project", "permissions": "write"}
+
+        # When
+        response = self.client.post(url, data, format="json")
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        project = Project.objects.get(id=response.data["id"])
+        self.assertEqual(project.default_access, WRITE_PERMISSIONS)
+        self.assertEqual(
+            list(project.permissions.values_list("user", "access")),
+            [(self.user.id, WRITE_PERMISSIONS)],
+        )
+
+    def test_post_project_custom_permissions(self):
+        # Given
+        another_user = get_user_model().objects.create_user(
+            username="anotheruser",
+            password="anotherpassword",
+        )
+        url = reverse("create_project")
+        self.client.login(username="testuser", password="testpassword")
+        data = {
+            "name": "New Project",
+            "permissions": "custom",
+            "custom_permissions": {"anotheruser": "read", "missinguser": "write"},
+        }
+
+        # When
+        response = self.client.post(url, data, format="json")
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        project = Project.objects.get(id=response.data["id"])
+        self.assertEqual(project.default_access, NONE_PERMISSIONS)
+        self.assertEqual(
+            dict(project.permissions.values_list("user", "access")),
+            {self.user.id: WRITE_PERMISSIONS, another_user.id: READ_PERMISSIONS},
+        )
         another_user.delete()
 
+    def test_delete_project_deletes_permissions(self):
+        # Given
+        url = reverse("project", kwargs={"project_id": self.project1.id})
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.delete(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            ProjectPermission.objects.filter(project_id=self.project1.id).exists()
+        )
+
+    def test_delete_project_leaves_document_fields_unloaded(self):
+        # Given
+        url = reverse("project", kwargs={"project_id": self.project1.id})
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Document.objects.filter(id=self.document1.id).exists())
+        self.assertFalse(
+            [query for query in queries if '"api_document"."text"' in query["sql"]]
+        )
+
     def tearDown(self):
         self.user.delete()
         self.project1.delete()
@@ -292,35 +729,60 @@ class ProjectAPIViewTest(APITestCase):
 class DocumentApiViewTest(APITestCase):
     def setUp(self):
         self.user = CustomUser.objects.create_user(
-            username='testuser', password='testpassword'
-        )
-        self.project = Project.objects.create(
-            name='Test Project', owner=self.user
+            username="testuser", password="testpassword"
         )
+        self.project = Project.objects.create(name="Test Project", owner=self.user)
         self.document = Document.objects.create(
-            name='Test Document', owner=self.user, project=self.project, text='Test text'
+            name="Test Document",
+            owner=self.user,
+            project=self.project,
+            text="Test text",
+        )
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project, access=WRITE_PERMISSIONS
         )
-        self.user.project_permissions = {
-            str(self.project.id): WRITE_PERMISSIONS
-        }
-        self.user.save()
 
     def test_get_document(self):
         # Given
-        url = reverse('document', kwargs={'project_id': self.project.id, 'document_id': self.document.id})
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse(
+            "document",
+            kwargs={"project_id": self.project.id, "document_id": self.document.id},
+        )
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.get(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['id'], self.document.id)
-        self.assertEqual(response.data['text'], self.document.text)
+        self.assertEqual(response.data["id"], self.document.id)
+        self.assertEqual(response.data["text"], self.document.text)
+        self.assertNotIn("tagged_text", response.data)
+
+    def test_get_document_render_html(self):
+        # Given
+        self.document.entities = [[0, 4, "ORG"]]
+        self.document.save()
+        url = reverse(
+            "document",
+            kwargs={"project_id": self.project.id, "document_id": self.document.id},
+        )
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url + "?render=html")
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["entities"], [[0, 4, "ORG"]])
+        self.assertIn("<mark", response.data["tagged_text"])
 
     def test_get_document_unauthenticated(self):
         # Given
-        url = reverse('document', kwargs={'project_id': self.project.id, 'document_id': self.document.id})
+        url = reverse(
+            "document",
+            kwargs={"project_id": self.project.id, "document_id": self.document.id},
+        )
 
         # When
         response = self.client.get(url)
@@ -330,64 +792,72 @@ class DocumentApiViewTest(APITestCase):
 
     def test_get_document_nonexistent(self):
         # Given
-        url = reverse('document', kwargs={'project_id': self.project.id, 'document_id': 999})
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse(
+            "document", kwargs={"project_id": self.project.id, "document_id": 999}
+        )
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.get(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(response.data['error'], 'Document does not exist')
+        self.assertEqual(response.data["error"], "Document does not exist")
 
     def test_get_document_no_permission(self):
         # Given
-        user2 = CustomUser.objects.create_user(username='user2', password='password2')
-        project2 = Project.objects.create(name='Project 2', owner=user2)
-        document2 = Document.objects.create(name='Document 2', owner=user2, project=project2)
+        user2 = CustomUser.objects.create_user(username="user2", password="password2")
+        project2 = Project.objects.create(name="Project 2", owner=user2)
+        document2 = Document.objects.create(
+            name="Document 2", owner=user2, project=project2
+        )
 
-        url = reverse('document', kwargs={'project_id': project2.id, 'document_id': document2.id})
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse(
+            "document", kwargs={"project_id": project2.id, "document_id": document2.id}
+        )
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.get(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-        self.assertEqual(response.data['error'], 'You do not have permission to access this document')
+        self.assertEqual(
+            response.data["error"], "You do not have permission to access this document"
+        )
 
     def test_post_document(self):
         # Given
-        url = reverse('create_document')
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("create_document")
+        self.client.login(username="testuser", password="testpassword")
         data = {
-            'name': 'New Document',
-            'project': self.project.id,
-            'text': 'This is a sample text.'
+            "name": "New Document",
+            "project": self.project.id,
+            "text": "This is a sample text.",
         }
 
         # When
-        response = self.client.post(url, data, format='json')
+        response = self.client.post(url, data, format="json")
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertIn('id', response.data)
-        self.assertEqual(response.data['project_id'], self.project.id)
-        self.assertEqual(response.data['name'], 'New Document')
-        self.assertIn('timestamp', response.data)
+        self.assertIn("id", response.data)
+        self.assertEqual(response.data["project_id"], self.project.id)
+        self.assertEqual(response.data["name"], "New Document")
+        self.assertIn("timestamp", response.data)
         self.assertEqual(Document.objects.count(), 2)
 
     def test_post_document_unauthenticated(self):
         # Given
-        url = reverse('create_document')
+        url = reverse("create_document")
         data = {
-            'name': 'New Document',
-            'project': self.project.id,
-            'text': 'This is a sample text.'
+            "name": "New Document",
+            "project": self.project.id,
+            "text": "This is a sample text.",
         }
 
         # When
-        response = self.client.post(url, data, format='json')
+        response = self.client.post(url, data, format="json")
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -395,26 +865,26 @@ class DocumentApiViewTest(APITestCase):
 
     def test_post_document_project_nonexistent(self):
         # Given
-        url = reverse('create_document')
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("create_document")
+        self.client.login(username="testuser", password="testpassword")
         data = {
-            'name': 'New Document',
-            'project': 999,
-            'text': 'This is a sample text.'
+            "name": "New Document",
+            "project": 999,
+            "text": "This is a sample text.",
         }
 
         # When
-        response = self.client.post(url, data, format='json')
+        response = self.client.post(url, data, format="json")
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(response.data['error'], 'Project does not exist')
+        self.assertEqual(response.data["error"], "Project does not exist")
         self.assertEqual(Document.objects.count(), 1)
 
     def test_post_document_bad_request(self):
         # Given
-        url = reverse('create_document')
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("create_document")
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.post(url)
@@ -425,41 +895,50 @@ class DocumentApiViewTest(APITestCase):
 
     def test_post_document_no_permission(self):
         # Given
-        user2 = CustomUser.objects.create_user(username='user2', password='password2')
-        project2 = Project.objects.create(name='Project 2', owner=user2)
+        user2 = CustomUser.objects.create_user(username="user2", password="password2")
+        project2 = Project.objects.create(name="Project 2", owner=user2)
 
-        url = reverse('create_document')
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("create_document")
+        self.client.login(username="testuser", password="testpassword")
         data = {
-            'name': 'New Document',
-            'project': project2.id,
-            'text': 'This is a sample text.'
+            "name": "New Document",
+            "project": project2.id,
+            "text": "This is a sample text.",
         }
 
         # When
-        response = self.client.post(url, data, format='json')
+        response = self.client.post(url, data, format="json")
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-        self.assertEqual(response.data['error'], 'You do not have permission to add documents to this project')
+        self.assertEqual(
+            response.data["error"],
+            "You do not have permission to add documents to this project",
+        )
         self.assertEqual(Document.objects.count(), 1)
 
     def test_delete_document(self):
         # Given
-        url = reverse('document', kwargs={'project_id': self.project.id, 'document_id': self.document.id})
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse(
+            "document",
+            kwargs={"project_id": self.project.id, "document_id": self.document.id},
+        )
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.delete(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['message'], 'Document deleted successfully')
+        self.assertEqual(response.data["message"], "Document deleted successfully")
         self.assertEqual(Document.objects.count(), 0)
 
     def test_delete_document_unauthenticated(self):
         # Given
-        url = reverse('document', kwargs={'project_id': self.project.id, 'document_id': self.document.id})
+        url = reverse(
+            "document",
+            kwargs={"project_id": self.project.id, "document_id": self.document.id},
+        )
 
         # When
         response = self.client.delete(url)
@@ -468,34 +947,115 @@ class DocumentApiViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertEqual(Document.objects.count(), 1)
 
+    def test_patch_document(self):
+        # Given
+        url = reverse(
+            "document",
+            kwargs={"project_id": self.project.id, "document_id": self.document.id},
+        )
+        self.client.login(username="testuser", password="testpassword")
+        data = {"text": "Edited text"}
+
+        # When
+        response = self.client.patch(url, data, format="json")
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["text"], "Edited text")
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.text, "Edited text")
+        self.assertIsNone(self.document.entities)
+
+    def test_patch_document_records_event(self):
+        # Given
+        url = reverse(
+            "document",
+            kwargs={"project_id": self.project.id, "document_id": self.document.id},
+        )
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        self.client.patch(url, {"text": "Edited text"}, format="json")
+        self.client.patch(url, {"text": "Edited text"}, format="json")
+
+        # Then
+        self.assertEqual(
+            Event.objects.filter(document=self.document, action="updated").count(), 1
+        )
+
+    def test_patch_document_no_text(self):
+        # Given
+        url = reverse(
+            "document",
+            kwargs={"project_id": self.project.id, "document_id": self.document.id},
+        )
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.patch(url, {"text": ""}, format="json")
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Text is required")
+
+    def test_patch_document_read_only(self):
+        # Given
+        ProjectPermission.objects.filter(user=self.user, project=self.project).update(
+            access=READ_PERMISSIONS
+        )
+        url = reverse(
+            "document",
+            kwargs={"project_id": self.project.id, "document_id": self.document.id},
+        )
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.patch(url, {"text": "Edited text"}, format="json")
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            response.data["error"], "You do not have permission to edit this document"
+        )
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.text, "Test text")
+
     def test_delete_document_nonexistent(self):
         # Given
-        url = reverse('document', kwargs={'project_id': self.project.id, 'document_id': 999})
-        self.client.login(username='testuser', password='password')
+        url = reverse(
+            "document", kwargs={"project_id": self.project.id, "document_id": 999}
+        )
+        self.client.login(username="testuser", password="password")
 
         # When
         response = self.client.delete(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(response.data['error'], 'Document does not exist')
+        self.assertEqual(response.data["error"], "Document does not exist")
         self.assertEqual(Document.objects.count(), 1)
 
     def test_delete_document_no_permission(self):
         # Given
-        user2 = CustomUser.objects.create_user(username='user2', password='password2')
-        project2 = Project.objects.create(name='Project 2', owner=user2)
-        document2 = Document.objects.create(name='Document 2', owner=user2, project=project2)
+        user2 = CustomUser.objects.create_user(username="user2", password="password2")
+        project2 = Project.objects.create(name="Project 2", owner=user2)
+        document2 = Document.objects.create(
+            name="Document 2", owner=user2, project=project2
+        )
 
-        url = reverse('document', kwargs={'project_id': project2.id, 'document_id': document2.id})
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse(
+            "document", kwargs={"project_id": project2.id, "document_id": document2.id}
+        )
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.delete(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-        self.assertEqual(response.data['error'], 'You do not have permission to access this document')
+        self.assertEqual(
+            response.data["error"], "You do not have permission to access this document"
+        )
         self.assertEqual(Document.objects.count(), 2)
 
     def tearDown(self):
@@ -504,115 +1064,459 @@ class DocumentApiViewTest(APITestCase):
         self.document.delete()
 
 
-class GetEventsTest(APITestCase):
+class RequestProfilingMiddlewareTest(APITestCase):
     def setUp(self):
         self.user = CustomUser.objects.create_user(
-            username='testuser', password='testpassword'
-        )
-        self.project1 = Project.objects.create(
-            name='Test Project 1', owner=self.user
-        )
-        self.project2 = Project.objects.create(
-            name='Test Project 2', owner=self.user
-        )
-
-        self.project2.updated_at = self.project2.created_at + timedelta(hours=1)
-        self.project2.save()
-
-        self.document = Document.objects.create(
-            name='Test Document', owner=self.user, project=self.project1
+            username="testuser", password="testpassword"
         )
-        self.user.project_permissions = {
-            str(self.project1.id): WRITE_PERMISSIONS,
-            str(self.project2.id): WRITE_PERMISSIONS,
-        }
-        self.user.save()
+        self.profile_dir = tempfile.mkdtemp()
 
-    def test_get_events(self):
+    def test_query_headers(self):
         # Given
-        url = reverse('events')
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("projects")
+        self.client.login(username="testuser", password="testpassword")
 
         # When
-        response = self.client.get(url)
+        with override_settings(REQUEST_PROFILING=True):
+            response = self.client.get(url)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
-        self.assertEqual(response.data[0]['type'], 'project')
-        self.assertEqual(response.data[1]['type'], 'document')
+        self.assertGreater(int(response["X-Query-Count"]), 0)
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertGreater(
+            REGISTRY.get_sample_value(
+                "django_request_queries_count", {"view": "projects"}
+            ),
+            0,
+        )
 
-    def test_get_events_unauthenticated(self):
+    def test_slow_request_profile(self):
         # Given
-        url = reverse('events')
+        url = reverse("projects")
+        self.client.login(username="testuser", password="testpassword")
 
         # When
-        response = self.client.get(url)
+        with override_settings(
+            REQUEST_PROFILING=True,
+            REQUEST_PROFILING_SAMPLE_RATE=1,
+            REQUEST_PROFILING_SLOW=0,
+            REQUEST_PROFILING_DIR=self.profile_dir,
+        ):
+            self.client.get(url)
 
         # Then
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        profiles = os.listdir(self.profile_dir)
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].startswith("projects-"))
+        self.assertGreater(
+            pstats.Stats(os.path.join(self.profile_dir, profiles[0])).total_calls, 0
+        )
 
-    def test_get_events_action(self):
+    def test_disabled(self):
         # Given
-        url = reverse('events')
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("projects")
+        self.client.login(username="testuser", password="testpassword")
 
         # When
         response = self.client.get(url)
 
         # Then
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 3)
-
-        # Find the project events
-        project1_event = None
-        project2_event = None
-        for event in response.data:
-            if event['project_id'] == self.project1.id:
-                project1_event = event
-            elif event['project_id'] == self.project2.id:
-                project2_event = event
-
-        # Assert project1's action is 'created'
-        self.assertIsNotNone(project1_event)
-        self.assertEqual(project1_event['type'], 'project')
-        self.assertEqual(project1_event['action'], 'created')
-
-        # Assert project2's action is 'updated'
-        self.assertIsNotNone(project2_event)
-        self.assertEqual(project2_event['type'], 'project')
-        self.assertEqual(project2_event['action'], 'updated')
+        self.assertNotIn("X-Query-Count", response)
+
+    def tearDown(self):
+        self.user.delete()
+        shutil.rmtree(self.profile_dir)
+
+
+class BulkCreateDocumentsTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.project1 = Project.objects.create(name="Test Project 1", owner=self.user)
+        self.project2 = Project.objects.create(name="Test Project 2", owner=self.user)
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project1, access=WRITE_PERMISSIONS
+        )
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project2, access=READ_PERMISSIONS
+        )
+
+    def test_bulk_create_documents_ndjson(self):
+        # Given
+        url = reverse("create_documents")
+        self.client.login(username="testuser", password="testpassword")
+        lines = [
+            json.dumps(
+                {
+                    "project": self.project1.id,
+                    "name": f"Document {i}",
+                    "text": f"Text {i}",
+                }
+            )
+            for i in range(3)
+        ] + [
+            "not json",
+            json.dumps(
+                {"project": self.project2.id, "name": "Read only", "text": "Text"}
+            ),
+            json.dumps({"project": self.project1.id, "name": "No text"}),
+        ]
+
+        # When
+        with self.settings(BULK_INGEST_CHUNK_SIZE=2):
+            response = self.client.post(
+                url, "\n".join(lines), content_type="application/x-ndjson"
+            )
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual(
+            [error["source"] for error in response.data["errors"]], [4, 5, 6]
+        )
+        self.assertEqual(
+            response.data["errors"][1]["error"],
+            "You do not have permission to add documents to this project",
+        )
+        self.assertEqual(
+            Document.objects.filter(project=self.project1, owner=self.user).count(), 3
+        )
+        self.assertEqual(
+            Event.objects.filter(project=self.project1, action="created").count(), 3
+        )
+
+    def test_bulk_create_documents_zip(self):
+        # Given
+        url = reverse("create_documents") + f"?project={self.project1.id}"
+        self.client.login(username="testuser", password="testpassword")
+        upload = io.BytesIO()
+        with zipfile.ZipFile(upload, "w") as archive:
+            archive.writestr("corpus/first.txt", "The first text.")
+            archive.writestr("corpus/second.txt", "The second text.")
+
+        # When
+        response = self.client.post(
+            url, upload.getvalue(), content_type="application/zip"
+        )
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(
+            list(
+                Document.objects.filter(project=self.project1)
+                .order_by("name")
+                .values_list("name", "text")
+            ),
+            [("first", "The first text."), ("second", "The second text.")],
+        )
+
+    def test_bulk_create_documents_zip_no_permission(self):
+        # Given
+        url = reverse("create_documents") + f"?project={self.project2.id}"
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.post(url, b"", content_type="application/zip")
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_create_documents_bad_zip(self):
+        # Given
+        url = reverse("create_documents") + f"?project={self.project1.id}"
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.post(
+            url, b"not a zip file", content_type="application/zip"
+        )
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Upload is not a valid zip file")
+
+    def test_bulk_create_documents_content_type(self):
+        # Given
+        url = reverse("create_documents")
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.post(url, {"project": self.project1.id}, format="json")
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["error"],
+            "Content type must be application/x-ndjson or application/zip",
+        )
+
+    def test_bulk_create_documents_unauthenticated(self):
+        # Given
+        url = reverse("create_documents")
+
+        # When
+        response = self.client.post(url, "", content_type="application/x-ndjson")
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def tearDown(self):
+        self.user.delete()
+
+
+class ExportProjectTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.project = Project.objects.create(name="Test Project", owner=self.user)
+        self.document1 = Document.objects.create(
+            name="Document 1",
+            owner=self.user,
+            project=self.project,
+            text="The Labour Party won the election.",
+            entities=[[4, 16, "politicalparty"]],
+        )
+        self.document2 = Document.objects.create(
+            name="Document 2",
+            owner=self.user,
+            project=self.project,
+            text="Not tagged yet.",
+        )
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project, access=READ_PERMISSIONS
+        )
+
+    def test_export_project_ndjson(self):
+        # Given
+        url = reverse("project_export", kwargs={"project_id": self.project.id})
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        documents = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [document["id"] for document in documents],
+            [self.document1.id, self.document2.id],
+        )
+        self.assertEqual(documents[0]["entities"], [[4, 16, "politicalparty"]])
+        self.assertIsNone(documents[1]["entities"])
+
+    def test_export_project_docbin(self):
+        # Given
+        url = reverse("project_export", kwargs={"project_id": self.project.id})
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        with self.settings(EXPORT_DOCBIN_SHARD_SIZE=1):
+            response = self.client.get(url, {"type": "docbin"})
+            content = b"".join(response.streaming_content)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertEqual(len(archive.namelist()), 2)
+            doc_bin = DocBin().from_bytes(archive.read(archive.namelist()[0]))
+        doc = list(doc_bin.get_docs(get_model().nlp.vocab))[0]
+        self.assertEqual(
+            [(ent.text, ent.label_) for ent in doc.ents],
+            [("Labour Party", "politicalparty")],
+        )
+
+    def test_export_project_bad_type(self):
+        # Given
+        url = reverse("project_export", kwargs={"project_id": self.project.id})
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url, {"type": "csv"})
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Type must be ndjson or docbin")
+
+    def test_export_project_no_permission(self):
+        # Given
+        another_user = CustomUser.objects.create_user(
+            username="anotheruser", password="anotherpassword"
+        )
+        url = reverse("project_export", kwargs={"project_id": self.project.id})
+        self.client.login(username="anotheruser", password="anotherpassword")
+
+        # When
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        another_user.delete()
+
+    def tearDown(self):
+        self.user.delete()
+
+
+class GetEventsTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword", create_projects=True
+        )
+        self.project1 = Project.objects.create(name="Test Project 1", owner=self.user)
+        self.project2 = Project.objects.create(name="Test Project 2", owner=self.user)
+        self.project3 = Project.objects.create(name="Test Project 3", owner=self.user)
+        self.document = Document.objects.create(
+            name="Test Document", owner=self.user, project=self.project1
+        )
+        Event.objects.bulk_create(
+            [
+                Event.for_project(self.project1, "created"),
+                Event.for_project(self.project2, "created"),
+                Event.for_project(self.project3, "created"),
+                Event.for_document(self.document, "created"),
+                Event.for_project(self.project2, "updated"),
+            ]
+        )
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project1, access=WRITE_PERMISSIONS
+        )
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project2, access=WRITE_PERMISSIONS
+        )
+
+    def test_get_events(self):
+        # Given
+        url = reverse("events")
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(response.data[0]["type"], "project")
+        self.assertEqual(response.data[1]["type"], "document")
+        self.assertEqual(response.data[1]["document_id"], self.document.id)
+        self.assertNotIn(
+            self.project3.id, [event["project_id"] for event in response.data]
+        )
+
+    def test_get_events_unauthenticated(self):
+        # Given
+        url = reverse("events")
+
+        # When
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_get_events_action(self):
+        # Given
+        url = reverse("events")
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        project2_events = [
+            event for event in response.data if event["project_id"] == self.project2.id
+        ]
+        self.assertEqual(
+            [event["action"] for event in project2_events], ["updated", "created"]
+        )
+        self.assertEqual(response.data[-1]["project_id"], self.project1.id)
+        self.assertEqual(response.data[-1]["action"], "created")
+
+    def test_get_events_paginated(self):
+        # Given
+        url = reverse("events")
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        first_page = self.client.get(url, {"limit": 3})
+        second_page = self.client.get(first_page.data["next"])
+
+        # Then
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first_page.data["results"]), 3)
+        self.assertEqual(len(second_page.data["results"]), 1)
+        self.assertEqual(second_page.data["results"][0]["project_id"], self.project1.id)
+        self.assertIsNone(second_page.data["next"])
+
+    def test_post_project_records_event(self):
+        # Given
+        self.client.login(username="testuser", password="testpassword")
+        self.client.post(
+            reverse("create_project"),
+            {"name": "New Project", "permissions": "read"},
+            format="json",
+        )
+
+        # When
+        response = self.client.get(reverse("events"))
+
+        # Then
+        self.assertEqual(response.data[0]["type"], "project")
+        self.assertEqual(response.data[0]["name"], "New Project")
+        self.assertEqual(response.data[0]["action"], "created")
 
     def tearDown(self):
         self.user.delete()
         self.project1.delete()
         self.project2.delete()
+        self.project3.delete()
         self.document.delete()
 
 
 class TagTextTest(APITestCase):
     def setUp(self):
         self.user = CustomUser.objects.create_user(
-            username='testuser', password='testpassword'
+            username="testuser", password="testpassword"
         )
 
     def test_tag_text(self):
         # Given
-        url = reverse('tag')
-        self.client.login(username='testuser', password='testpassword')
-        data = {'text': 'John Doe works at Google.'}
+        url = reverse("tag")
+        self.client.login(username="testuser", password="testpassword")
+        data = {"text": "John Doe works at Google."}
+
+        # When
+        response = self.client.post(url, data)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.data.get("entities"))
+        self.assertEqual(response.data["model_version"], get_model().version)
+        self.assertNotIn("tagged_text", response.data)
+
+    def test_tag_text_render_html(self):
+        # Given
+        url = reverse("tag") + "?render=html"
+        self.client.login(username="testuser", password="testpassword")
+        data = {"text": "John Doe works at <b>Google</b>."}
 
         # When
         response = self.client.post(url, data)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIsNotNone(response.data.get('tagged_text'))
+        self.assertIsNotNone(response.data.get("entities"))
+        self.assertIn("&lt;b&gt;", response.data["tagged_text"])
 
     def test_tag_text_unauthenticated(self):
         # Given
-        url = reverse('tag')
-        data = {'text': 'John Doe works at Google.'}
+        url = reverse("tag")
+        data = {"text": "John Doe works at Google."}
 
         # When
         response = self.client.post(url, data)
@@ -622,8 +1526,8 @@ class TagTextTest(APITestCase):
 
     def test_tag_text_missing(self):
         # Given
-        url = reverse('tag')
-        self.client.login(username='testuser', password='testpassword')
+        url = reverse("tag")
+        self.client.login(username="testuser", password="testpassword")
         data = {}
 
         # When
@@ -631,20 +1535,1246 @@ class TagTextTest(APITestCase):
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(response.data['error'], 'Text is required')
+        self.assertEqual(response.data["error"], "Text is required")
 
     def test_tag_text_invalid_length(self):
         # Given
-        url = reverse('tag')
-        self.client.login(username='testuser', password='testpassword')
-        data = {'text': 'a' * 5001}
+        url = reverse("tag")
+        self.client.login(username="testuser", password="testpassword")
+        data = {"text": "a" * 5001}
 
         # When
         response = self.client.post(url, data)
 
         # Then
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(response.data['error'], 'Text must be between 1 and 5000 characters')
+        self.assertEqual(
+            response.data["error"], "Text must be between 1 and 5000 characters"
+        )
+
+    def tearDown(self):
+        self.user.delete()
+
+
+class TaggingMetricsTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.project = Project.objects.create(name="Test Project", owner=self.user)
+
+    @staticmethod
+    def sample(name, labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_tag_text_metrics(self):
+        # Given
+        url = reverse("tag") + "?render=html"
+        self.client.login(username="testuser", password="testpassword")
+        tagged = self.sample("ner_tagging_documents_total", {"path": "quick_tag"})
+        renders = self.sample(
+            "ner_tagging_phase_seconds_count", {"path": "quick_tag", "phase": "render"}
+        )
+
+        # When
+        response = self.client.post(
+            url, {"text": f"John Doe works at Google. {time.time()}"}
+        )
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.sample("ner_tagging_documents_total", {"path": "quick_tag"}),
+            tagged + 1,
+        )
+        self.assertEqual(
+            self.sample(
+                "ner_tagging_phase_seconds_count",
+                {"path": "quick_tag", "phase": "render"},
+            ),
+            renders + 1,
+        )
+        self.assertGreater(
+            self.sample("ner_tagging_tokens_total", {"path": "quick_tag"}), 0
+        )
+
+    def test_perform_tagging_metrics(self):
+        # Given
+        document = Document.objects.create(
+            name="Document",
+            owner=self.user,
+            project=self.project,
+            text=f"The UN met in New York. {time.time()}",
+        )
+        saves = self.sample(
+            "ner_tagging_phase_seconds_count", {"path": "document", "phase": "save"}
+        )
+        inferences = self.sample(
+            "ner_tagging_inference_seconds_count", {"path": "document", "size": "<=1k"}
+        )
+
+        # When
+        perform_tagging(document.id, self.project.id)
+
+        # Then
+        self.assertEqual(
+            self.sample(
+                "ner_tagging_phase_seconds_count", {"path": "document", "phase": "save"}
+            ),
+            saves + 1,
+        )
+        self.assertEqual(
+            self.sample(
+                "ner_tagging_inference_seconds_count",
+                {"path": "document", "size": "<=1k"},
+            ),
+            inferences + 1,
+        )
+
+    def test_perform_tagging_failure(self):
+        # Given
+        failed = self.sample("ner_tagging_failures_total", {"path": "document"})
+
+        # When
+        with mock.patch("api.tasks.get_model", side_effect=RuntimeError("no model")):
+            with self.assertRaises(RuntimeError):
+                perform_tagging(999, self.project.id)
+
+        # Then
+        self.assertEqual(
+            self.sample("ner_tagging_failures_total", {"path": "document"}), failed + 1
+        )
+
+    def test_size_label(self):
+        # Then
+        self.assertEqual(size_label(500), "<=1k")
+        self.assertEqual(size_label(5000), "<=5k")
+        self.assertEqual(size_label(10**6), ">100k")
+
+
+class PerformTaggingBatchTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.project = Project.objects.create(name="Test Project", owner=self.user)
+        self.document1 = Document.objects.create(
+            name="Document 1",
+            owner=self.user,
+            project=self.project,
+            text="John Doe works at Google.",
+        )
+        self.document2 = Document.objects.create(
+            name="Document 2",
+            owner=self.user,
+            project=self.project,
+            text="The UN met in New York.",
+        )
+
+    def test_perform_tagging_batch(self):
+        # Given
+        document_ids = [self.document1.id, self.document2.id]
+
+        # When
+        perform_tagging_batch(document_ids)
+
+        # Then
+        self.document1.refresh_from_db()
+        self.document2.refresh_from_db()
+        self.assertIsNotNone(self.document1.entities)
+        self.assertIsNotNone(self.document2.entities)
+        self.assertEqual(self.document1.model_version, get_model().version)
+        for start, end, label in self.document1.entities:
+            self.assertLessEqual(end, len(self.document1.text))
+            self.assertTrue(label)
+        self.assertEqual(
+            sorted(
+                Event.objects.filter(action="updated").values_list(
+                    "document_id", flat=True
+                )
+            ),
+            document_ids,
+        )
+
+    @override_settings(NER_FAIR_SHARE_DOCUMENTS=10)
+    def test_bulk_priority(self):
+        # Given
+        redis_client.delete(BULK_BACKLOG_KEY.format(self.user.id))
+
+        # When
+        priorities = [bulk_priority(self.user.id, 5) for _ in range(4)]
+
+        # Then
+        self.assertEqual(
+            priorities,
+            [BULK_PRIORITY, BULK_PRIORITY, BULK_PRIORITY + 1, BULK_PRIORITY + 1],
+        )
+        self.assertGreater(redis_client.ttl(BULK_BACKLOG_KEY.format(self.user.id)), 0)
+
+    def test_perform_tagging_batch_releases_backlog(self):
+        # Given
+        redis_client.delete(BULK_BACKLOG_KEY.format(self.user.id))
+        bulk_priority(self.user.id, 2)
+
+        # When
+        perform_tagging_batch([self.document1.id, self.document2.id], self.user.id)
+
+        # Then
+        self.assertFalse(redis_client.exists(BULK_BACKLOG_KEY.format(self.user.id)))
+
+    def test_perform_tagging_batch_redelivered(self):
+        # Given
+        task_id = f"redelivered-{self.document1.id}"
+        redis_client.set(DELIVERIES_KEY.format(task_id), settings.NER_MAX_DELIVERIES)
+
+        # When
+        perform_tagging_batch.apply(([self.document1.id],), task_id=task_id)
+
+        # Then
+        redis_client.delete(DELIVERIES_KEY.format(task_id))
+        self.document1.refresh_from_db()
+        self.assertIsNone(self.document1.entities)
+        self.assertEqual(self.document1.tagging_status, "failed")
+
+    def test_perform_tagging_batch_missing_documents(self):
+        # Given
+        document_ids = [999]
+
+        # When
+        perform_tagging_batch(document_ids)
+
+        # Then
+        self.document1.refresh_from_db()
+        self.assertIsNone(self.document1.entities)
+
+    def tearDown(self):
+        redis_client.delete(BULK_BACKLOG_KEY.format(self.user.id))
+        self.user.delete()
+        self.project.delete()
+
+
+class TaggingJobsTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.project = Project.objects.create(name="Test Project", owner=self.user)
+        self.document = Document.objects.create(
+            name="Document",
+            owner=self.user,
+            project=self.project,
+            text="John Doe works at Google.",
+        )
+        unmark_queued([self.document.id])
+
+    def test_perform_tagging_status(self):
+        # When
+        perform_tagging(self.document.id, self.project.id)
+
+        # Then
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.tagging_status, "done")
+        self.assertEqual(self.document.model_version, get_model().version)
+
+    def test_perform_tagging_current(self):
+        # Given
+        Document.objects.filter(id=self.document.id).update(
+            entities=[], model_version=get_model().version, tagging_status="done"
+        )
+
+        # When
+        perform_tagging(self.document.id, self.project.id)
+        perform_tagging_batch([self.document.id])
+
+        # Then
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.entities, [])
+        self.assertFalse(
+            Event.objects.filter(document=self.document, action="updated").exists()
+        )
+
+    def test_perform_tagging_batch_force(self):
+        # Given
+        Document.objects.filter(id=self.document.id).update(
+            entities=[], model_version=get_model().version, tagging_status="done"
+        )
+
+        # When
+        perform_tagging_batch([self.document.id], force=True)
+
+        # Then
+        self.assertTrue(
+            Event.objects.filter(document=self.document, action="updated").exists()
+        )
+
+    def test_mark_queued(self):
+        # When
+        first = mark_queued([self.document.id])
+        second = mark_queued([self.document.id])
+        unmark_queued([self.document.id])
+        third = mark_queued([self.document.id])
+
+        # Then
+        self.assertEqual(first, [self.document.id])
+        self.assertEqual(second, [])
+        self.assertEqual(third, [self.document.id])
+
+    def test_perform_tagging_deleted(self):
+        # Given
+        mark_queued([self.document.id])
+        Document.objects.filter(id=self.document.id).delete()
+        failed = REGISTRY.get_sample_value(
+            "ner_tagging_failures_total", {"path": "document"}
+        )
+
+        # When
+        perform_tagging(self.document.id, self.project.id, queued=True)
+
+        # Then
+        self.assertEqual(
+            REGISTRY.get_sample_value(
+                "ner_tagging_failures_total", {"path": "document"}
+            ),
+            failed,
+        )
+        self.assertEqual(mark_queued([self.document.id]), [self.document.id])
+
+    def test_perform_tagging_batch_keeps_queued_marker(self):
+        # Given
+        mark_queued([self.document.id])
+
+        # When
+        perform_tagging_batch([self.document.id], force=True)
+        retried = mark_queued([self.document.id])
+        perform_tagging_batch([self.document.id], queued=True)
+        queued = mark_queued([self.document.id])
+
+        # Then
+        self.assertEqual(retried, [])
+        self.assertEqual(queued, [self.document.id])
+
+    def test_save_tagged_edited(self):
+        # Given
+        document = Document.objects.get(id=self.document.id)
+        document.entities = [[0, 8, "person"]]
+        Document.objects.filter(id=self.document.id).update(
+            text="Jane Doe works at Google."
+        )
+
+        # When
+        saved = save_tagged([document])
+
+        # Then
+        self.assertEqual(saved, [])
+        self.document.refresh_from_db()
+        self.assertIsNone(self.document.entities)
+        self.assertEqual(self.document.tagging_status, "queued")
+
+    def test_create_document_tagging_status(self):
+        # Given
+        url = reverse("create_document")
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project, access=WRITE_PERMISSIONS
+        )
+        self.client.login(username="testuser", password="testpassword")
+        data = {
+            "name": "New Document",
+            "project": self.project.id,
+            "text": "The UN met in New York.",
+            "entities": [[4, 6, "ORG"]],
+            "model_version": "forged",
+            "tagging_status": "done",
+        }
+
+        # When
+        response = self.client.post(url, data, format="json")
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        document = Document.objects.get(id=response.data["id"])
+        self.assertEqual(document.tagging_status, "queued")
+        self.assertNotEqual(document.model_version, "forged")
+
+    def tearDown(self):
+        unmark_queued([self.document.id])
+        self.user.delete()
+        self.project.delete()
+
+
+# The task retag submits its batches to, mocked so that nothing is queued
+RETAG_TASK = "api.management.commands.retag.perform_tagging_batch"
+
+
+class FinishedBatch:
+    """A finished Celery result for the batches retag submits"""
+
+    def __init__(self, error=None):
+        self.error = error
+
+    def ready(self):
+        return True
+
+    def get(self):
+        if self.error is not None:
+            raise self.error
+
+
+@mock.patch("api.management.commands.retag.queue_length", return_value=0)
+class RetagCommandTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.project = Project.objects.create(name="Test Project", owner=self.user)
+        self.document_ids = [
+            Document.objects.create(
+                name=f"Document {i}",
+                owner=self.user,
+                project=self.project,
+                text="John Doe works at Google.",
+            ).id
+            for i in range(3)
+        ]
+        redis_client.delete(CHECKPOINT_KEY)
+
+    def retag(self, *args):
+        call_command(
+            "retag",
+            "--all",
+            "--project",
+            str(self.project.id),
+            "--batch-size",
+            "2",
+            "--max-in-flight",
+            "1",
+            *args,
+            stdout=io.StringIO(),
+        )
+
+    def save_checkpoint(self, last_id, project_id):
+        redis_client.set(
+            CHECKPOINT_KEY,
+            json.dumps(
+                {
+                    "last_id": last_id,
+                    "options": {
+                        "model_version": get_model().version,
+                        "all": True,
+                        "project": project_id,
+                    },
+                }
+            ),
+        )
+
+    @staticmethod
+    def submitted(apply_async):
+        return [call.args[0][0] for call in apply_async.call_args_list]
+
+    def test_retag(self, queue_length):
+        # When
+        with mock.patch(RETAG_TASK) as task:
+            task.apply_async.return_value = FinishedBatch()
+            self.retag()
+
+        # Then
+        self.assertEqual(
+            self.submitted(task.apply_async),
+            [self.document_ids[:2], self.document_ids[2:]],
+        )
+        self.assertIsNone(redis_client.get(CHECKPOINT_KEY))
+
+    def test_retag_resume(self, queue_length):
+        # Given
+        self.save_checkpoint(self.document_ids[0], self.project.id)
+
+        # When
+        with mock.patch(RETAG_TASK) as task:
+            task.apply_async.return_value = FinishedBatch()
+            self.retag("--resume")
+
+        # Then
+        self.assertEqual(self.submitted(task.apply_async), [self.document_ids[1:]])
+        self.assertIsNone(redis_client.get(CHECKPOINT_KEY))
+
+    def test_retag_resume_other_options(self, queue_length):
+        # Given
+        self.save_checkpoint(self.document_ids[0], None)
+
+        # When
+        with mock.patch(RETAG_TASK) as task:
+            with self.assertRaises(CommandError):
+                self.retag("--resume")
+
+        # Then
+        task.apply_async.assert_not_called()
+        self.assertEqual(
+            json.loads(redis_client.get(CHECKPOINT_KEY))["last_id"],
+            self.document_ids[0],
+        )
+
+    def test_retag_failed_batch(self, queue_length):
+        # When
+        with mock.patch(RETAG_TASK) as task:
+            task.apply_async.side_effect = [
+                FinishedBatch(),
+                FinishedBatch(RuntimeError("failed")),
+            ]
+            with self.assertRaises(CommandError):
+                self.retag("--batch-size", "1")
+
+        # Then
+        self.assertEqual(
+            json.loads(redis_client.get(CHECKPOINT_KEY))["last_id"],
+            self.document_ids[0],
+        )
+
+    def tearDown(self):
+        redis_client.delete(CHECKPOINT_KEY)
+        self.user.delete()
+        self.project.delete()
+
+
+class ChunkingTest(APITestCase):
+    def setUp(self):
+        self.text = " ".join(
+            f"Sentence {i} mentions the United Nations and the European Union."
+            for i in range(100)
+        )
+
+    def test_split_windows(self):
+        # When
+        windows = split_windows(self.text, 500, 100)
+
+        # Then
+        self.assertEqual(windows[0][0], 0)
+        self.assertEqual(windows[-1][1], len(self.text))
+        for (start, end), (next_start, next_end) in zip(windows, windows[1:]):
+            self.assertLessEqual(end - start, 500)
+            # Consecutive windows overlap, and start and end on sentence boundaries
+            self.assertLess(next_start, end)
+            self.assertGreater(next_end, end)
+            self.assertTrue(self.text[next_start:].startswith("Sentence"))
+
+    def test_merge_window_entities(self):
+        # Given
+        windows = split_windows(self.text, 500, 100)
+        window_entities = [
+            [
+                [match.start(), match.end(), "organisation"]
+                for match in re.finditer("United Nations", self.text[start:end])
+            ]
+            for start, end in windows
+        ]
+
+        # When
+        entities = merge_window_entities(windows, window_entities)
+
+        # Then
+        self.assertEqual(
+            entities,
+            [
+                [match.start(), match.end(), "organisation"]
+                for match in re.finditer("United Nations", self.text)
+            ],
+        )
+
+    def test_split_windows_long_sentence(self):
+        # Given
+        text = "word " * 300
+
+        # When
+        windows = split_windows(text, 500, 100)
+
+        # Then
+        self.assertEqual(windows[-1][1], len(text))
+        self.assertTrue(all(end - start <= 500 for start, end in windows))
+
+
+class IncrementalTaggingTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.project = Project.objects.create(name="Test Project", owner=self.user)
+        self.old_text = (
+            "Angela Merkel visited Paris. The talks went well. Nothing else happened. "
+            "Emmanuel Macron thanked Germany. The Labour Party said nothing."
+        )
+        self.old_entities = [
+            [0, 13, "person"],
+            [22, 27, "location"],
+            [73, 88, "person"],
+            [97, 104, "location"],
+            [110, 122, "politicalparty"],
+        ]
+        self.new_text = (
+            "Angela Merkel visited Paris on Monday. The talks went well. Nothing else happened. "
+            "Emmanuel Macron thanked Germany. The Labour Party said nothing."
+        )
+
+    def test_plan_retagging(self):
+        # When
+        kept, regions = plan_retagging(self.old_text, self.old_entities, self.new_text)
+
+        # Then
+        self.assertEqual(len(regions), 1)
+        self.assertEqual(regions[0][0], 0)
+        self.assertLess(regions[0][1], self.new_text.index("Emmanuel"))
+        self.assertEqual(
+            [self.new_text[start:end] for start, end, _ in kept],
+            ["Emmanuel Macron", "Germany", "Labour Party"],
+        )
+
+    def test_perform_incremental_tagging(self):
+        # Given
+        model_version = get_model().version
+        document = Document.objects.create(
+            name="Document", owner=self.user, project=self.project, text=self.new_text
+        )
+        kept, regions = plan_retagging(self.old_text, self.old_entities, self.new_text)
+
+        # When
+        perform_incremental_tagging(
+            document.id,
+            model_version,
+            TaggingCache.key(self.new_text, model_version),
+            kept,
+            regions,
+        )
+
+        # Then
+        document.refresh_from_db()
+        self.assertEqual(document.model_version, model_version)
+        for entity in kept:
+            self.assertIn(entity, document.entities)
+        for start, end, label in document.entities:
+            self.assertTrue(end <= regions[0][1] or [start, end, label] in kept)
+        self.assertTrue(
+            Event.objects.filter(document=document, action="updated").exists()
+        )
+
+    def test_perform_incremental_tagging_text_changed(self):
+        # Given
+        model_version = get_model().version
+        document = Document.objects.create(
+            name="Document", owner=self.user, project=self.project, text="Edited again."
+        )
+        kept, regions = plan_retagging(self.old_text, self.old_entities, self.new_text)
+
+        # When
+        perform_incremental_tagging(
+            document.id,
+            model_version,
+            TaggingCache.key(self.new_text, model_version),
+            kept,
+            regions,
+        )
+
+        # Then
+        document.refresh_from_db()
+        self.assertIsNone(document.entities)
+
+
+class QuantiseTest(APITestCase):
+    def test_quantise(self):
+        # Given
+        pipeline = spacy.load(settings.NER_MODEL_PATH)
+        text = "Angela Merkel and Emmanuel Macron signed the Treaty of Aachen."
+
+        # When
+        quantise(pipeline)
+        entities = extract_entities(pipeline(text))
+
+        # Then
+        shim = pipeline.get_pipe("transformer").model.layers[0].shims[0]
+        self.assertTrue(
+            any(
+                isinstance(module, torch.nn.quantized.dynamic.Linear)
+                for module in shim._model.modules()
+            )
+        )
+        self.assertFalse(
+            any(type(module) is torch.nn.Linear for module in shim._model.modules())
+        )
+        for start, end, label in entities:
+            self.assertLess(start, end)
+            self.assertLessEqual(end, len(text))
+            self.assertTrue(label)
+
+
+class ModelRegistryTest(APITestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        # Versions of the same model, linked rather than copied to keep the test fast
+        for version in ("v1", "v2"):
+            os.symlink(settings.NER_MODEL_PATH, os.path.join(self.root, version))
+        os.mkdir(os.path.join(self.root, "broken"))
+        self.registry = ModelRegistry(self.root, settings.NER_MODEL_PATH, 0)
+
+    def test_activate(self):
+        # When
+        self.registry.activate("v1")
+        self.registry.activate("v2")
+
+        # Then
+        self.assertEqual(self.registry.versions(), ["broken", "v1", "v2"])
+        self.assertEqual(self.registry.active_version(), "v2")
+
+    def test_activate_unknown_version(self):
+        # When
+        with self.assertRaises(ValueError):
+            self.registry.activate("v3")
+
+        # Then
+        self.assertIsNone(self.registry.active_version())
+
+    def test_get_switches_model(self):
+        # Given
+        self.registry.activate("v1")
+        first = self.registry.get()
+
+        # When
+        self.registry.activate("v2")
+        second = self.registry.get()
+
+        # Then
+        self.assertEqual(first.version, "v1")
+        self.assertEqual(second.version, "v2")
+        self.assertIsNot(first.nlp, second.nlp)
+
+    def test_get_keeps_model_if_new_one_fails_to_load(self):
+        # Given
+        self.registry.activate("v1")
+        first = self.registry.get()
+
+        # When
+        self.registry.activate("broken")
+        with self.assertLogs("api.ner", level="ERROR"):
+            second = self.registry.get()
+
+        # Then
+        self.assertIs(second, first)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+
+class GetModelVersionTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+
+    def test_get_model_version(self):
+        # Given
+        url = reverse("model")
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["model_version"], get_model().version)
+
+    def test_get_model_version_unauthenticated(self):
+        # Given
+        url = reverse("model")
+
+        # When
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def tearDown(self):
+        self.user.delete()
+
+
+class InferenceServiceTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.socket_dir = tempfile.mkdtemp()
+        cls.socket_path = os.path.join(cls.socket_dir, "ner-service.sock")
+        cls.server = MicroBatchingServer(cls.socket_path, b"testkey", 4, 0.01)
+        cls.server_thread = threading.Thread(
+            target=cls.server.serve_forever, daemon=True
+        )
+        cls.server_thread.start()
+        # Wait for the service to start listening
+        while not os.path.exists(cls.socket_path):
+            time.sleep(0.01)
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+
+    def test_tag_text_service(self):
+        # Given
+        url = reverse("tag")
+        self.client.login(username="testuser", password="testpassword")
+        data = {"text": "John Doe works at Google."}
+
+        # When
+        with override_settings(
+            NER_SERVICE=True,
+            NER_SERVICE_SOCKET=self.socket_path,
+            NER_SERVICE_AUTHKEY=b"testkey",
+        ):
+            response = self.client.post(url, data)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.data["entities"])
+
+    def test_tag_text_service_unavailable(self):
+        # Given
+        url = reverse("tag")
+        self.client.login(username="testuser", password="testpassword")
+        data = {"text": "John Doe works at Google."}
+
+        # When
+        with override_settings(
+            NER_SERVICE=True,
+            NER_SERVICE_SOCKET=os.path.join(self.socket_dir, "missing.sock"),
+        ):
+            response = self.client.post(url, data)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.data["error"], "Tagging service is unavailable")
+
+    def test_tag_text_service_timeout(self):
+        # Given
+        url = reverse("tag")
+        self.client.login(username="testuser", password="testpassword")
+        data = {"text": "John Doe works at Google."}
+        socket_path = os.path.join(self.socket_dir, "silent.sock")
+        listener = Listener(socket_path, authkey=b"testkey")
+        # Accept the request but never respond to it
+        connections = []
+        threading.Thread(
+            target=lambda: connections.append(listener.accept()), daemon=True
+        ).start()
+
+        # When
+        with override_settings(
+            NER_SERVICE=True,
+            NER_SERVICE_SOCKET=socket_path,
+            NER_SERVICE_AUTHKEY=b"testkey",
+            NER_SERVICE_TIMEOUT=0.1,
+        ):
+            response = self.client.post(url, data)
+
+        # Then
+        for connection in connections:
+            connection.close()
+        listener.close()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def tearDown(self):
+        self.user.delete()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server_thread.join()
+        shutil.rmtree(cls.socket_dir)
+        super().tearDownClass()
+
+
+class NotificationStreamTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.project1 = Project.objects.create(name="Test Project 1", owner=self.user)
+        self.project2 = Project.objects.create(name="Test Project 2", owner=self.user)
+        self.document1 = Document.objects.create(
+            name="Document 1",
+            owner=self.user,
+            project=self.project1,
+            text="John Doe works at Google.",
+        )
+        self.document2 = Document.objects.create(
+            name="Document 2",
+            owner=self.user,
+            project=self.project2,
+            text="The UN met in New York.",
+        )
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project1, access=READ_PERMISSIONS
+        )
+
+    def test_notification_stream(self):
+        # Given
+        event1 = Event.objects.create(
+            project=self.project1,
+            document=self.document1,
+            name="Document 1",
+            action="updated",
+        )
+        event2 = Event.objects.create(
+            project=self.project2,
+            document=self.document2,
+            name="Document 2",
+            action="updated",
+        )
+        with override_settings(NOTIFICATIONS_HEARTBEAT=1, NOTIFICATIONS_MAX_DURATION=2):
+            stream = notification_stream(self.user)
+            next(stream)
+
+            # When
+            publish_tagged([event2, event1])
+            messages = list(stream)
+
+        # Then
+        tagged = [message for message in messages if message.startswith("id:")]
+        self.assertEqual(len(tagged), 1)
+        self.assertIn(f"id: {event1.id}\nevent: tagged\n", tagged[0])
+        self.assertIn(f'"document_id": {self.document1.id}', tagged[0])
+
+    def test_notification_stream_replays_missed_events(self):
+        # Given
+        event1 = Event.objects.create(
+            project=self.project1,
+            document=self.document1,
+            name="Document 1",
+            action="created",
+        )
+        event2 = Event.objects.create(
+            project=self.project1,
+            document=self.document1,
+            name="Document 1",
+            action="updated",
+        )
+
+        # When
+        with override_settings(NOTIFICATIONS_HEARTBEAT=1, NOTIFICATIONS_MAX_DURATION=0):
+            messages = list(notification_stream(self.user, event1.id - 1))
+
+        # Then
+        self.assertEqual(len(messages), 2)
+        self.assertTrue(messages[0].startswith("retry:"))
+        self.assertTrue(messages[1].startswith(f"id: {event2.id}\n"))
+
+    def test_stream_notifications_bad_last_event_id(self):
+        # Given
+        url = reverse("notifications")
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url, HTTP_LAST_EVENT_ID="latest")
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Last-Event-ID must be an event id")
+
+    def test_stream_notifications_unauthenticated(self):
+        # Given
+        url = reverse("notifications")
+
+        # When
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def tearDown(self):
+        self.user.delete()
+
+
+class TaggingCacheTest(APITestCase):
+    def setUp(self):
+        self.redis_client = redis.Redis.from_url(settings.REDIS_URL)
+        self.cache = TaggingCache(self.redis_client, 2, 60)
+        # Model versions unique to the test keep its keys apart from real entries
+        self.version = f"test-{uuid.uuid4().hex}"
+        self.other_version = f"test-{uuid.uuid4().hex}"
+
+    def test_get_cached(self):
+        # Given
+        self.cache.set("John Doe works at Google.", self.version, [[0, 8, "PERSON"]])
+
+        # When
+        entities = self.cache.get("John Doe works at Google.", self.version)
+
+        # Then
+        self.assertEqual(entities, [[0, 8, "PERSON"]])
+
+    def test_local_eviction(self):
+        # Given
+        self.cache.set("text 1", self.version, [])
+        self.cache.set("text 2", self.version, [])
+        self.cache.get("text 1", self.version)
+
+        # When
+        self.cache.set("text 3", self.version, [])
+
+        # Then
+        self.assertEqual(len(self.cache.entries), 2)
+        self.assertIn(TaggingCache.key("text 1", self.version), self.cache.entries)
+        self.assertNotIn(TaggingCache.key("text 2", self.version), self.cache.entries)
+
+    def test_key_includes_model_version(self):
+        # When
+        key = TaggingCache.key("John Doe works at Google.", self.version)
+
+        # Then
+        self.assertIn(self.version, key)
+
+    def test_get_other_model_version(self):
+        # Given
+        self.cache.set("John Doe works at Google.", self.version, [[0, 8, "PERSON"]])
+
+        # When
+        entities = self.cache.get("John Doe works at Google.", self.other_version)
+
+        # Then
+        self.assertIsNone(entities)
+
+    def tearDown(self):
+        for version in (self.version, self.other_version):
+            keys = list(self.redis_client.scan_iter(f"ner:entities:{version}:*"))
+            if keys:
+                self.redis_client.delete(*keys)
+
+
+class EntitiesFromHtmlTest(APITestCase):
+    def test_entities_from_html(self):
+        # Given
+        text = "The United Nations met in\nNew York & Geneva."
+        tagged_html = (
+            '<div class="entities" style="line-height: 2.5; direction: ltr">The '
+            '<mark class="entity" style="background: #7aecec">United Nations<span style="font-size: 0.8em">ORG</span>'
+            '</mark> met in</br><mark class="entity" style="background: #feca74">New York'
+            '<span style="font-size: 0.8em">GPE</span></mark> &amp; <mark class="entity" style="background: #feca74">'
+            'Geneva<span style="font-size: 0.8em">GPE</span></mark>.</div>'
+        )
+
+        # When
+        entities = backfill_migration.entities_from_html(text, tagged_html)
+
+        # Then
+        self.assertEqual(entities, [[4, 18, "ORG"], [26, 34, "GPE"], [37, 43, "GPE"]])
+
+
+class SearchEntitiesTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.project1 = Project.objects.create(name="Test Project 1", owner=self.user)
+        self.project2 = Project.objects.create(name="Test Project 2", owner=self.user)
+        self.document1 = Document.objects.create(
+            name="Document 1",
+            owner=self.user,
+            project=self.project1,
+            text="The Labour Party won the election.",
+            entities=[[4, 16, "politicalparty"]],
+        )
+        self.document2 = Document.objects.create(
+            name="Document 2",
+            owner=self.user,
+            project=self.project2,
+            text="The  labour party lost the election.",
+            entities=[[5, 17, "politicalparty"]],
+        )
+        index_entities([self.document1, self.document2])
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project1, access=WRITE_PERMISSIONS
+        )
+
+    def test_index_entities(self):
+        # When
+        mentions = EntityMention.objects.filter(document=self.document2)
+
+        # Then
+        self.assertEqual(mentions.count(), 1)
+        self.assertEqual(mentions[0].text, "labour party")
+        self.assertEqual(mentions[0].project_id, self.project2.id)
+
+    def test_search_entities(self):
+        # Given
+        url = reverse("entity_search")
+        self.client.login(username="testuser", password="testpassword")
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project2, access=WRITE_PERMISSIONS
+        )
+
+        # When
+        response = self.client.get(
+            url, {"text": "Labour Party", "label": "politicalparty"}
+        )
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [document["id"] for document in response.data["results"]],
+            [self.document1.id, self.document2.id],
+        )
+        self.assertNotIn("text", response.data["results"][0])
+
+    def test_search_entities_no_permission(self):
+        # Given
+        url = reverse("entity_search")
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url, {"text": "labour party"})
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [document["id"] for document in response.data["results"]],
+            [self.document1.id],
+        )
+
+    def test_search_entities_pagination(self):
+        # Given
+        url = reverse("entity_search")
+        self.client.login(username="testuser", password="testpassword")
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project2, access=WRITE_PERMISSIONS
+        )
+
+        # When
+        first_page = self.client.get(url, {"label": "politicalparty", "page_size": 1})
+        second_page = self.client.get(first_page.data["next"])
+
+        # Then
+        self.assertEqual(first_page.data["results"][0]["id"], self.document1.id)
+        self.assertEqual(second_page.data["results"][0]["id"], self.document2.id)
+        self.assertIsNone(second_page.data["next"])
+
+    def test_search_entities_missing(self):
+        # Given
+        url = reverse("entity_search")
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Text or label is required")
+
+    def test_search_entities_unauthenticated(self):
+        # Given
+        url = reverse("entity_search")
+
+        # When
+        response = self.client.get(url, {"text": "labour party"})
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def tearDown(self):
+        self.user.delete()
+
+
+class SearchDocumentsTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.project1 = Project.objects.create(name="Test Project 1", owner=self.user)
+        self.project2 = Project.objects.create(name="Test Project 2", owner=self.user)
+        self.document1 = Document.objects.create(
+            name="Budget report",
+            owner=self.user,
+            project=self.project1,
+            text="The government published its spending plans for the elections.",
+        )
+        self.document2 = Document.objects.create(
+            name="Elections",
+            owner=self.user,
+            project=self.project1,
+            text="The general election was held in May.",
+        )
+        self.document3 = Document.objects.create(
+            name="Elections",
+            owner=self.user,
+            project=self.project2,
+            text="The election was held in June.",
+        )
+        ProjectPermission.objects.create(
+            user=self.user, project=self.project1, access=WRITE_PERMISSIONS
+        )
+
+    def test_search_results_loaded_in_one_query(self):
+        # Given
+        project_ids = [self.project1.id, self.project2.id]
+
+        # When
+        with self.assertNumQueries(1):
+            results = DocumentSearchResultSerializer(
+                full_text_search("election", project_ids), many=True
+            ).data
+
+        # Then
+        self.assertEqual(len(results), 3)
+        self.assertIn("tagging_status", results[0])
+
+    def test_search_documents(self):
+        # Given
+        url = reverse("document_search")
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url, {"q": "election"})
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        # The document whose name matches ranks above the one that only mentions it in
+        # its text
+        self.assertEqual(
+            [document["id"] for document in response.data["results"]],
+            [self.document2.id, self.document1.id],
+        )
+        self.assertNotIn("text", response.data["results"][0])
+
+    def test_search_documents_updated_text(self):
+        # Given
+        url = reverse("document_search")
+        self.client.login(username="testuser", password="testpassword")
+        self.document1.text = "The minister resigned."
+        self.document1.save()
+
+        # When
+        response = self.client.get(url, {"q": "minister"})
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [document["id"] for document in response.data["results"]],
+            [self.document1.id],
+        )
+
+    def test_search_documents_missing(self):
+        # Given
+        url = reverse("document_search")
+        self.client.login(username="testuser", password="testpassword")
+
+        # When
+        response = self.client.get(url)
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Query is required")
+
+    def test_search_documents_unauthenticated(self):
+        # Given
+        url = reverse("document_search")
+
+        # When
+        response = self.client.get(url, {"q": "election"})
+
+        # Then
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
     def tearDown(self):
         self.user.delete()
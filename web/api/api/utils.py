@@ -1,17 +1,4 @@
-import re
-import html
-
-
-def sanitise_input_text(text):
-    # Escape HTML characters
-    sanitized_text = html.escape(text)
-
-    # Remove potential script tags
-    sanitized_text = re.sub(r'<\s*script[^>]*>(.*?)<\s*/\s*script\s*>', '', sanitized_text,
-                            flags=re.IGNORECASE | re.MULTILINE | re.DOTALL)
-
-    return sanitized_text
-
-
-def unescape_text(text):
-    return html.unescape(text)
+def normalise_entity_text(text):
+    # Case and whitespace differences should not stop mentions of the same entity from
+    # matching
+    return " ".join(text.casefold().split())[:255]
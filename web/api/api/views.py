@@ -1,34 +1,106 @@
 # isort: skip_file
 
-import spacy
+import io
+
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MinLengthValidator, MaxLengthValidator
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.expressions import RawSQL
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework.decorators import api_view
-from rest_framework.generics import CreateAPIView, DestroyAPIView, RetrieveAPIView
+from rest_framework.generics import (
+    CreateAPIView,
+    DestroyAPIView,
+    RetrieveAPIView,
+    UpdateAPIView,
+)
 from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from spacy import displacy
 
-from .models import CustomUser, Document, Project
+from .cache import project_cache, tagging_cache
+from .export import docbin_export, ndjson_export, project_documents
+from .inference import InferenceServiceError, tag_text_remote
+from .ingest import DocumentIngester, IngestError, document_name, iter_ndjson, iter_zip
+from .metrics import count_failures, failures, phase, record_tagged, run_model
+from .models import (
+    CREATED,
+    TAGGING_QUEUED,
+    UPDATED,
+    CustomUser,
+    Document,
+    EntityMention,
+    Event,
+    Project,
+    ProjectPermission,
+)
+from .ner import extract_entities, get_model, render_entities
+from .notifications import notification_stream
 from .permissions import (
     CUSTOM_PERMISSIONS,
     NONE_PERMISSIONS,
     READ_PERMISSIONS,
     WRITE_PERMISSIONS,
 )
-from .serializers import DocumentSerializer, ProjectSerializer, UserSerializer
-from .tasks import perform_tagging
-from .utils import sanitise_input_text, unescape_text
+from .pagination import (
+    DocumentCursorPagination,
+    EventCursorPagination,
+    ProjectCursorPagination,
+    SearchPagination,
+    document_cursor_link,
+    wants_pagination,
+)
+from .search import full_text_search
+from .serializers import (
+    DocumentMetadataSerializer,
+    DocumentSearchResultSerializer,
+    DocumentSerializer,
+    EventSerializer,
+    ProjectListSerializer,
+    ProjectSerializer,
+    UserSerializer,
+)
+from .tasks import queue_retagging, queue_tagging
+from .utils import normalise_entity_text
 
-nlp = spacy.load("/home/api/ner-model")
+DOCUMENT_METADATA_FIELDS = DocumentMetadataSerializer.Meta.fields
 
 
 def index(request):
     return render(request, "index.html")
 
 
+def first_documents(project_ids, limit=None):
+    """
+    The documents of the given projects with only their metadata loaded, ordered by id.
+    If limit is set, only the first limit + 1 documents of each project are returned, so
+    callers can tell whether a project has more.
+    """
+    if not project_ids:
+        return Document.objects.none()
+    documents = Document.objects.filter(project_id__in=project_ids)
+    if limit is not None:
+        documents = documents.filter(
+            id__in=RawSQL(
+                "SELECT id FROM (SELECT id, row_number() OVER (PARTITION BY project_id ORDER BY id) AS position "
+                "FROM api_document WHERE project_id = ANY(%s)) ranked WHERE position <= %s",
+                (list(project_ids), limit + 1),
+            )
+        )
+    return documents.only(*DOCUMENT_METADATA_FIELDS).order_by("id")
+
+
+def wants_html(request):
+    # Entities are returned as spans unless the client asks for the rendered HTML with
+    # ?render=html
+    return request.query_params.get("render") == "html"
+
+
 class UserAPIView(RetrieveAPIView):
     permission_classes = (IsAuthenticated,)
     serializer_class = UserSerializer
@@ -41,24 +113,62 @@ class ProjectsAPIView(RetrieveAPIView):
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, *args, **kwargs):
-        # Get all projects that the user has permission to view
-        projects = Project.objects.filter(
-            id__in=request.user.project_permissions.keys()
+        cached = project_cache.get("projects", request)
+        if cached is not None:
+            return Response(cached, status=200)
+        try:
+            documents_page_size = int(request.query_params["documents_page_size"])
+        except (KeyError, ValueError):
+            documents_page_size = None
+        if documents_page_size is not None:
+            if documents_page_size < 1:
+                return Response(
+                    {"error": "documents_page_size must be at least 1"}, status=400
+                )
+            # Capped as the project endpoint caps page_size
+            documents_page_size = min(
+                documents_page_size, DocumentCursorPagination.max_page_size
+            )
+        user_versions = project_cache.user_versions(request.user.id)
+        # Get all projects that the user has permission to view, with the number of
+        # documents in each
+        projects = (
+            Project.objects.accessible_to(request.user)
+            .annotate(document_count=Count("document"))
+            .order_by("id")
         )
-        # Serialize the projects
-        project_serializer = ProjectSerializer(projects, many=True)
-        # Convert the serialized projects to a list of dictionaries
-        projects = [project for project in project_serializer.data]
-        # For each project, get all documents for that project
-        for project in projects:
-            documents = Document.objects.filter(project=project["id"])
-            document_serializer = DocumentSerializer(documents, many=True)
-            # Drop the text and tagged_text fields from the documents to save bandwidth
-            for document in document_serializer.data:
-                document.pop("text")
-                document.pop("tagged_text")
-            project["documents"] = document_serializer.data
-        return Response(projects, status=200)
+        paginator = ProjectCursorPagination()
+        if wants_pagination(request):
+            projects = paginator.paginate_queryset(projects, request, view=self)
+        else:
+            projects = list(projects)
+        # Get the documents of every project in a single query, limited to the first
+        # page of each if requested
+        project_documents = {project.id: [] for project in projects}
+        for document in first_documents(project_documents.keys(), documents_page_size):
+            project_documents[document.project_id].append(document)
+        project_serializer = ProjectListSerializer(projects, many=True)
+        for project in project_serializer.data:
+            documents = project_documents[project["id"]]
+            if documents_page_size is not None and len(documents) > documents_page_size:
+                documents = documents[:documents_page_size]
+                # The rest of the documents are paginated through the project endpoint
+                project["documents_next"] = document_cursor_link(
+                    request.build_absolute_uri(
+                        reverse("project", kwargs={"project_id": project["id"]})
+                    ),
+                    documents[-1].id,
+                    documents_page_size,
+                )
+            project["documents"] = DocumentMetadataSerializer(documents, many=True).data
+        if wants_pagination(request):
+            response = paginator.get_paginated_response(project_serializer.data)
+        else:
+            response = Response(project_serializer.data, status=200)
+        project_cache.set(
+            request, user_versions, project_documents.keys(), response.data
+        )
+        return response
 
 
 class ProjectAPIView(RetrieveAPIView, CreateAPIView, DestroyAPIView):
@@ -66,38 +176,50 @@ class ProjectAPIView(RetrieveAPIView, CreateAPIView, DestroyAPIView):
 
     @staticmethod
     def check_exists_and_permission(request, project_id) -> (object, Response):
+        # Get the project along with the user's access to it in a single query
+        project = (
+            Project.objects.with_access(request.user).filter(id=project_id).first()
+        )
         # If project does not exist, return 400
-        if not Project.objects.filter(id=project_id).exists():
+        if project is None:
             return None, Response({"error": "Project does not exist"}, status=400)
-        project = Project.objects.get(id=project_id)
-        project_serializer = ProjectSerializer(project)
         # Check if user has permission to view project
-        if (
-                request.user.project_permissions.get(str(project_serializer.data["id"]))
-                is None
-        ):
+        if project.access == NONE_PERMISSIONS:
             return None, Response(
-                {"error": "You do not have permission to access this project"}, status=403
+                {"error": "You do not have permission to access this project"},
+                status=403,
             )
         return project, None
 
     def get(self, request, *args, **kwargs):
+        cached = project_cache.get("project", request)
+        if cached is not None:
+            return Response(cached, status=200)
         project_id = kwargs.get("project_id")
+        user_versions = project_cache.user_versions(request.user.id, [project_id])
         project, error = self.check_exists_and_permission(request, project_id)
         if error:
             return error
-        # Get all documents for this project
+        # Get the documents for this project, without their text and entities to save
+        # bandwidth
         project_serializer = ProjectSerializer(project)
-        documents = Document.objects.filter(project=project_serializer.data["id"])
-        document_serializer = DocumentSerializer(documents, many=True)
-        # Drop the text and tagged_text fields from the documents to save bandwidth
-        for document in document_serializer.data:
-            document.pop("text")
-            document.pop("tagged_text")
-        project_docs = {"documents": document_serializer.data}
-        return Response(
-            {**project_serializer.data, **project_docs}, status=200
+        documents = (
+            Document.objects.filter(project=project)
+            .only(*DOCUMENT_METADATA_FIELDS)
+            .order_by("id")
         )
+        project_docs = {}
+        if wants_pagination(request):
+            paginator = DocumentCursorPagination()
+            documents = paginator.paginate_queryset(documents, request, view=self)
+            project_docs["documents_next"] = paginator.get_next_link()
+            project_docs["documents_previous"] = paginator.get_previous_link()
+        project_docs["documents"] = DocumentMetadataSerializer(
+            documents, many=True
+        ).data
+        data = {**project_serializer.data, **project_docs}
+        project_cache.set(request, user_versions, [project_id], data)
+        return Response(data, status=200)
 
     def post(self, request, *args, **kwargs):
         project_data = JSONParser().parse(request)
@@ -113,34 +235,46 @@ class ProjectAPIView(RetrieveAPIView, CreateAPIView, DestroyAPIView):
             )
         project_serializer = ProjectSerializer(data=project_data)
         if project_serializer.is_valid():
-            project_serializer.save()
-            # If permissions is set to "write", for each user in the system add the project to their permissions
-            if project_data["permissions"] == WRITE_PERMISSIONS:
-                for user in CustomUser.objects.all():
-                    user.project_permissions[
-                        project_serializer.data["id"]
-                    ] = WRITE_PERMISSIONS
-                    user.save()
-            # If permissions is set to "read", for each user in the system, add the project to their permissions
-            elif project_data["permissions"] == READ_PERMISSIONS:
-                for user in CustomUser.objects.all():
-                    user.project_permissions[
-                        project_serializer.data["id"]
-                    ] = READ_PERMISSIONS
-                    user.save()
-            # If permissions is set to "custom", for each user in the system add the project to their permissions
-            elif project_data["permissions"] == CUSTOM_PERMISSIONS:
-                for user in CustomUser.objects.all():
-                    if user.username in project_data["custom_permissions"]:
-                        user.project_permissions[
-                            project_serializer.data["id"]
-                        ] = project_data["custom_permissions"][user.username]
-                        user.save()
-            # Add project to user's project permissions
-            request.user.project_permissions[
-                project_serializer.data["id"]
-            ] = WRITE_PERMISSIONS
-            request.user.save()
+            with transaction.atomic():
+                # If permissions is set to "read" or "write", every user gets that
+                # access through the project's default
+                if project_data["permissions"] in (READ_PERMISSIONS, WRITE_PERMISSIONS):
+                    project = project_serializer.save(
+                        default_access=project_data["permissions"]
+                    )
+                else:
+                    project = project_serializer.save()
+                permissions = {}
+                # If permissions is set to "custom", give each of the listed users their
+                # own access to the project
+                if project_data["permissions"] == CUSTOM_PERMISSIONS:
+                    custom_permissions = {
+                        username: str(access).lower()
+                        for username, access in project_data.get(
+                            "custom_permissions", {}
+                        ).items()
+                        if str(access).lower() in (READ_PERMISSIONS, WRITE_PERMISSIONS)
+                    }
+                    for user_id, username in CustomUser.objects.filter(
+                        username__in=custom_permissions.keys()
+                    ).values_list("id", "username"):
+                        permissions[user_id] = custom_permissions[username]
+                # The creator can always write to the project
+                permissions[request.user.id] = WRITE_PERMISSIONS
+                ProjectPermission.objects.bulk_create(
+                    [
+                        ProjectPermission(
+                            user_id=user_id, project=project, access=access
+                        )
+                        for user_id, access in permissions.items()
+                    ]
+                )
+                Event.for_project(project, CREATED).save()
+                # bulk_create sends no signals, and the cache was invalidated for the
+                # new project before the listed users could see it, so entries built in
+                # between are dropped once the transaction commits
+                for user_id in permissions:
+                    project_cache.invalidate_user(user_id)
             return Response(
                 {
                     "id": project_serializer.data["id"],
@@ -156,33 +290,33 @@ class ProjectAPIView(RetrieveAPIView, CreateAPIView, DestroyAPIView):
         project, error = self.check_exists_and_permission(request, project_id)
         if error:
             return error
+        # The project's permissions are deleted along with it
         project.delete()
-        # Remove project from each user's project_permissions
-        for user in CustomUser.objects.all():
-            try:
-                del user.project_permissions[str(project_id)]
-                user.save()
-            except KeyError:
-                pass
         return Response({"message": "Project deleted successfully"}, status=200)
 
 
-class DocumentApiView(RetrieveAPIView, CreateAPIView, DestroyAPIView):
+class DocumentApiView(RetrieveAPIView, CreateAPIView, UpdateAPIView, DestroyAPIView):
     permission_classes = (IsAuthenticated,)
 
     @staticmethod
     def check_exists_and_permission(
-            request, project_id, document_id
+        request, project_id, document_id
     ) -> (object, Response):
+        # Get the document along with the user's access to its project in a single query
+        document = (
+            Document.objects.with_access(request.user)
+            .filter(id=document_id, project=project_id)
+            .first()
+        )
         # If document does not exist, return 400
-        if not Document.objects.filter(id=document_id).exists():
+        if document is None:
             return None, Response({"error": "Document does not exist"}, status=400)
         # Check if user has permission to view project
-        if request.user.project_permissions.get(str(project_id)) is None:
+        if document.access == NONE_PERMISSIONS:
             return None, Response(
-                {"error": "You do not have permission to access this document"}, status=403
+                {"error": "You do not have permission to access this document"},
+                status=403,
             )
-        document = Document.objects.get(id=document_id, project=project_id)
         return document, None
 
     def get(self, request, *args, **kwargs):
@@ -191,35 +325,46 @@ class DocumentApiView(RetrieveAPIView, CreateAPIView, DestroyAPIView):
         document, error = self.check_exists_and_permission(
             request, project_id, document_id
         )
+        if error:
+            return error
         document_serializer = DocumentSerializer(document)
-        return Response(document_serializer.data, status=200)
+        data = document_serializer.data
+        if wants_html(request):
+            data["tagged_text"] = (
+                render_entities(document.text, document.entities)
+                if document.entities is not None
+                else None
+            )
+        return Response(data, status=200)
 
     def post(self, request, *args, **kwargs):
         document_data = JSONParser().parse(request)
         document_data["owner"] = request.user.id
         document_serializer = DocumentSerializer(data=document_data)
         if document_serializer.is_valid():
-            # Check if project exists
-            if not Project.objects.filter(id=document_data["project"]).exists():
+            # Check if project exists, getting the user's access to it in the same query
+            project = (
+                Project.objects.with_access(request.user)
+                .filter(id=document_data["project"])
+                .first()
+            )
+            if project is None:
                 return Response({"error": "Project does not exist"}, status=400)
             # Check if user has write permissions for the project
-            if (
-                    request.user.project_permissions.get(document_data["project"])
-                    != WRITE_PERMISSIONS
-            ):
+            if project.access != WRITE_PERMISSIONS:
                 return Response(
                     {
                         "error": "You do not have permission to add documents to this project"
                     },
                     status=403,
                 )
-            document_serializer.save()
+            document = document_serializer.save()
+            Event.for_document(document, CREATED).save()
             # Use Celery to perform tagging in the background
-            perform_tagging.delay(
+            queue_tagging(
                 document_serializer.data["id"], document_serializer.data["project"]
             )
             # Update project's updated_at field
-            project = Project.objects.get(id=document_data["project"])
             project.save()
             return Response(
                 {
@@ -232,82 +377,289 @@ class DocumentApiView(RetrieveAPIView, CreateAPIView, DestroyAPIView):
             )
         return Response(document_serializer.errors, status=400)
 
+    def patch(self, request, *args, **kwargs):
+        project_id = kwargs.get("project_id")
+        document_id = kwargs.get("document_id")
+        document, error = self.check_exists_and_permission(
+            request, project_id, document_id
+        )
+        if error:
+            return error
+        # Check if user has write permissions for the project
+        if document.access != WRITE_PERMISSIONS:
+            return Response(
+                {"error": "You do not have permission to edit this document"},
+                status=403,
+            )
+        text = request.data.get("text")
+        if not isinstance(text, str) or not text:
+            return Response({"error": "Text is required"}, status=400)
+        if text != document.text:
+            old_text, old_entities, old_model_version = (
+                document.text,
+                document.entities,
+                document.model_version,
+            )
+            # The entities are cleared until the new text has been tagged, clients are
+            # notified when it has
+            document.text = text
+            document.entities = None
+            document.model_version = None
+            document.tagging_status = TAGGING_QUEUED
+            with transaction.atomic():
+                document.save()
+                EntityMention.objects.filter(document=document).delete()
+                Event.for_document(document, UPDATED).save()
+                # Update project's updated_at field
+                Project.objects.filter(id=document.project_id).update(
+                    updated_at=timezone.now()
+                )
+            # Use Celery to tag only the parts of the text that changed in the
+            # background
+            queue_retagging(document, old_text, old_entities, old_model_version)
+            project_cache.invalidate_projects([document.project_id])
+        return Response(DocumentSerializer(document).data, status=200)
+
     def delete(self, request, *args, **kwargs):
         project_id = kwargs.get("project_id")
         document_id = kwargs.get("document_id")
         document, error = self.check_exists_and_permission(
             request, project_id, document_id
         )
+        if error:
+            return error
         document.delete()
+        project_cache.invalidate_projects([document.project_id])
         return Response({"message": "Document deleted successfully"}, status=200)
 
 
-# Get all the recent events that have happened for the user from the updated_at field of projects and documents
+# Stream all the documents of a project with their entities, as NDJSON or as a zip of
+# spaCy DocBin files
 @api_view(http_method_names=["GET"])
-def get_events(request):
+def export_project(request, project_id):
     # Check if user is authenticated
     if not bool(request.user and request.user.is_authenticated):
         return Response(status=401)
-    # Get all projects that the user has access to
-    projects = Project.objects.filter(
-        id__in=request.user.project_permissions.keys()
-    ).order_by("-updated_at")
-    # Get all documents that the user has access to
-    documents = Document.objects.filter(
-        project__id__in=request.user.project_permissions.keys()
-    ).order_by("-updated_at")
-    # Combine the projects and documents into a single list of events
-    events = []
-    for project in projects:
-        events.append(
-            {
-                "type": "project",
-                "project_id": project.id,
-                "document_id": None,
-                "name": project.name,
-                "timestamp": project.updated_at,
-                "action": "created"
-                if project.created_at.strftime("%Y-%m-%d %H:%M:%S.%f")[:-5]
-                   == project.updated_at.strftime("%Y-%m-%d %H:%M:%S.%f")[:-5]
-                else "updated",
-            }
+    project, error = ProjectAPIView.check_exists_and_permission(request, project_id)
+    if error:
+        return error
+    export_type = request.query_params.get("type", "ndjson")
+    if export_type == "ndjson":
+        response = StreamingHttpResponse(
+            ndjson_export(project_documents(project)),
+            content_type="application/x-ndjson",
         )
-    for document in documents:
-        events.append(
-            {
-                "type": "document",
-                "project_id": document.project.id,
-                "document_id": document.id,
-                "name": document.name,
-                "timestamp": document.updated_at,
-                "action": "created"
-                if document.created_at.strftime("%Y-%m-%d %H:%M:%S")[:-5]
-                   == document.updated_at.strftime("%Y-%m-%d %H:%M:%S")[:-5]
-                else "updated",
-            }
+        file_name = f"project-{project.id}.ndjson"
+    elif export_type == "docbin":
+        response = StreamingHttpResponse(
+            docbin_export(project_documents(project), f"project-{project.id}"),
+            content_type="application/zip",
         )
-    # Sort the events by timestamp
-    events.sort(key=lambda x: x["timestamp"], reverse=True)
-    # Take the first 10 events
-    events = events[:10]
-    return Response(events, status=200)
+        file_name = f"project-{project.id}-spacy.zip"
+    else:
+        return Response({"error": "Type must be ndjson or docbin"}, status=400)
+    response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+    return response
 
 
+# Add many documents in one request, from NDJSON lines of {"project", "name", "text"} or
+# a zip of text files
 @api_view(http_method_names=["POST"])
+def bulk_create_documents(request):
+    # Check if user is authenticated
+    if not bool(request.user and request.user.is_authenticated):
+        return Response(status=401)
+    content_type = request.content_type.split(";")[0].strip()
+    # The upload is read from the request stream as it is parsed, rather than loaded
+    # into memory with request.data
+    stream = request.stream or io.BytesIO()
+    ingester = DocumentIngester(request.user)
+    if content_type in ("application/x-ndjson", "application/jsonl"):
+        for line_number, document, error in iter_ndjson(stream):
+            if error:
+                ingester.error(line_number, error)
+                continue
+            ingester.add(
+                line_number,
+                document.get("project"),
+                document.get("name"),
+                document.get("text"),
+            )
+    elif content_type == "application/zip":
+        # Every file in a zip is added to the project given in the query string
+        project_id = request.query_params.get("project", "")
+        if not project_id.isdigit():
+            return Response({"error": "Project is required"}, status=400)
+        project = (
+            Project.objects.with_access(request.user).filter(id=project_id).first()
+        )
+        if project is None:
+            return Response({"error": "Project does not exist"}, status=400)
+        if project.access != WRITE_PERMISSIONS:
+            return Response(
+                {
+                    "error": "You do not have permission to add documents to this project"
+                },
+                status=403,
+            )
+        try:
+            for file_name, text, error in iter_zip(stream):
+                if error:
+                    ingester.error(file_name, error)
+                    continue
+                ingester.add(file_name, project.id, document_name(file_name), text)
+        except IngestError as error:
+            return Response({"error": str(error)}, status=400)
+    else:
+        return Response(
+            {"error": "Content type must be application/x-ndjson or application/zip"},
+            status=400,
+        )
+    ingester.finish()
+    return Response(
+        {"created": ingester.created, "errors": ingester.errors}, status=201
+    )
+
+
+# Get the most recent events in the projects the user has access to, newest first, from
+# the activity feed
+@api_view(http_method_names=["GET"])
+def get_events(request):
+    # Check if user is authenticated
+    if not bool(request.user and request.user.is_authenticated):
+        return Response(status=401)
+    events = Event.objects.filter(
+        project__in=Project.objects.accessible_to(request.user).values("id")
+    ).order_by("-id")
+    paginator = EventCursorPagination()
+    # Older events are paginated with limit and cursor, otherwise return the latest page
+    # as a list
+    if wants_pagination(request, paginator.page_size_query_param):
+        page = paginator.paginate_queryset(events, request)
+        return paginator.get_paginated_response(EventSerializer(page, many=True).data)
+    return Response(
+        EventSerializer(events[: paginator.page_size], many=True).data, status=200
+    )
+
+
+# Stream a server-sent event each time a document in one of the user's projects has been
+# tagged
+@api_view(http_method_names=["GET"])
+def stream_notifications(request):
+    # Check if user is authenticated
+    if not bool(request.user and request.user.is_authenticated):
+        return Response(status=401)
+    # Clients reconnecting after the stream ends send the id of the last event they
+    # received
+    last_event_id = request.headers.get("Last-Event-ID")
+    if last_event_id is not None and not last_event_id.isdigit():
+        return Response({"error": "Last-Event-ID must be an event id"}, status=400)
+    response = StreamingHttpResponse(
+        notification_stream(request.user, last_event_id and int(last_event_id)),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# Get the version of the model documents are currently tagged with, documents tagged by
+# another version are stale
+@api_view(http_method_names=["GET"])
+def get_model_version(request):
+    # Check if user is authenticated
+    if not bool(request.user and request.user.is_authenticated):
+        return Response(status=401)
+    return Response({"model_version": get_model().version}, status=200)
+
+
+@api_view(http_method_names=["POST"])
+@count_failures("quick_tag")
 def tag_text(request):
     # Ensure that the user is authenticated
     if not bool(request.user and request.user.is_authenticated):
         return Response(status=401)
-    # Ensure that the text is provided
-    text = request.data.get("text")
-    if text is None:
-        return Response({"error": "Text is required"}, status=400)
-    # Ensure that the text is between 1 and 5000 characters to prevent DoS attacks
-    try:
-        MinLengthValidator(1)(text)
-        MaxLengthValidator(5000)(text)
-    except ValidationError:
-        return Response({"error": "Text must be between 1 and 5000 characters"}, status=400)
-    # Use displacy to generate the HTML for the tagged text
-    html = displacy.render(nlp(sanitise_input_text(text)), style="ent", minify=True)
-    return Response({"tagged_text": unescape_text(html)}, status=200)
+    with phase("quick_tag", "validate"):
+        # Ensure that the text is provided
+        text = request.data.get("text")
+        if text is None:
+            return Response({"error": "Text is required"}, status=400)
+        # Ensure that the text is between 1 and 5000 characters to prevent DoS attacks
+        try:
+            MinLengthValidator(1)(text)
+            MaxLengthValidator(5000)(text)
+        except ValidationError:
+            return Response(
+                {"error": "Text must be between 1 and 5000 characters"}, status=400
+            )
+    # Use the cached entities if this text has already been tagged by the current model
+    model = get_model()
+    model_version = model.version
+    entities = tagging_cache.get(text, model_version)
+    if entities is None:
+        # Hand the text to the micro-batching inference service if it is enabled
+        if settings.NER_SERVICE:
+            try:
+                with phase("quick_tag", "inference"):
+                    model_version, entities = tag_text_remote(text)
+            except InferenceServiceError:
+                failures.labels("quick_tag").inc()
+                return Response({"error": "Tagging service is unavailable"}, status=503)
+        else:
+            entities = extract_entities(run_model(model.nlp, text, "quick_tag"))
+        tagging_cache.set(text, model_version, entities)
+    data = {"entities": entities, "model_version": model_version}
+    # Use displacy to generate the HTML for the tagged text if the client asks for it
+    if wants_html(request):
+        with phase("quick_tag", "render"):
+            data["tagged_text"] = render_entities(text, entities)
+    record_tagged("quick_tag", entities)
+    return Response(data, status=200)
+
+
+# Find the documents that mention an entity, across all the projects the user has access
+# to
+@api_view(http_method_names=["GET"])
+def search_entities(request):
+    # Ensure that the user is authenticated
+    if not bool(request.user and request.user.is_authenticated):
+        return Response(status=401)
+    text = request.query_params.get("text")
+    label = request.query_params.get("label")
+    if not text and not label:
+        return Response({"error": "Text or label is required"}, status=400)
+    mentions = EntityMention.objects.filter(
+        project__in=Project.objects.accessible_to(request.user).values("id")
+    )
+    if text:
+        mentions = mentions.filter(text=normalise_entity_text(text))
+    if label:
+        mentions = mentions.filter(label=label)
+    # Only load the metadata columns, the text of a matching document may be very large
+    documents = Document.objects.filter(id__in=mentions.values("document_id")).only(
+        *DOCUMENT_METADATA_FIELDS
+    )
+    paginator = DocumentCursorPagination()
+    page = paginator.paginate_queryset(documents, request)
+    document_serializer = DocumentMetadataSerializer(page, many=True)
+    return paginator.get_paginated_response(document_serializer.data)
+
+
+# Full-text search over the name and text of the documents in the projects the user has
+# access to
+@api_view(http_method_names=["GET"])
+def search_documents(request):
+    # Ensure that the user is authenticated
+    if not bool(request.user and request.user.is_authenticated):
+        return Response(status=401)
+    query = request.query_params.get("q")
+    if not query:
+        return Response({"error": "Query is required"}, status=400)
+    documents = full_text_search(
+        query, Project.objects.accessible_to(request.user).values("id")
+    )
+    paginator = SearchPagination()
+    page = paginator.paginate_queryset(documents, request)
+    document_serializer = DocumentSearchResultSerializer(page, many=True)
+    return paginator.get_paginated_response(document_serializer.data)
@@ -1,3 +1,17 @@
+import os
+import socket
+
+from prometheus_client import values
+
 from .celery import app as celery_app
 
 __all__ = ("celery_app",)
+
+# With PROMETHEUS_MULTIPROC_DIR shared by the web and celery containers, process ids
+# alone can clash, so name the metric files of each process after its container's
+# hostname as well. This has to happen before any metric is created, and the celery app
+# only imports the tasks once it is finalised.
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    values.ValueClass = values.MultiProcessValue(
+        lambda: f"{socket.gethostname()}_{os.getpid()}"
+    )
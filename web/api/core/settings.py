@@ -43,7 +43,6 @@ INSTALLED_APPS = [
     "rest_framework",
     "api",
     "django.contrib.postgres",
-    "django_admin_hstore_widget",
     "coverage",
     "django_extensions",
 ]
@@ -63,6 +62,7 @@ SIMPLE_JWT = {
 
 MIDDLEWARE = [
     "django_prometheus.middleware.PrometheusBeforeMiddleware",
+    "api.middleware.RequestProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -133,10 +133,145 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Redis
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379")
+
 # Celery
 
-CELERY_BROKER_URL = "redis://redis:6379"
-CELERY_RESULT_BACKEND = "redis://redis:6379"
+CELERY_BROKER_URL = REDIS_URL
+CELERY_RESULT_BACKEND = REDIS_URL
+# Documents created or edited one at a time are tagged on the interactive queue, uploads
+# and re-tagging on the bulk queue. Each queue has its own workers, see
+# docker-compose.yaml
+CELERY_TASK_DEFAULT_QUEUE = "interactive"
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    # Tasks are taken off each queue in priority order, from 0 to 9
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+    # Seconds before a task that has not been acknowledged is delivered to another
+    # worker. Tasks are only acknowledged once they finish, so this has to be longer
+    # than the longest tagging task
+    "visibility_timeout": int(
+        os.environ.get("CELERY_VISIBILITY_TIMEOUT", str(60 * 60 * 3))
+    ),
+}
+# Tagging tasks are long and CPU bound. Acknowledge them once they finish, so that the
+# tasks of a worker that dies are run again, and reserve one task at a time, so that a
+# busy worker never holds tasks that an idle one could start
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# NER tagging
+
+# Directory of versioned model directories, with an "active" symlink to the one to tag
+# with, see api/ner.py
+NER_MODEL_REGISTRY = os.environ.get("NER_MODEL_REGISTRY", "/home/api/models")
+# Model used when the registry has no active model
+NER_MODEL_PATH = os.environ.get("NER_MODEL_PATH", "/home/api/ner-model")
+# Maximum number of seconds before a process notices that the active model has changed
+NER_MODEL_CHECK_INTERVAL = float(os.environ.get("NER_MODEL_CHECK_INTERVAL", "10"))
+# Threads torch uses for inference in each process
+NER_TORCH_THREADS = int(os.environ.get("NER_TORCH_THREADS", "1"))
+# Inference backend, "torch" or "int8" for the transformer with dynamically quantised
+# int8 linear layers
+NER_BACKEND = os.environ.get("NER_BACKEND", "torch")
+
+# Collect pending documents and tag them together with nlp.pipe instead of one document
+# per task
+NER_BATCHING = os.environ.get("NER_BATCHING", "False") == "True"
+# Maximum number of seconds a document waits for a batch to fill up before it is tagged
+NER_BATCH_WINDOW = float(os.environ.get("NER_BATCH_WINDOW", "2"))
+# Maximum number of documents tagged by a single batch task
+NER_BATCH_MAX_DOCUMENTS = int(os.environ.get("NER_BATCH_MAX_DOCUMENTS", "32"))
+# Number of texts passed through the transformer at once by nlp.pipe
+NER_PIPE_BATCH_SIZE = int(os.environ.get("NER_PIPE_BATCH_SIZE", "8"))
+
+# Every NER_FAIR_SHARE_DOCUMENTS documents a user already has waiting on the bulk queue
+# lower the priority of their next upload by one step, so that one large upload doesn't
+# hold up everyone else's
+NER_FAIR_SHARE_DOCUMENTS = int(os.environ.get("NER_FAIR_SHARE_DOCUMENTS", "100"))
+# Requests to tag a document that is already queued are merged into the queued task.
+# Seconds before the queued marker expires, so that a document whose task was lost can
+# be queued again
+NER_QUEUED_TIMEOUT = int(os.environ.get("NER_QUEUED_TIMEOUT", str(60 * 60 * 3)))
+# Number of times a tagging task is delivered to a worker before its documents are
+# marked as failed, as the tasks of a worker that dies are delivered again
+NER_MAX_DELIVERIES = int(os.environ.get("NER_MAX_DELIVERIES", "3"))
+
+# Split documents longer than NER_CHUNK_SIZE characters into windows of sentences that
+# are tagged in parallel
+NER_CHUNKING = os.environ.get("NER_CHUNKING", "False") == "True"
+NER_CHUNK_SIZE = int(os.environ.get("NER_CHUNK_SIZE", "10000"))
+# Number of characters of context shared by consecutive windows
+NER_CHUNK_OVERLAP = int(os.environ.get("NER_CHUNK_OVERLAP", "500"))
+
+# When a document is edited only the sentences that changed are tagged again, unless
+# more than this fraction of its text has to be tagged, in which case the whole text is
+NER_INCREMENTAL_MAX_CHANGE = float(os.environ.get("NER_INCREMENTAL_MAX_CHANGE", "0.5"))
+
+# Maximum number of tagging results kept in each process's LRU cache, in front of the
+# shared Redis cache
+NER_CACHE_SIZE = int(os.environ.get("NER_CACHE_SIZE", "1024"))
+# Number of seconds tagging results are kept in Redis
+NER_CACHE_TIMEOUT = int(os.environ.get("NER_CACHE_TIMEOUT", str(60 * 60 * 24 * 7)))
+
+# Send /api/tag/ requests to the local micro-batching inference service instead of
+# tagging in the request thread
+NER_SERVICE = os.environ.get("NER_SERVICE", "False") == "True"
+NER_SERVICE_SOCKET = os.environ.get("NER_SERVICE_SOCKET", "/tmp/ner-service.sock")
+NER_SERVICE_AUTHKEY = SECRET_KEY.encode()
+# Maximum number of concurrent requests merged into one batch
+NER_SERVICE_BATCH_SIZE = int(os.environ.get("NER_SERVICE_BATCH_SIZE", "16"))
+# Maximum number of seconds the first request of a batch waits for others to join it
+NER_SERVICE_MAX_WAIT = float(os.environ.get("NER_SERVICE_MAX_WAIT", "0.01"))
+# Maximum number of seconds a request waits for the service to respond
+NER_SERVICE_TIMEOUT = float(os.environ.get("NER_SERVICE_TIMEOUT", "30"))
+
+# Project cache
+
+# Seconds the responses of /api/projects/ and /api/project/<id>/ are cached for each
+# user, 0 to disable the cache. Entries are invalidated as soon as anything in them
+# changes, see api/cache.py
+PROJECT_CACHE_TIMEOUT = int(os.environ.get("PROJECT_CACHE_TIMEOUT", "300"))
+
+# Notifications
+
+# Seconds between heartbeat comments on an idle notification stream
+NOTIFICATIONS_HEARTBEAT = int(os.environ.get("NOTIFICATIONS_HEARTBEAT", "15"))
+# Seconds a notification stream stays open before the client is asked to reconnect,
+# which frees its worker thread
+NOTIFICATIONS_MAX_DURATION = int(os.environ.get("NOTIFICATIONS_MAX_DURATION", "300"))
+# Seconds clients wait before reconnecting
+NOTIFICATIONS_RETRY = int(os.environ.get("NOTIFICATIONS_RETRY", "2"))
+
+# Bulk ingestion
+
+# Number of documents inserted at a time by /api/create/documents/
+BULK_INGEST_CHUNK_SIZE = int(os.environ.get("BULK_INGEST_CHUNK_SIZE", "500"))
+
+# Export
+
+# Number of documents fetched from the database at a time by /api/project/<id>/export/
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "500"))
+# Maximum number of documents in each DocBin file of a spaCy export
+EXPORT_DOCBIN_SHARD_SIZE = int(os.environ.get("EXPORT_DOCBIN_SHARD_SIZE", "1000"))
+
+# Request profiling
+
+# Record the SQL queries and time of every request in response headers and Prometheus,
+# see api/middleware.py
+REQUEST_PROFILING = os.environ.get("REQUEST_PROFILING", "False") == "True"
+# Fraction of requests run under cProfile
+REQUEST_PROFILING_SAMPLE_RATE = float(
+    os.environ.get("REQUEST_PROFILING_SAMPLE_RATE", "0")
+)
+# Profiled requests taking at least this many seconds have their profile written to
+# REQUEST_PROFILING_DIR
+REQUEST_PROFILING_SLOW = float(os.environ.get("REQUEST_PROFILING_SLOW", "0.5"))
+REQUEST_PROFILING_DIR = os.environ.get("REQUEST_PROFILING_DIR", "/tmp/profiles")
 
 
 # Internationalization
@@ -13,6 +13,7 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+
 # isort: skip_file
 from django.contrib import admin
 from django.urls import include, path, re_path
@@ -27,6 +28,7 @@ urlpatterns = [
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api/user/", views.UserAPIView.as_view(), name="user"),
     path("api/events/", views.get_events, name="events"),
+    path("api/notifications/", views.stream_notifications, name="notifications"),
     path(
         "api/projects/",
         views.ProjectsAPIView.as_view(http_method_names=["get"]),
@@ -37,9 +39,14 @@ urlpatterns = [
         views.ProjectAPIView.as_view(http_method_names=["get", "delete"]),
         name="project",
     ),
+    path(
+        "api/project/<int:project_id>/export/",
+        views.export_project,
+        name="project_export",
+    ),
     path(
         "api/project/<int:project_id>/document/<int:document_id>/",
-        views.DocumentApiView.as_view(http_method_names=["get", "delete"]),
+        views.DocumentApiView.as_view(http_method_names=["get", "patch", "delete"]),
         name="document",
     ),
     path(
@@ -47,11 +54,15 @@ urlpatterns = [
         views.DocumentApiView.as_view(http_method_names=["post"]),
         name="create_document",
     ),
+    path("api/create/documents/", views.bulk_create_documents, name="create_documents"),
     path(
         "api/create/project/",
         views.ProjectAPIView.as_view(http_method_names=["post"]),
         name="create_project",
     ),
     path("api/tag/", views.tag_text, name="tag"),
+    path("api/model/", views.get_model_version, name="model"),
+    path("api/entities/search/", views.search_entities, name="entity_search"),
+    path("api/documents/search/", views.search_documents, name="document_search"),
     re_path("^.*$", views.index, name="index"),
 ]
@@ -0,0 +1,41 @@
+"""
+Gunicorn configuration, picked up automatically when gunicorn is started from /home/api.
+
+With GUNICORN_PRELOAD enabled the Django app, and with it the NER model, is imported
+once in the master process before the workers are forked. The model weights are then
+shared copy-on-write between the workers instead of every worker loading its own copy.
+
+Workers are threaded so that the long-lived /api/notifications/ streams, which each hold
+a thread while open, don't block other requests. GUNICORN_THREADS bounds the number of
+concurrent requests, streams included, per worker.
+"""
+
+import gc
+import os
+
+bind = ":8000"
+workers = int(os.environ.get("GUNICORN_WORKERS", "5"))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "True") == "True"
+pidfile = os.environ.get("GUNICORN_PIDFILE", "/tmp/gunicorn.pid")
+
+
+def when_ready(server):
+    if preload_app:
+        # Move everything loaded so far into the permanent generation, so the garbage
+        # collector in the workers never writes to (and therefore copies) the pages
+        # holding the preloaded objects
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    import torch
+    from django.conf import settings
+    from django.db import connections
+
+    # Thread settings are per process, so set them again before the worker's first
+    # inference starts its thread pool
+    torch.set_num_threads(settings.NER_TORCH_THREADS)
+    # Never share database connections opened by the master with the forked workers
+    connections.close_all()
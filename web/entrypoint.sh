@@ -17,5 +17,10 @@ if User.objects.count() == 0:
     User.objects.create_superuser('admin', 'admin@example.com', 'admin')
 " | python manage.py shell
 
-# Start server
-/usr/local/bin/gunicorn core.wsgi:application -w 5 -b :8000
\ No newline at end of file
+# Start the micro-batching inference service for /api/tag/ if it is enabled
+if [ "$NER_SERVICE" = "True" ]; then
+    python /home/api/manage.py inference_service &
+fi
+
+# Start server, workers and preloading are configured in gunicorn.conf.py
+/usr/local/bin/gunicorn core.wsgi:application -c /home/api/gunicorn.conf.py
\ No newline at end of file
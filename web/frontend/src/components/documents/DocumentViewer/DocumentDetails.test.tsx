@@ -12,7 +12,8 @@ const document: Document = {
     created_at: "2023-01-01T00:00:00.000000Z",
     updated_at: "2023-01-01T00:00:00.000000Z",
     text: "Sample text",
-    tagged_text: "",
+    entities: null,
+    tagged_text: null,
 };
 
 const documentProps: DocumentDetailsProps = { document, projectID: "1" };
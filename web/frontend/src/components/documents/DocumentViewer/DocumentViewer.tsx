@@ -1,6 +1,7 @@
 import { FunctionComponent, useEffect, useState } from "react";
 import { useSearchParams } from "../../../services/utils";
 import {Project, Document, getDocument, getProject} from "../../../services/documents";
+import {subscribeToTagged, TaggedNotification} from "../../../services/notifications";
 import {APIError} from "../../../services/apiError";
 import styles from "../../../css/main.module.css";
 import documentStyles from "./DocumentViewer.module.css";
@@ -54,6 +55,29 @@ const DocumentViewer: FunctionComponent = () => {
         }
     }, [projectID, documentID]);
 
+    // While the document is being tagged, wait to be notified that it has been instead of fetching it again. It is
+    // fetched again once the stream is open too, as it may have been tagged before the subscription started.
+    const tagging = document !== undefined && document.entities === null && document.tagging_status !== "failed";
+    useEffect(() => {
+        if (!tagging || !projectID || !documentID) {
+            return;
+        }
+        const refresh = () => {
+            getDocument(projectID, documentID).then((result: Document) => {
+                if (result) {
+                    setDocument(result);
+                }
+            }).catch((error: APIError) => {
+                setError(error);
+            });
+        };
+        return subscribeToTagged((notification: TaggedNotification) => {
+            if (notification.document_id.toString() === documentID) {
+                refresh();
+            }
+        }, refresh);
+    }, [tagging, projectID, documentID]);
+
     function createSkeleton() {
         return (
             <div className={styles.animated_panel}>
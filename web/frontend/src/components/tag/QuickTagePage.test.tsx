@@ -7,6 +7,7 @@ import { rest } from "msw";
 import { setupServer } from "msw/node";
 
 const taggedDocument: TaggedDocument = {
+    entities: [],
     tagged_text: "<strong>Hello</strong> World",
 };
 
@@ -3,13 +3,20 @@ import { fetchApi } from "./utils";
 export interface DocumentProperties {
     id: number;
     name: string;
+    // Version of the model that tagged the document, null until it has been tagged
+    model_version?: string | null;
+    tagging_status?: "queued" | "running" | "done" | "failed";
     created_at: string;
     updated_at: string;
 }
 
+// An entity span as [start, end, label], with character offsets into the document text
+export type Entity = [number, number, string];
+
 export interface Document extends DocumentProperties {
     text: string
-    tagged_text: string
+    entities: Entity[] | null
+    tagged_text: string | null
 }
 
 export interface Project {
@@ -17,6 +24,7 @@ export interface Project {
     name: string;
     created_at: string;
     updated_at: string;
+    document_count?: number;
     documents: DocumentProperties[];
 }
 
@@ -33,7 +41,7 @@ export const deleteProject = (projectID: string): Promise<void> => {
 }
 
 export const getDocument = (projectID: string, documentID: string): Promise<Document> => {
-    return fetchApi<Document>(`/project/${projectID}/document/${documentID}/`, { method: "GET" });
+    return fetchApi<Document>(`/project/${projectID}/document/${documentID}/?render=html`, { method: "GET" });
 }
 
 export const deleteDocument = (projectID: string, documentID: string): Promise<void> => {
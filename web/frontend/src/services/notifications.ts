@@ -0,0 +1,93 @@
+import store from "../state/store";
+
+
+export interface TaggedNotification {
+    id: number;
+    project_id: number;
+    document_id: number;
+    name: string;
+}
+
+// Parse one server-sent event into a notification if it is a tagged event
+const parseEvent = (block: string): TaggedNotification | undefined => {
+    let event = "message";
+    let data = "";
+    for (const line of block.split("\n")) {
+        if (line.startsWith("event:")) {
+            event = line.substring(6).trim();
+        } else if (line.startsWith("data:")) {
+            data += line.substring(5).trim();
+        }
+    }
+    return event === "tagged" && data ? JSON.parse(data) as TaggedNotification : undefined;
+}
+
+// Call onTagged each time a document in one of the user's projects is tagged, until the returned function is called.
+// EventSource can't send the Authorization header, so the stream is read with fetch and reopened when the server ends it.
+// onOpen is called each time the stream opens, so callers can re-check anything that may have been tagged before it did.
+export const subscribeToTagged = (
+    onTagged: (notification: TaggedNotification) => void,
+    onOpen?: () => void,
+): (() => void) => {
+    const controller = new AbortController();
+    let lastEventID: string | undefined;
+    let retry = 2000;
+
+    const connect = async () => {
+        const response = await fetch("/api/notifications/", {
+            signal: controller.signal,
+            headers: {
+                "Authorization": `Bearer ${store.getState().persistedReducer.access}`,
+                ...(lastEventID ? { "Last-Event-ID": lastEventID } : {}),
+            },
+        });
+        if (!response.ok || !response.body) {
+            throw new Error(`Notification stream failed with status ${response.status}`);
+        }
+        if (onOpen) {
+            onOpen();
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        for (;;) {
+            const { done, value } = await reader.read();
+            if (done) {
+                return;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            const blocks = buffer.split("\n\n");
+            buffer = blocks.pop() || "";
+            for (const block of blocks) {
+                const id = block.match(/^id: (\d+)$/m);
+                const retryMatch = block.match(/^retry: (\d+)$/m);
+                if (id) {
+                    lastEventID = id[1];
+                }
+                if (retryMatch) {
+                    retry = parseInt(retryMatch[1]);
+                }
+                const notification = parseEvent(block);
+                if (notification) {
+                    onTagged(notification);
+                }
+            }
+        }
+    }
+
+    const run = async () => {
+        while (!controller.signal.aborted) {
+            try {
+                await connect();
+            } catch (e) {
+                if (controller.signal.aborted) {
+                    return;
+                }
+            }
+            await new Promise((resolve) => setTimeout(resolve, retry));
+        }
+    }
+
+    run();
+    return () => controller.abort();
+}
@@ -1,12 +1,14 @@
 import {fetchApi} from "./utils";
+import { Entity } from "./documents";
 
 
 export interface TaggedDocument {
+    entities: Entity[];
     tagged_text: string;
 }
 
 export const performTag = (text: string): Promise<TaggedDocument> => {
-    return fetchApi<TaggedDocument>("/tag/", {
+    return fetchApi<TaggedDocument>("/tag/?render=html", {
         method: "POST",
         body: JSON.stringify({
             text: text